@@ -0,0 +1,272 @@
+import os
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import scipy.sparse as sp
+from neo4j import GraphDatabase
+from dotenv import load_dotenv
+
+from dataset_io import batched, dataset_path, is_columnar, iter_record_batches, read_rows
+
+load_dotenv()
+NEO4J_URI = os.getenv("NEO4J_URI")
+NEO4J_USER = os.getenv("NEO4J_USER", "neo4j")
+NEO4J_PASSWORD = os.getenv("NEO4J_PASSWORD")
+NEO4J_DATABASE = os.getenv("NEO4J_DATABASE", "neo4j")
+
+DATA_DIR = "data"
+
+# PageRank : facteur d'amortissement, tolérance (norme L1) et itérations au plus
+DAMPING = 0.85
+PAGERANK_TOL = 1e-6
+PAGERANK_ITERATIONS = 100
+
+# Propagation de labels : itérations au plus, part de nœuds mis à jour à chaque
+# tour (évite les oscillations des mises à jour synchrones) et arrêt quand
+# moins de LABEL_TOL des nœuds changent de communauté
+LABEL_ITERATIONS = 30
+LABEL_UPDATE_SHARE = 0.5
+LABEL_TOL = 1e-3
+
+# Écriture des résultats : lignes par transaction et transactions simultanées
+WRITE_BATCH = 20000
+WRITE_WORKERS = 4
+
+# Lignes lues par lot depuis Neo4j
+FETCH_SIZE = 100000
+
+USERS_QUERY = "MATCH (u:User) RETURN u.id AS id"
+EDGES_QUERY = "MATCH (a:User)-[:FOLLOWS]->(b:User) RETURN a.id AS src, b.id AS dst"
+
+WRITE_QUERY = """
+UNWIND $rows AS row
+MATCH (u:User {id: row.id})
+SET u.pagerank = row.pagerank,
+    u.communityId = row.communityId,
+    u.inDegree = row.inDegree,
+    u.outDegree = row.outDegree
+"""
+
+class NodeIndex:
+    """Identifiants d'utilisateurs numérotés 0..n-1 dans l'ordre d'apparition"""
+
+    def __init__(self):
+        self.positions = {}
+        self.ids = []
+
+    def encode(self, values):
+        positions, ids = self.positions, self.ids
+        out = np.empty(len(values), dtype=np.int64)
+        for i, value in enumerate(values):
+            position = positions.get(value)
+            if position is None:
+                position = positions[value] = len(ids)
+                ids.append(value)
+            out[i] = position
+        return out
+
+    def __len__(self):
+        return len(self.ids)
+
+class EdgeLoader:
+    """Arêtes FOLLOWS numérotées, lues par blocs depuis les fichiers ou Neo4j"""
+
+    def __init__(self):
+        self.nodes = NodeIndex()
+        self.src = []
+        self.dst = []
+
+    def add(self, src, dst):
+        self.src.append(self.nodes.encode(src))
+        self.dst.append(self.nodes.encode(dst))
+
+    def from_files(self, data_dir=DATA_DIR):
+        """Utilisateurs puis follows des fichiers générés (NDJSON, Parquet ou Arrow)"""
+        for filename, columns in [("users.ndjson", ("id",)), ("follows.ndjson", ("followerId", "followedId"))]:
+            path = dataset_path(data_dir, filename)
+            if is_columnar(path):
+                blocks = ([batch.column(c).to_pylist() for c in columns] for batch in iter_record_batches(path))
+            else:
+                blocks = ([[row[c] for row in rows] for c in columns]
+                          for rows in batched(read_rows(path), lambda: FETCH_SIZE))
+            for block in blocks:
+                if len(columns) == 1:
+                    self.nodes.encode(block[0])
+                else:
+                    self.add(*block)
+        return self
+
+    def from_neo4j(self, driver, database=NEO4J_DATABASE):
+        """Utilisateurs puis relations FOLLOWS lus en flux depuis la base"""
+        with driver.session(database=database, fetch_size=FETCH_SIZE) as session:
+            self.nodes.encode([record["id"] for record in session.run(USERS_QUERY)])
+            result = session.run(EDGES_QUERY)
+            for rows in batched(result, lambda: FETCH_SIZE):
+                self.add([record["src"] for record in rows], [record["dst"] for record in rows])
+        return self
+
+    def matrix(self):
+        """Matrice d'adjacence CSR (source -> cible), sans doublons ni boucles"""
+        n = len(self.nodes)
+        src = np.concatenate(self.src) if self.src else np.empty(0, dtype=np.int64)
+        dst = np.concatenate(self.dst) if self.dst else np.empty(0, dtype=np.int64)
+        keep = src != dst
+        adjacency = sp.csr_matrix((np.ones(keep.sum(), dtype=np.float64), (src[keep], dst[keep])), shape=(n, n))
+        adjacency.sum_duplicates()
+        adjacency.data[:] = 1.0
+        return adjacency
+
+def pagerank(adjacency, damping=DAMPING, tol=PAGERANK_TOL, max_iter=PAGERANK_ITERATIONS):
+    """PageRank par itérations de puissance sur la matrice de transition.
+    Renvoie (scores, itérations) ; les nœuds sans lien sortant redistribuent
+    leur score uniformément."""
+    n = adjacency.shape[0]
+    if n == 0:
+        return np.empty(0), 0
+    out_degree = np.asarray(adjacency.sum(axis=1)).ravel()
+    dangling = out_degree == 0
+    inverse = np.divide(1.0, out_degree, out=np.zeros(n), where=~dangling)
+    incoming = adjacency.T.tocsr()
+    rank = np.full(n, 1.0 / n)
+    for iteration in range(1, max_iter + 1):
+        spread = incoming @ (rank * inverse)
+        updated = damping * spread + (damping * rank[dangling].sum() + 1 - damping) / n
+        delta = np.abs(updated - rank).sum()
+        rank = updated
+        if delta < tol:
+            break
+    return rank, iteration
+
+def label_propagation(adjacency, seed=0, max_iter=LABEL_ITERATIONS, share=LABEL_UPDATE_SHARE, tol=LABEL_TOL,
+                      labels=None):
+    """Communautés par propagation de labels sur le graphe non orienté.
+
+    À chaque tour, une part des nœuds prend le label le plus présent chez ses
+    voisins, chaque voisin pesant l'inverse de son degré pour que les comptes
+    très suivis n'aspirent pas tout le graphe (égalités tranchées au hasard) ;
+    le décompte de tous les nœuds se fait d'un coup par le produit creux
+    voisinage x labels. `labels` (entiers de 0 à n-1, un par nœud) reprend
+    un calcul précédent : seules les communautés touchées par les changements
+    du graphe bougent. Renvoie (communautés numérotées par taille
+    décroissante, itérations).
+    """
+    n = adjacency.shape[0]
+    if n == 0:
+        return np.empty(0, dtype=np.int64), 0
+    rng = np.random.default_rng(seed)
+    neighbours = (adjacency + adjacency.T).tocsr()
+    degree = np.diff(neighbours.indptr)
+    neighbours = (neighbours @ sp.diags(1.0 / np.maximum(degree, 1))).tocsr()
+    # Les utilisateurs isolés gardent leur propre label
+    connected = degree > 0
+    labels = np.arange(n) if labels is None else np.asarray(labels, dtype=np.int64)
+    rows_index = np.arange(n + 1)
+    for iteration in range(1, max_iter + 1):
+        one_hot = sp.csr_matrix((np.ones(n), labels, rows_index), shape=(n, n))
+        counts = (neighbours @ one_hot).tocsr()
+        counts.sum_duplicates()
+        # Bruit relatif infime : départage les égalités sans changer l'ordre des poids
+        noisy = counts.data * (1 + 1e-9 * rng.random(counts.data.size))
+        best = np.zeros(n)
+        best[connected] = np.maximum.reduceat(noisy, counts.indptr[:-1][connected])
+        rows = np.repeat(np.arange(n), np.diff(counts.indptr))
+        top = noisy == best[rows]
+        winners = labels.copy()
+        winners[rows[top]] = counts.indices[top]
+
+        update = rng.random(n) < share
+        changed = update & (winners != labels)
+        labels = np.where(update, winners, labels)
+        if changed.sum() < tol * n:
+            break
+
+    # Communautés renumérotées de la plus grande à la plus petite
+    _, inverse, sizes = np.unique(labels, return_inverse=True, return_counts=True)
+    rank = np.empty(sizes.size, dtype=np.int64)
+    rank[np.argsort(-sizes, kind="stable")] = np.arange(sizes.size)
+    return rank[inverse], iteration
+
+def run_write(tx, rows):
+    return tx.run(WRITE_QUERY, rows=rows).consume()
+
+def write_back(driver, ids, pagerank_scores, communities, in_degree, out_degree,
+               database=NEO4J_DATABASE, batch_size=WRITE_BATCH, workers=WRITE_WORKERS):
+    """Écrit pagerank, communityId et degrés sur les nœuds User, par lots
+    disjoints en parallèle ; renvoie le nombre d'utilisateurs écrits"""
+    def rows():
+        for start in range(0, len(ids), batch_size):
+            stop = min(start + batch_size, len(ids))
+            yield [
+                {"id": user, "pagerank": score, "communityId": community, "inDegree": indeg, "outDegree": outdeg}
+                for user, score, community, indeg, outdeg in zip(
+                    ids[start:stop], pagerank_scores[start:stop].tolist(), communities[start:stop].tolist(),
+                    in_degree[start:stop].tolist(), out_degree[start:stop].tolist())
+            ]
+
+    def write(batch):
+        with driver.session(database=database) as session:
+            session.execute_write(run_write, batch)
+        return len(batch)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return sum(pool.map(write, rows()))
+
+def analyze(adjacency, seed=0):
+    """PageRank, degrés et communautés d'une matrice d'adjacence, avec la durée de chaque calcul"""
+    timings = {}
+    start = time.perf_counter()
+    scores, pr_iterations = pagerank(adjacency)
+    timings["pagerank"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    out_degree = np.diff(adjacency.indptr)
+    in_degree = np.bincount(adjacency.indices, minlength=adjacency.shape[0])
+    timings["degrees"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    communities, lp_iterations = label_propagation(adjacency, seed)
+    timings["communities"] = time.perf_counter() - start
+    return {"pagerank": scores, "pagerankIterations": pr_iterations, "inDegree": in_degree,
+            "outDegree": out_degree, "communities": communities, "labelIterations": lp_iterations,
+            "timings": timings}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="PageRank et communautés du graphe des follows")
+    parser.add_argument("--source", choices=["files", "neo4j"], default="files",
+                        help="lire les follows dans data/ ou en flux depuis la base")
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    parser.add_argument("--seed", type=int, default=0, help="graine de la propagation de labels")
+    parser.add_argument("--workers", type=int, default=WRITE_WORKERS, help="transactions d'écriture simultanées")
+    parser.add_argument("--dry-run", action="store_true", help="calculer sans écrire dans la base")
+    args = parser.parse_args()
+
+    driver = None if args.dry_run and args.source == "files" else \
+        GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD))
+    try:
+        start = time.perf_counter()
+        loader = EdgeLoader()
+        if args.source == "files":
+            loader.from_files(args.data_dir)
+        else:
+            loader.from_neo4j(driver)
+        adjacency = loader.matrix()
+        print(f"📥 {adjacency.shape[0]} utilisateurs, {adjacency.nnz} follows chargés "
+              f"en {time.perf_counter() - start:.1f}s")
+
+        results = analyze(adjacency, args.seed)
+        timings = results["timings"]
+        print(f"⭐ PageRank : {results['pagerankIterations']} itérations en {timings['pagerank']:.2f}s")
+        print(f"🏘️  Communautés : {results['communities'].max() + 1 if adjacency.shape[0] else 0} "
+              f"en {results['labelIterations']} itérations, {timings['communities']:.2f}s")
+        top = np.argsort(-results["pagerank"])[:5]
+        print("   Plus influents : " + ", ".join(f"{loader.nodes.ids[i]} ({results['pagerank'][i]:.2e})" for i in top))
+
+        if not args.dry_run:
+            start = time.perf_counter()
+            count = write_back(driver, loader.nodes.ids, results["pagerank"], results["communities"],
+                               results["inDegree"], results["outDegree"], workers=args.workers)
+            print(f"✅ {count} utilisateurs mis à jour en {time.perf_counter() - start:.1f}s")
+    finally:
+        if driver is not None:
+            driver.close()
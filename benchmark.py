@@ -0,0 +1,336 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import subprocess
+import heapq
+import threading
+from collections import Counter
+from datetime import datetime
+from itertools import islice
+import numpy as np
+from neo4j import GraphDatabase
+from neo4j.exceptions import ServiceUnavailable
+from dotenv import load_dotenv
+
+from dataset_io import dataset_path, read_rows
+from queries import READ_QUERIES, MODERATION_STATUSES, FEED_LIMIT, COMMENT_LIMIT, MODERATION_LIMIT, run_read
+
+load_dotenv()
+NEO4J_URI = os.getenv("NEO4J_URI")
+NEO4J_USER = os.getenv("NEO4J_USER", "neo4j")
+NEO4J_PASSWORD = os.getenv("NEO4J_PASSWORD")
+NEO4J_DATABASE = os.getenv("NEO4J_DATABASE", "neo4j")
+
+DATA_DIR = "data"
+RESULTS_FILE = "benchmark.json"
+
+# Lignes lues au plus par fichier pour tirer les paramètres
+SAMPLE_ROWS = 2_000_000
+# Candidats gardés par type de paramètre (les plus actifs / populaires)
+TOP_PARAMS = 200
+
+# Répartition des lectures rejouées (poids relatifs)
+DEFAULT_MIX = "timeline=4,post=3,tag=2,group=1,moderation=1"
+
+# Attente maximale (s) du départ commun des clients, échauffement compris
+START_TIMEOUT = 300
+
+# Lectures profilées (PROFILE) par type pour estimer les db hits
+PROFILE_SAMPLES = 5
+
+# Base Neo4j jetable pour --container
+CONTAINER_IMAGE = "neo4j:5-community"
+CONTAINER_NAME = "neo4j-benchmark"
+CONTAINER_PASSWORD = "benchmark-password"
+CONTAINER_TIMEOUT = 120
+
+def top_keys(counts, n=TOP_PARAMS):
+    return [key for key, _ in counts.most_common(n)]
+
+def sample_parameters(data_dir=DATA_DIR, rows=SAMPLE_ROWS, top=TOP_PARAMS):
+    """Paramètres réalistes tirés des fichiers générés : utilisateurs qui
+    suivent le plus de comptes, posts les plus likés, tags et groupes les plus
+    fréquents"""
+    def read(filename):
+        return islice(read_rows(dataset_path(data_dir, filename)), rows)
+
+    following = Counter(row["followerId"] for row in read("follows.ndjson"))
+    posts = heapq.nlargest(top, read("posts.ndjson"), key=lambda post: post.get("likeCount") or 0)
+    tags = Counter(row["tagName"] for row in read("post_tags.ndjson"))
+    groups = Counter(row["groupId"] for row in read("group_members.ndjson"))
+    users = top_keys(following, top)
+    return {
+        "users": users,
+        "posts": [post["id"] for post in posts],
+        "tags": top_keys(tags, top),
+        "groups": top_keys(groups, top),
+    }
+
+def parse_weights(value, known, unknown):
+    """'timeline=4,tag=2' -> {'timeline': 4.0, 'tag': 2.0} ; un nom absent de
+    `known` est refusé avec le message `unknown`"""
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        if name not in known:
+            raise argparse.ArgumentTypeError(f"{unknown} dans --mix : {name}")
+        mix[name] = float(weight or 1)
+    return mix
+
+def parse_mix(value):
+    return parse_weights(value, WORKLOAD, "lecture inconnue")
+
+# Paramètres tirés des fichiers dont dépend chaque lecture (plus un lecteur)
+NEEDS = {"timeline": "users", "post": "posts", "tag": "tags", "group": "groups"}
+
+# Lecture rejouée -> (requête, paramètres tirés au hasard)
+WORKLOAD = {
+    "timeline": lambda p, rng: ("home_timeline", {
+        "userId": rng.choice(p["users"]), "limit": FEED_LIMIT, "before": None}),
+    "post": lambda p, rng: ("post_detail", {
+        "postId": rng.choice(p["posts"]), "viewerId": rng.choice(p["users"]), "commentLimit": COMMENT_LIMIT}),
+    "tag": lambda p, rng: ("tag_feed", {
+        "tag": rng.choice(p["tags"]), "viewerId": rng.choice(p["users"]), "limit": FEED_LIMIT, "before": None}),
+    "group": lambda p, rng: ("group_feed", {
+        "groupId": rng.choice(p["groups"]), "viewerId": rng.choice(p["users"]), "limit": FEED_LIMIT, "before": None}),
+    "moderation": lambda p, rng: ("moderation_queue", {
+        "statuses": list(MODERATION_STATUSES), "limit": MODERATION_LIMIT}),
+}
+
+def db_hits(plan):
+    """Somme des db hits d'un plan PROFILE et de ses sous-plans"""
+    if not plan:
+        return 0
+    return plan.get("dbHits", 0) + sum(db_hits(child) for child in plan.get("children", []))
+
+def percentiles(latencies):
+    """Percentiles en millisecondes d'une liste ou d'un tableau de durées en secondes"""
+    if not len(latencies):
+        return {}
+    ms = np.asarray(latencies) * 1000
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    return {"p50Ms": round(p50, 2), "p95Ms": round(p95, 2), "p99Ms": round(p99, 2),
+            "meanMs": round(ms.mean(), 2), "maxMs": round(ms.max(), 2)}
+
+class ReadBenchmark:
+    """Rejoue un mélange de lectures avec N clients concurrents.
+
+    Chaque client a sa session et son générateur de paramètres ; les latences
+    sont mesurées côté client, résultat entièrement lu. Les db hits viennent
+    de quelques exécutions PROFILE par type de lecture.
+    """
+
+    def __init__(self, uri, user, password, database=NEO4J_DATABASE):
+        self.driver = GraphDatabase.driver(uri, auth=(user, password))
+        self.database = database
+
+    def close(self):
+        self.driver.close()
+
+    def session(self):
+        return self.driver.session(database=self.database)
+
+    def profile(self, params, mix, samples=PROFILE_SAMPLES, seed=0):
+        """db hits moyens et lignes renvoyées par type de lecture"""
+        rng = random.Random(seed)
+        profiles = {}
+        with self.session() as session:
+            for kind in mix:
+                hits, rows = [], []
+                for _ in range(samples):
+                    name, query_params = WORKLOAD[kind](params, rng)
+                    summary = session.run("PROFILE " + READ_QUERIES[name], query_params).consume()
+                    hits.append(db_hits(summary.profile))
+                    rows.append((summary.profile or {}).get("rows", 0))
+                profiles[kind] = {"dbHitsMean": round(sum(hits) / samples, 1), "dbHitsMax": max(hits),
+                                  "rowsMean": round(sum(rows) / samples, 1)}
+        return profiles
+
+    def run(self, params, mix, clients=4, requests=1000, warmup=50, seed=0, start_timeout=START_TIMEOUT):
+        """Chaque client exécute `warmup` lectures non mesurées puis
+        `requests` lectures mesurées, tirées selon `mix`. Un client qui
+        s'arrête sur une erreur rompt le départ commun et fait échouer la mesure."""
+        kinds, weights = list(mix), list(mix.values())
+        latencies = {kind: [] for kind in kinds}
+        errors = Counter()
+        crashes = []
+        lock = threading.Lock()
+        start_barrier = threading.Barrier(clients + 1, timeout=start_timeout)
+
+        def client(index):
+            try:
+                measure(index)
+            except threading.BrokenBarrierError:
+                pass  # départ annulé par un autre client ou par le délai
+            except Exception as e:
+                start_barrier.abort()
+                with lock:
+                    crashes.append((index, e))
+
+        def measure(index):
+            rng = random.Random(seed * 1000 + index)
+            local = {kind: [] for kind in kinds}
+            failed = Counter()
+
+            def read(session):
+                kind = rng.choices(kinds, weights)[0]
+                name, query_params = WORKLOAD[kind](params, rng)
+                started = time.perf_counter()
+                try:
+                    session.execute_read(run_read, READ_QUERIES[name], query_params)
+                except Exception:
+                    failed[kind] += 1
+                    return kind, None
+                return kind, time.perf_counter() - started
+
+            with self.session() as session:
+                for _ in range(warmup):
+                    read(session)
+                failed.clear()
+                start_barrier.wait()
+                for _ in range(requests):
+                    kind, latency = read(session)
+                    if latency is not None:
+                        local[kind].append(latency)
+            with lock:
+                for kind in kinds:
+                    latencies[kind].extend(local[kind])
+                errors.update(failed)
+
+        threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+        for thread in threads:
+            thread.start()
+        try:
+            start_barrier.wait()
+        except threading.BrokenBarrierError:
+            pass
+        started = time.perf_counter()
+        for thread in threads:
+            thread.join()
+        seconds = time.perf_counter() - started
+        if crashes:
+            index, error = crashes[0]
+            raise RuntimeError(f"{len(crashes)}/{clients} clients arrêtés, dont le client {index} : "
+                               f"{type(error).__name__}: {error}") from error
+        if start_barrier.broken:
+            raise TimeoutError(f"les clients ne sont pas partis ensemble en {start_timeout}s")
+
+        everything = [latency for values in latencies.values() for latency in values]
+        return {
+            "seconds": round(seconds, 3),
+            "requests": len(everything),
+            "errors": sum(errors.values()),
+            "throughput": round(len(everything) / seconds, 1) if seconds else None,
+            **percentiles(everything),
+            "queries": {
+                kind: {"requests": len(latencies[kind]), "errors": errors[kind],
+                       "throughput": round(len(latencies[kind]) / seconds, 1) if seconds else None,
+                       **percentiles(latencies[kind])}
+                for kind in kinds
+            },
+        }
+
+def docker(*args, check=True):
+    return subprocess.run(["docker", *args], check=check, capture_output=True, text=True).stdout.strip()
+
+def start_container(image=CONTAINER_IMAGE, name=CONTAINER_NAME, timeout=CONTAINER_TIMEOUT):
+    """Démarre une base Neo4j locale jetable ; renvoie son URI bolt"""
+    docker("rm", "-f", name, check=False)
+    docker("run", "-d", "--rm", "--name", name, "-p", "127.0.0.1::7687",
+           "-e", f"NEO4J_AUTH=neo4j/{CONTAINER_PASSWORD}", image)
+    port = docker("port", name, "7687").splitlines()[0].rsplit(":", 1)[1]
+    uri = f"bolt://127.0.0.1:{port}"
+
+    print(f"🐳 Conteneur {name} ({image}) sur {uri}, attente de Neo4j...")
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            with GraphDatabase.driver(uri, auth=("neo4j", CONTAINER_PASSWORD)) as driver:
+                driver.verify_connectivity()
+            return uri
+        except (ServiceUnavailable, OSError):
+            if time.monotonic() > deadline:
+                docker("rm", "-f", name, check=False)
+                raise TimeoutError(f"Neo4j n'a pas démarré dans le conteneur en {timeout}s")
+            time.sleep(2)
+
+def import_into(uri, password, extra_args=()):
+    """Charge les fichiers de data/ (DATA_DIR d'import.py, relatif au répertoire
+    courant) avec import.py dans la base donnée"""
+    print("📥 Import des données dans le conteneur...")
+    env = {**os.environ, "NEO4J_URI": uri, "NEO4J_USER": "neo4j", "NEO4J_PASSWORD": password,
+           "NEO4J_DATABASE": "neo4j"}
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "import.py")
+    subprocess.run([sys.executable, script, "--fresh", *extra_args], check=True, env=env)
+
+def print_results(results):
+    print(f"\n📈 {results['requests']} lectures en {results['seconds']}s "
+          f"({results['throughput']} lectures/s, {results['errors']} erreurs)")
+    print(f"   p50 {results.get('p50Ms')} ms · p95 {results.get('p95Ms')} ms · p99 {results.get('p99Ms')} ms")
+    for kind, stats in results["queries"].items():
+        hits = results.get("profile", {}).get(kind, {}).get("dbHitsMean")
+        print(f"   {kind:<11} {stats['requests']:>7} lectures · p50 {stats.get('p50Ms')} ms · "
+              f"p95 {stats.get('p95Ms')} ms · p99 {stats.get('p99Ms')} ms · {hits} db hits")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark des lectures sur le graphe importé")
+    parser.add_argument("--clients", type=int, default=4, help="clients concurrents")
+    parser.add_argument("--requests", type=int, default=1000, help="lectures mesurées par client")
+    parser.add_argument("--warmup", type=int, default=50, help="lectures de chauffe par client")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix(DEFAULT_MIX),
+                        help=f"répartition des lectures (défaut {DEFAULT_MIX})")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--data-dir", default=DATA_DIR, help="fichiers d'où tirer les paramètres")
+    parser.add_argument("--output", default=RESULTS_FILE, help="fichier JSON des résultats")
+    parser.add_argument("--label", help="nom de la configuration mesurée (comparaison entre runs)")
+    parser.add_argument("--no-profile", action="store_true", help="ne pas mesurer les db hits (PROFILE)")
+    parser.add_argument("--container", action="store_true",
+                        help="démarrer une base Neo4j locale (Docker), y importer data/ puis mesurer")
+    parser.add_argument("--image", default=CONTAINER_IMAGE, help="image Docker de Neo4j (--container)")
+    parser.add_argument("--keep-container", action="store_true", help="laisser le conteneur tourner après la mesure")
+    args = parser.parse_args()
+    # import.py charge toujours ./data : les paramètres doivent venir des mêmes fichiers
+    if args.container and os.path.abspath(args.data_dir) != os.path.abspath(DATA_DIR):
+        parser.error(f"--container importe {DATA_DIR}/ : --data-dir {args.data_dir} n'est pas pris en charge")
+
+    uri, user, password = NEO4J_URI, NEO4J_USER, NEO4J_PASSWORD
+    if args.container:
+        uri = start_container(args.image)
+        user, password = "neo4j", CONTAINER_PASSWORD
+
+    try:
+        if args.container:
+            import_into(uri, password)
+        print("🎯 Tirage des paramètres dans les fichiers...")
+        params = sample_parameters(args.data_dir)
+        missing = [kind for kind in args.mix if kind in NEEDS and not (params[NEEDS[kind]] and params["users"])]
+        if missing:
+            parser.error(f"aucun paramètre dans {args.data_dir} pour : {', '.join(missing)}")
+
+        benchmark = ReadBenchmark(uri, user, password, database="neo4j" if args.container else NEO4J_DATABASE)
+        try:
+            print(f"⏱️  {args.clients} clients × {args.requests} lectures...")
+            results = benchmark.run(params, args.mix, args.clients, args.requests, args.warmup, args.seed)
+            if not args.no_profile:
+                results["profile"] = benchmark.profile(params, args.mix, seed=args.seed)
+        finally:
+            benchmark.close()
+    finally:
+        if args.container and not args.keep_container:
+            docker("rm", "-f", CONTAINER_NAME, check=False)
+
+    report = {
+        "label": args.label,
+        "startedAt": datetime.now().isoformat(timespec="seconds"),
+        "target": "container" if args.container else uri,
+        "config": {"clients": args.clients, "requests": args.requests, "warmup": args.warmup,
+                   "mix": args.mix, "seed": args.seed},
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print_results(results)
+    print(f"📊 Résultats écrits dans {args.output}")
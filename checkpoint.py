@@ -0,0 +1,51 @@
+import os
+import json
+import threading
+from datetime import datetime
+
+from dataset_io import open_reader
+
+class CheckpointManifest:
+    """Manifeste de reprise de l'import.
+    
+    Pour chaque étape : fichier lu, position du dernier lot validé, empreinte
+    SHA-256 du contenu jusqu'à cette position et étape terminée ou non.
+    """
+    
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.entries = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self.entries = json.load(f)
+    
+    def reader(self, stage, filepath):
+        """Lecteur qui reprend après le dernier lot validé de l'étape"""
+        entry = self.entries.get(stage)
+        if not entry or entry["file"] != filepath:
+            return open_reader(filepath)
+        return open_reader(filepath, entry["offset"], entry["sha256"])
+    
+    def commit(self, stage, reader, done=False):
+        """Enregistre la position du lecteur une fois le lot validé en base"""
+        with self.lock:
+            self.entries[stage] = {
+                "file": reader.filepath,
+                "offset": reader.offset,
+                "sha256": reader.digest,
+                "done": done,
+                "updatedAt": datetime.now().isoformat(timespec='seconds'),
+            }
+            self._save()
+    
+    def reset(self):
+        with self.lock:
+            self.entries = {}
+            self._save()
+    
+    def _save(self):
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f, indent=2)
+        os.replace(tmp, self.path)
@@ -0,0 +1,166 @@
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from dataset_io import batched
+
+# Posts recalculés par transaction et transactions simultanées
+RECOUNT_BATCH = 10000
+RECOUNT_WORKERS = 4
+
+# Tampon des écritures en continu : vidé toutes les FLUSH_INTERVAL secondes,
+# ou plus tôt dès que FLUSH_POSTS posts ont un delta en attente
+FLUSH_INTERVAL = 1.0
+FLUSH_POSTS = 5000
+
+POST_IDS_QUERY = "MATCH (p:Post) RETURN p.id AS id"
+
+# COUNT {} sur une seule relation typée se lit dans le degré stocké du nœud,
+# sans parcourir les relations ; seuls les compteurs faux sont réécrits
+RECOUNT_QUERY = """
+UNWIND $ids AS id
+MATCH (p:Post {id: id})
+WITH p, COUNT { (p)<-[:LIKED]-() } AS likes, COUNT { (p)<-[:ON]-() } AS comments
+WHERE p.likeCount IS NULL OR p.likeCount <> likes
+   OR p.commentCount IS NULL OR p.commentCount <> comments
+SET p.likeCount = likes,
+    p.commentCount = comments
+RETURN count(p) AS updated
+"""
+
+DELTA_QUERY = """
+UNWIND $rows AS delta
+MATCH (p:Post {id: delta.postId})
+SET p.likeCount = coalesce(p.likeCount, 0) + delta.likes,
+    p.commentCount = coalesce(p.commentCount, 0) + delta.comments
+"""
+
+def run_recount(tx, ids):
+    return tx.run(RECOUNT_QUERY, ids=ids).single()["updated"]
+
+def run_deltas(tx, rows):
+    return tx.run(DELTA_QUERY, rows=rows).consume()
+
+def recount_posts(session_factory, post_ids=None, batch_size=RECOUNT_BATCH, workers=RECOUNT_WORKERS):
+    """Recalcule likeCount et commentCount d'après le degré LIKED / ON.
+
+    Les posts (`post_ids`, ou tous les posts de la base) sont découpés en lots
+    disjoints écrits en parallèle : deux transactions ne touchent jamais le
+    même nœud. Renvoie (posts vérifiés, posts corrigés).
+    """
+    checked = updated = 0
+
+    def recount(ids):
+        with session_factory() as session:
+            return session.execute_write(run_recount, ids)
+
+    with session_factory() as reader, ThreadPoolExecutor(max_workers=workers) as pool:
+        if post_ids is None:
+            post_ids = (record["id"] for record in reader.run(POST_IDS_QUERY))
+        running = set()
+        for ids in batched(post_ids, lambda: batch_size):
+            if len(running) >= workers * 2:
+                done, running = wait(running, return_when=FIRST_COMPLETED)
+                updated += sum(f.result() for f in done)
+            running.add(pool.submit(recount, ids))
+            checked += len(ids)
+        updated += sum(f.result() for f in running)
+    return checked, updated
+
+class CounterBuffer:
+    """Deltas de likeCount / commentCount accumulés par post entre deux écritures.
+
+    Les écritures en continu appellent `add` au lieu de modifier le post à
+    chaque like : un post populaire reçoit une seule mise à jour par vidage,
+    quel que soit le nombre de likes reçus entre-temps. Le tampon est vidé
+    par un thread toutes les `interval` secondes (après `start`), dès que
+    `max_posts` posts sont en attente, et à la fermeture.
+    """
+
+    def __init__(self, session_factory, interval=FLUSH_INTERVAL, max_posts=FLUSH_POSTS, batch_size=RECOUNT_BATCH):
+        self.session = session_factory
+        self.interval = interval
+        self.max_posts = max_posts
+        self.batch_size = batch_size
+        self.deltas = defaultdict(lambda: [0, 0])
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.wake = threading.Event()
+        self.stopped = threading.Event()
+        self.thread = None
+        self.error = None
+        self.flushed_posts = 0
+        self.flushes = 0
+
+    def add(self, post_id, likes=0, comments=0):
+        with self.lock:
+            delta = self.deltas[post_id]
+            delta[0] += likes
+            delta[1] += comments
+            if len(self.deltas) >= self.max_posts:
+                self.wake.set()
+
+    def pending(self):
+        with self.lock:
+            return len(self.deltas)
+
+    def flush(self):
+        """Écrit les deltas en attente ; renvoie le nombre de posts mis à jour.
+        En cas d'échec les deltas des lots non écrits sont remis dans le tampon."""
+        with self.flush_lock:
+            with self.lock:
+                deltas, self.deltas = self.deltas, defaultdict(lambda: [0, 0])
+            # Ordre des identifiants fixe : deux vidages verrouillent les posts dans le même ordre
+            rows = [{"postId": post_id, "likes": likes, "comments": comments}
+                    for post_id, (likes, comments) in sorted(deltas.items()) if likes or comments]
+            if not rows:
+                return 0
+            written = 0
+            try:
+                with self.session() as session:
+                    for batch in batched(rows, lambda: self.batch_size):
+                        session.execute_write(run_deltas, batch)
+                        written += len(batch)
+            except Exception:
+                with self.lock:
+                    for row in rows[written:]:
+                        delta = self.deltas[row["postId"]]
+                        delta[0] += row["likes"]
+                        delta[1] += row["comments"]
+                raise
+            self.flushed_posts += len(rows)
+            self.flushes += 1
+            return len(rows)
+
+    def run(self):
+        while not self.stopped.is_set():
+            self.wake.wait(self.interval)
+            self.wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                self.error = e
+                return
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, name="counter-buffer", daemon=True)
+        self.thread.start()
+        return self
+
+    def close(self):
+        """Arrête le thread de vidage puis écrit les derniers deltas"""
+        if self.thread is not None:
+            self.stopped.set()
+            self.wake.set()
+            self.thread.join()
+            self.thread = None
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise error
+        self.flush()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
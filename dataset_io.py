@@ -0,0 +1,364 @@
+import io
+import os
+import glob
+import json
+import gzip
+import hashlib
+
+try:
+    import orjson
+except ImportError:  # décodeur de la bibliothèque standard
+    orjson = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # format colonnaire indisponible, NDJSON uniquement
+    pa = pq = None
+
+loads = orjson.loads if orjson else json.loads
+
+# Extensions reconnues, dans l'ordre de recherche
+COMPRESSIONS = ("", ".gz", ".zst")
+COLUMNAR_FORMATS = (".parquet", ".arrow")
+
+# Colonnes à faible cardinalité, encodées en dictionnaire dans les formats colonnaires
+DICTIONARY_COLUMNS = {
+    "visibility", "privacy", "community", "topic", "tagName",
+    "role", "reason", "status", "targetType",
+}
+
+# Fichiers d'un jeu de données découpé en parts : users.part-0000.ndjson, ...
+PART_GLOB = ".part-*"
+
+# Lignes par record batch en écriture et en lecture colonnaire
+RECORD_BATCH_ROWS = 65536
+
+def dataset_variants(base):
+    """Fichiers possibles pour un jeu de données (`base` sans extension)"""
+    return [base + ".ndjson" + c for c in COMPRESSIONS] + [base + f for f in COLUMNAR_FORMATS]
+
+def part_path(base, part, suffix):
+    """Fichier de la part `part` : base.part-0003.ndjson"""
+    return f"{base}.part-{part:04d}{suffix}"
+
+def dataset_path(data_dir, filename):
+    """Chemin du fichier `filename` : NDJSON éventuellement compressé (.gz, .zst)
+    ou sa version colonnaire (.parquet, .arrow). Un jeu de données découpé en
+    parts est désigné par un motif (data/users.part-*.ndjson)."""
+    base = os.path.join(data_dir, filename.removesuffix(".ndjson"))
+    for path in dataset_variants(base):
+        if os.path.exists(path):
+            return path
+    for pattern in dataset_variants(base + PART_GLOB):
+        if glob.glob(pattern):
+            return pattern
+    return os.path.join(data_dir, filename)
+
+def is_parts(filepath):
+    return PART_GLOB in filepath
+
+def dataset_exists(filepath):
+    return bool(glob.glob(filepath)) if is_parts(filepath) else os.path.exists(filepath)
+
+def is_columnar(filepath):
+    return filepath.endswith(COLUMNAR_FORMATS)
+
+def require_pyarrow(filepath):
+    if pa is None:
+        raise RuntimeError(f"{filepath} : le module pyarrow est requis pour les formats Parquet / Arrow")
+
+def open_binary(filepath):
+    """Ouvre un fichier en lecture binaire, décompressé à la volée"""
+    if filepath.endswith(".gz"):
+        return gzip.open(filepath, "rb")
+    if filepath.endswith(".zst"):
+        if zstandard is None:
+            raise RuntimeError(f"{filepath} : le module zstandard est requis pour lire les fichiers .zst")
+        return io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(open(filepath, "rb")))
+    return open(filepath, "rb")
+
+def open_writer(filepath):
+    """Ouvre un fichier en écriture binaire, compressé selon son extension"""
+    if filepath.endswith(".gz"):
+        return gzip.open(filepath, "wb", compresslevel=6)
+    if filepath.endswith(".zst"):
+        if zstandard is None:
+            raise RuntimeError(f"{filepath} : le module zstandard est requis pour écrire les fichiers .zst")
+        return zstandard.ZstdCompressor(level=10).stream_writer(open(filepath, "wb"))
+    return open(filepath, "wb")
+
+def dumps(row):
+    if orjson:
+        return orjson.dumps(row)
+    return json.dumps(row, ensure_ascii=False).encode("utf-8")
+
+def write_ndjson(filepath, rows):
+    """Écrit des lignes NDJSON, compressées si le nom finit par .gz ou .zst"""
+    with open_writer(filepath) as f:
+        for row in rows:
+            f.write(dumps(row) + b"\n")
+
+def columnar_schema(batch):
+    """Schéma d'écriture déduit du premier lot : colonnes dictionnaire pour les
+    valeurs répétées, chaînes pour les colonnes encore entièrement nulles"""
+    fields = []
+    for field in batch.schema:
+        kind = field.type
+        if pa.types.is_null(kind):
+            kind = pa.string()
+        if field.name in DICTIONARY_COLUMNS and pa.types.is_string(kind):
+            kind = pa.dictionary(pa.int32(), pa.string())
+        fields.append(pa.field(field.name, kind))
+    return pa.schema(fields)
+
+def write_columnar(filepath, rows):
+    """Écrit des lignes en Parquet ou Arrow IPC, un record batch à la fois"""
+    require_pyarrow(filepath)
+    writer = schema = None
+    dictionaries = {}
+    try:
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) < RECORD_BATCH_ROWS:
+                continue
+            writer, schema = write_record_batch(filepath, writer, schema, chunk, dictionaries)
+            chunk = []
+        if chunk or writer is None:
+            writer, schema = write_record_batch(filepath, writer, schema, chunk, dictionaries)
+    finally:
+        if writer is not None:
+            writer.close()
+
+def shared_dictionary_batch(batch, dictionaries):
+    """Réencode les colonnes dictionnaire sur un dictionnaire par colonne commun
+    à tous les lots, qui ne fait que s'allonger : le format de fichier Arrow IPC
+    accepte des ajouts (deltas) à un dictionnaire, pas son remplacement"""
+    columns = []
+    for field, column in zip(batch.schema, batch.columns):
+        if pa.types.is_dictionary(field.type):
+            positions = dictionaries.setdefault(field.name, {})
+            indices = [None if value is None else positions.setdefault(value, len(positions))
+                       for value in column.to_pylist()]
+            column = pa.DictionaryArray.from_arrays(pa.array(indices, pa.int32()),
+                                                    pa.array(list(positions), pa.string()))
+        columns.append(column)
+    return pa.RecordBatch.from_arrays(columns, schema=batch.schema)
+
+def write_record_batch(filepath, writer, schema, chunk, dictionaries):
+    if schema is None:
+        schema = columnar_schema(pa.RecordBatch.from_pylist(chunk))
+    batch = pa.RecordBatch.from_pylist(chunk, schema=schema)
+    if filepath.endswith(".parquet"):
+        if writer is None:
+            writer = pq.ParquetWriter(filepath, schema, compression="zstd")
+        writer.write_batch(batch)
+    else:
+        if writer is None:
+            options = pa.ipc.IpcWriteOptions(compression="zstd", emit_dictionary_deltas=True)
+            writer = pa.ipc.new_file(filepath, schema, options=options)
+        writer.write(shared_dictionary_batch(batch, dictionaries))
+    return writer, schema
+
+def write_dataset(filepath, rows):
+    """Écrit un jeu de données au format indiqué par l'extension"""
+    if is_columnar(filepath):
+        write_columnar(filepath, rows)
+    else:
+        write_ndjson(filepath, rows)
+
+def iter_record_batches(filepath):
+    require_pyarrow(filepath)
+    if filepath.endswith(".parquet"):
+        yield from pq.ParquetFile(filepath).iter_batches(batch_size=RECORD_BATCH_ROWS)
+        return
+    with pa.memory_map(filepath) as source:
+        reader = pa.ipc.open_file(source)
+        for i in range(reader.num_record_batches):
+            yield reader.get_batch(i)
+
+class NdjsonReader:
+    """Lecture NDJSON en flux (fichier brut, .gz ou .zst) qui suit la position
+    (en octets décompressés) et l'empreinte SHA-256 du contenu déjà lu.
+
+    Avec `offset` et `digest`, la lecture reprend à `offset` si le début du
+    fichier a toujours la même empreinte ; sinon elle repart du début.
+    """
+
+    def __init__(self, filepath, offset=0, digest=None):
+        self.filepath = filepath
+        self.start = offset
+        self.expected = digest
+        self.offset = 0
+        self.hash = hashlib.sha256()
+        self.resumed = False
+
+    @property
+    def digest(self):
+        return self.hash.hexdigest()
+
+    def __iter__(self):
+        f = open_binary(self.filepath)
+        try:
+            if self.start and not self._resume(f):
+                # Contenu modifié depuis le dernier import : relecture complète
+                f.close()
+                f = open_binary(self.filepath)
+            for line in f:
+                self.offset += len(line)
+                self.hash.update(line)
+                if line.strip():
+                    yield loads(line)
+        finally:
+            f.close()
+
+    def _resume(self, f):
+        remaining = self.start
+        while remaining:
+            chunk = f.read(min(remaining, 1 << 20))
+            if not chunk:
+                break
+            self.hash.update(chunk)
+            remaining -= len(chunk)
+
+        if remaining == 0 and self.digest == self.expected:
+            self.offset = self.start
+            self.resumed = True
+        else:
+            self.hash = hashlib.sha256()
+        return self.resumed
+
+class ColumnarReader:
+    """Lecture d'un fichier Parquet ou Arrow IPC par record batches, chaque lot
+    converti d'un bloc en liste de lignes.
+
+    Les lignes restent des dicts, une par ligne : le filtre d'intégrité les
+    contrôle une à une et les requêtes UNWIND $rows attendent une liste de
+    maps, que le driver sérialise de toute façon ligne par ligne. Le format
+    colonnaire évite le décodage JSON, pas la construction de ces dicts.
+
+    La position est un nombre de lignes et l'empreinte celle du fichier
+    entier : un fichier colonnaire ne se complète pas, s'il a changé la
+    lecture repart du début.
+    """
+
+    def __init__(self, filepath, offset=0, digest=None):
+        self.filepath = filepath
+        self.start = offset
+        self.expected = digest
+        self.offset = 0
+        self.resumed = False
+        self._digest = None
+
+    @property
+    def digest(self):
+        if self._digest is None:
+            h = hashlib.sha256()
+            with open(self.filepath, "rb") as f:
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    h.update(chunk)
+            self._digest = h.hexdigest()
+        return self._digest
+
+    def __iter__(self):
+        skip = 0
+        if self.start and self.digest == self.expected:
+            skip = self.offset = self.start
+            self.resumed = True
+
+        for batch in iter_record_batches(self.filepath):
+            if skip >= batch.num_rows:
+                skip -= batch.num_rows
+                continue
+            if skip:
+                batch = batch.slice(skip)
+                skip = 0
+            for row in batch.to_pylist():
+                self.offset += 1
+                yield row
+
+def content_digest(filepath):
+    """Empreinte d'un fichier entier, identique à celle de son lecteur arrivé au bout"""
+    if is_columnar(filepath):
+        return ColumnarReader(filepath).digest
+    h = hashlib.sha256()
+    with open_binary(filepath) as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+class PartsReader:
+    """Lecture d'un jeu de données découpé en parts, dans l'ordre des numéros.
+
+    La position est [part en cours, position dans la part] et l'empreinte
+    [empreintes des parts terminées, empreinte de la part en cours]. La
+    reprise vérifie d'abord que les parts terminées n'ont pas changé.
+    """
+
+    def __init__(self, filepath, offset=0, digest=None):
+        self.filepath = filepath
+        self.parts = sorted(glob.glob(filepath))
+        self.start = offset
+        self.expected = digest
+        self.done = []
+        self.current = None
+        self.resumed = False
+
+    @property
+    def offset(self):
+        return [len(self.done), self.current.offset if self.current else 0]
+
+    @property
+    def digest(self):
+        return [list(self.done), self.current.digest if self.current else None]
+
+    def __iter__(self):
+        index, part_offset, part_digest = 0, 0, None
+        if self.start and self.expected:
+            index, part_offset = self.start
+            done, part_digest = self.expected
+            if len(done) == index <= len(self.parts) and all(
+                    content_digest(path) == d for path, d in zip(self.parts, done)):
+                self.done = list(done)
+                self.resumed = True
+            else:
+                index, part_offset, part_digest = 0, 0, None
+
+        for i in range(index, len(self.parts)):
+            if i == index:
+                self.current = open_reader(self.parts[i], part_offset, part_digest)
+            else:
+                self.current = open_reader(self.parts[i])
+            yield from self.current
+            self.done.append(self.current.digest)
+            self.current = None
+
+def open_reader(filepath, offset=0, digest=None):
+    """Lecteur adapté au format du fichier (ou au motif de ses parts)"""
+    if is_parts(filepath):
+        return PartsReader(filepath, offset, digest)
+    reader = ColumnarReader if is_columnar(filepath) else NdjsonReader
+    return reader(filepath, offset, digest)
+
+def read_rows(filepath):
+    """Lit un jeu de données ligne par ligne, sans le charger en mémoire"""
+    return iter(open_reader(filepath))
+
+def batched(rows, size):
+    """Découpe un itérable en listes de `size` éléments au plus
+    (`size` peut être une fonction, relue à chaque lot)"""
+    current = size if callable(size) else lambda: size
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= current():
+            yield batch
+            batch = []
+    if batch:
+        yield batch
@@ -0,0 +1,111 @@
+import numpy as np
+
+# Popularité des posts : loi de Pareto (forme plus petite = queue plus lourde)
+POPULARITY_SHAPE = 1.5
+
+# Probabilité d'accepter un utilisateur tiré au hasard selon sa communauté
+# (même communauté que l'auteur du post ou non)
+SAME_COMMUNITY_ACCEPT = 0.7
+OTHER_COMMUNITY_ACCEPT = 0.3
+
+# Probabilité de garder un commentaire de l'auteur sur son propre post
+SELF_COMMENT_ACCEPT = 0.4
+
+# Lignes générées par bloc et tirages de remplacement pour les doublons
+ENGAGEMENT_CHUNK = 1 << 22
+REDRAW_ROUNDS = 4
+
+def later_duplicates(keys):
+    """Masque des clés déjà vues plus tôt dans le tableau"""
+    order = np.argsort(keys, kind="stable")
+    ordered = keys[order]
+    duplicate = np.zeros(keys.size, dtype=bool)
+    duplicate[order[1:][ordered[1:] == ordered[:-1]]] = True
+    return duplicate
+
+class EngagementGenerator:
+    """Likes et commentaires générés par blocs de tableaux NumPy.
+
+    Le nombre d'interactions de chaque post suit sa popularité (Pareto),
+    l'utilisateur est tiré avec la même affinité de communauté que le tirage
+    par rejet d'origine et la date tombe entre la création du post et
+    aujourd'hui. Les couples (post, utilisateur) des likes sont dédoublonnés
+    sur des clés entières ; les blocs regroupent des posts entiers, si bien
+    qu'un doublon ne peut apparaître qu'à l'intérieur d'un bloc.
+    """
+
+    def __init__(self, post_authors, post_days, n_users, n_comm, seed, chunk_size=ENGAGEMENT_CHUNK):
+        self.authors = np.asarray(post_authors, dtype=np.int64)
+        self.days = np.asarray(post_days, dtype=np.int64)
+        self.n_users = n_users
+        self.n_comm = n_comm
+        self.seed = seed
+        self.chunk_size = chunk_size
+        self.sizes = (n_users - np.arange(n_comm) + n_comm - 1) // n_comm
+        # Part des tirages acceptés qui viennent de la communauté de l'auteur
+        same = SAME_COMMUNITY_ACCEPT / n_comm
+        other = OTHER_COMMUNITY_ACCEPT * (n_comm - 1) / n_comm
+        self.p_same = same / (same + other) if n_comm > 1 else 1.0
+        rng = np.random.default_rng([seed, 2])
+        self.popularity = rng.pareto(POPULARITY_SHAPE, len(self.authors)) + 1
+
+    def counts(self, total, rng):
+        """Nombre d'interactions par post, proportionnel à sa popularité"""
+        counts = rng.multinomial(total, self.popularity / self.popularity.sum())
+        return np.minimum(counts, self.n_users - 1)
+
+    def post_blocks(self, counts):
+        """Découpe les posts en blocs d'environ chunk_size interactions"""
+        ends = np.cumsum(counts)
+        bounds = np.searchsorted(ends, np.arange(self.chunk_size, ends[-1] if len(ends) else 0, self.chunk_size))
+        start = 0
+        for stop in list(bounds + 1) + [len(counts)]:
+            if stop > start:
+                yield np.arange(start, stop)
+                start = stop
+
+    def pick_users(self, posts, rng):
+        """Un utilisateur par post : même communauté que l'auteur avec p_same"""
+        community = self.authors[posts] % self.n_comm
+        if self.n_comm > 1:
+            shift = rng.integers(1, self.n_comm, posts.size)
+            community = np.where(rng.random(posts.size) < self.p_same, community, (community + shift) % self.n_comm)
+        return community + self.n_comm * (rng.random(posts.size) * self.sizes[community]).astype(np.int64)
+
+    def after_post(self, posts, rng):
+        """Ancienneté en jours d'une interaction, jamais avant le post"""
+        return (rng.random(posts.size) * (self.days[posts] + 1)).astype(np.int64)
+
+    def likes(self, total):
+        """Blocs (posts, utilisateurs, jours) de likes sans doublon ni auto-like"""
+        rng = np.random.default_rng([self.seed, 3])
+        counts = self.counts(total, rng)
+        for block in self.post_blocks(counts):
+            posts = np.repeat(block, counts[block])
+            users = self.pick_users(posts, rng)
+            invalid = self.invalid_likes(posts, users)
+            for _ in range(REDRAW_ROUNDS):
+                if not invalid.any():
+                    break
+                users[invalid] = self.pick_users(posts[invalid], rng)
+                invalid = self.invalid_likes(posts, users)
+            posts, users = posts[~invalid], users[~invalid]
+            yield posts, users, self.after_post(posts, rng)
+
+    def invalid_likes(self, posts, users):
+        return (users == self.authors[posts]) | later_duplicates(posts * self.n_users + users)
+
+    def comments(self, total):
+        """Blocs (posts, utilisateurs, jours) de commentaires ; l'auteur du post
+        commente moins souvent ses propres posts"""
+        rng = np.random.default_rng([self.seed, 4])
+        counts = self.counts(total, rng)
+        for block in self.post_blocks(counts):
+            posts = np.repeat(block, counts[block])
+            users = self.pick_users(posts, rng)
+            for _ in range(REDRAW_ROUNDS):
+                redraw = (users == self.authors[posts]) & (rng.random(posts.size) >= SELF_COMMENT_ACCEPT)
+                if not redraw.any():
+                    break
+                users[redraw] = self.pick_users(posts[redraw], rng)
+            yield posts, users, self.after_post(posts, rng)
@@ -0,0 +1,277 @@
+import os
+import csv
+import argparse
+from collections import defaultdict, namedtuple
+from datetime import datetime
+
+from dataset_io import dataset_exists, dataset_path, read_rows
+from integrity import IdIndex, IntegrityChecker
+
+DATA_DIR = "data"
+OUT_DIR = "admin_import"
+REJECTS_FILENAME = "rejects.ndjson"
+
+# Un fichier CSV produit : nom, en-tête neo4j-admin et fonction ligne NDJSON -> colonnes
+# (None = la ligne n'alimente pas ce fichier)
+Output = namedtuple("Output", "filename header row")
+
+def first_seen(key):
+    """Ne garde que la première occurrence d'une valeur (nœuds dictionnaire comme Tag)"""
+    seen = set()
+    def keep(row):
+        value = row[key]
+        if value in seen:
+            return False
+        seen.add(value)
+        return True
+    return keep
+
+def target_of(target_type):
+    """Arêtes TARGET d'un report vers un type de cible donné"""
+    def row(r):
+        if r["targetType"] != target_type:
+            return None
+        return [r["reportId"], r["targetId"], "TARGET"]
+    return row
+
+def tag_rows():
+    keep = first_seen("tagName")
+    return lambda pt: [pt["tagName"], "Tag"] if keep(pt) else None
+
+def topic_rows():
+    keep = first_seen("topic")
+    def row(p):
+        if not p.get("topic") or not keep(p):
+            return None
+        return [p["topic"], p["topic"].removeprefix("topic_").replace("_", " ").capitalize(), "Topic"]
+    return row
+
+# Fichier source -> fichiers CSV produits. Mêmes propriétés que import.py, et
+# mêmes filtres (integrity.RULES de l'étape du même nom : champs obligatoires,
+# orphelins, doublons), que neo4j-admin refuserait
+EXPORTS = {
+    "users.ndjson": [
+        Output("users.csv",
+               ["id:ID(User)", "username", "name", "privacy", "createdAt:datetime", ":LABEL"],
+               lambda u: [u["id"], u.get("username"), u.get("name"), u.get("privacy"), u.get("createdAt"), "User"]),
+    ],
+    "follows.ndjson": [
+        Output("follows.csv",
+               [":START_ID(User)", ":END_ID(User)", "since:datetime", ":TYPE"],
+               lambda f: [f["followerId"], f["followedId"], f.get("since"), "FOLLOWS"]),
+    ],
+    "posts.ndjson": [
+        Output("posts.csv",
+               ["id:ID(Post)", "content", "mediaUrl", "visibility", "likeCount:long", "commentCount:long",
+                "createdAt:datetime", ":LABEL"],
+               lambda p: [p["id"], p.get("content"), p.get("mediaUrl"), p.get("visibility"),
+                          p.get("likeCount"), p.get("commentCount"), p.get("createdAt"), "Post"]),
+        Output("posted.csv",
+               [":START_ID(User)", ":END_ID(Post)", ":TYPE"],
+               lambda p: [p["authorId"], p["id"], "POSTED"]),
+        Output("topics.csv", ["id:ID(Topic)", "name", ":LABEL"], topic_rows()),
+        Output("in_topic.csv",
+               [":START_ID(Post)", ":END_ID(Topic)", ":TYPE"],
+               lambda p: [p["id"], p["topic"], "IN_TOPIC"] if p.get("topic") else None),
+    ],
+    "post_tags.ndjson": [
+        Output("tags.csv", ["name:ID(Tag)", ":LABEL"], tag_rows()),
+        Output("tagged_with.csv",
+               [":START_ID(Post)", ":END_ID(Tag)", ":TYPE"],
+               lambda pt: [pt["postId"], pt["tagName"], "TAGGED_WITH"]),
+    ],
+    "likes.ndjson": [
+        Output("liked.csv",
+               [":START_ID(User)", ":END_ID(Post)", "likedAt:datetime", ":TYPE"],
+               lambda l: [l["userId"], l["postId"], l.get("likedAt"), "LIKED"]),
+    ],
+    "comments.ndjson": [
+        Output("comments.csv",
+               ["id:ID(Comment)", "content", "createdAt:datetime", ":LABEL"],
+               lambda c: [c["id"], c.get("content"), c.get("createdAt"), "Comment"]),
+        Output("commented.csv",
+               [":START_ID(User)", ":END_ID(Comment)", ":TYPE"],
+               lambda c: [c["authorId"], c["id"], "COMMENTED"]),
+        Output("on.csv",
+               [":START_ID(Comment)", ":END_ID(Post)", ":TYPE"],
+               lambda c: [c["id"], c["postId"], "ON"]),
+    ],
+    "groups.ndjson": [
+        Output("groups.csv",
+               ["id:ID(Group)", "name", "description", "visibility", "createdAt:datetime", ":LABEL"],
+               lambda g: [g["id"], g.get("name"), g.get("description"), g.get("visibility"), g.get("createdAt"), "Group"]),
+        Output("created.csv",
+               [":START_ID(User)", ":END_ID(Group)", ":TYPE"],
+               lambda g: [g["createdBy"], g["id"], "CREATED"]),
+    ],
+    "group_members.ndjson": [
+        Output("member_of.csv",
+               [":START_ID(User)", ":END_ID(Group)", "role", "joinedAt:datetime", ":TYPE"],
+               lambda m: [m["userId"], m["groupId"], m.get("role"), m.get("joinedAt"), "MEMBER_OF"]),
+    ],
+    "reports.ndjson": [
+        Output("reports.csv",
+               ["id:ID(Report)", "reason", "status", "createdAt:datetime", ":LABEL"],
+               lambda r: [r["id"], r.get("reason"), r.get("status"), r.get("createdAt"), "Report"]),
+    ],
+    "report_relations.ndjson": [
+        Output("reported.csv",
+               [":START_ID(User)", ":END_ID(Report)", ":TYPE"],
+               lambda r: [r["reportedBy"], r["reportId"], "REPORTED"]),
+        Output("target_post.csv",
+               [":START_ID(Report)", ":END_ID(Post)", ":TYPE"], target_of("Post")),
+        Output("target_comment.csv",
+               [":START_ID(Report)", ":END_ID(Comment)", ":TYPE"], target_of("Comment")),
+        Output("target_user.csv",
+               [":START_ID(Report)", ":END_ID(User)", ":TYPE"], target_of("User")),
+    ],
+}
+
+def export(data_dir=DATA_DIR, out_dir=OUT_DIR, check_integrity=True):
+    """Convertit les fichiers NDJSON en CSV neo4j-admin, une ligne à la fois.
+    Les lignes rejetées (voir integrity.py) vont dans out_dir/rejects.ndjson."""
+    os.makedirs(out_dir, exist_ok=True)
+    written = []
+    # L'import neo4j-admin part d'une base vide : les couples en double sont rejetés
+    integrity = IntegrityChecker(os.path.join(out_dir, REJECTS_FILENAME), dedup_pairs=True)
+    def read_nodes(filename):
+        path = dataset_path(data_dir, filename)
+        return read_rows(path) if dataset_exists(path) else []
+
+    if check_integrity:
+        print("🔍 Index des identifiants pour le contrôle d'intégrité...")
+        integrity.build(read_nodes)
+    try:
+        for source, outputs in EXPORTS.items():
+            written += export_source(integrity, data_dir, out_dir, source, outputs)
+    finally:
+        integrity.close()
+    return written
+
+def export_source(integrity, data_dir, out_dir, source, outputs):
+    """Écrit les CSV d'un fichier source ; renvoie les fichiers produits"""
+    path = dataset_path(data_dir, source)
+    if not dataset_exists(path):
+        print(f"⚠️  {source} introuvable, ignoré")
+        return []
+
+    stage = source.removesuffix(".ndjson")
+    files = [open(os.path.join(out_dir, o.filename), "w", encoding="utf-8", newline="") for o in outputs]
+    try:
+        writers = [csv.writer(f) for f in files]
+        for writer, output in zip(writers, outputs):
+            writer.writerow(output.header)
+
+        counts = [0] * len(outputs)
+        for row in integrity.filter(stage, read_rows(path)):
+            for i, output in enumerate(outputs):
+                values = output.row(row)
+                if values is not None:
+                    writers[i].writerow(values)
+                    counts[i] += 1
+    finally:
+        for f in files:
+            f.close()
+
+    for output, count in zip(outputs, counts):
+        print(f"✅ {output.filename} : {count} lignes")
+    rejected = integrity.counts(stage)
+    if rejected:
+        print(f"⚠️  {source} : lignes rejetées {rejected} (voir {os.path.join(out_dir, REJECTS_FILENAME)})")
+    return outputs
+
+def admin_command(outputs, out_dir=OUT_DIR, database="neo4j"):
+    """Commande neo4j-admin correspondant aux fichiers produits"""
+    args = ["neo4j-admin database import full", "--overwrite-destination", "--multiline-fields=true"]
+    for output in outputs:
+        kind = "--relationships" if output.header[0].startswith(":START_ID") else "--nodes"
+        args.append(f"{kind}={os.path.join(out_dir, output.filename)}")
+    args.append(database)
+    return " \\\n  ".join(args)
+
+def id_space(column):
+    """':ID(User)' ou 'id:ID(User)' -> ('ID', 'User')"""
+    spec = column.split(":", 1)[1] if ":" in column else ""
+    kind, _, space = spec.partition("(")
+    return kind, space.rstrip(")")
+
+def check_value(column, value):
+    """Vérifie qu'une valeur typée est acceptée par neo4j-admin"""
+    if value == "":
+        return True
+    kind = id_space(column)[0]
+    try:
+        if kind == "datetime":
+            datetime.fromisoformat(value)
+        elif kind in ("long", "int"):
+            int(value)
+    except ValueError:
+        return False
+    return True
+
+def validate(out_dir=OUT_DIR):
+    """Validation hors ligne : en-têtes, types, doublons d'ID et extrémités des relations"""
+    ids = defaultdict(IdIndex)
+    errors = defaultdict(int)
+    node_files, rel_files = [], []
+
+    for filename in sorted(os.listdir(out_dir)):
+        if not filename.endswith(".csv"):
+            continue
+        with open(os.path.join(out_dir, filename), encoding="utf-8", newline="") as f:
+            header = next(csv.reader(f), None)
+        if not header:
+            errors[f"{filename}: en-tête manquant"] += 1
+        elif header[0].startswith(":START_ID"):
+            rel_files.append((filename, header))
+        else:
+            node_files.append((filename, header))
+
+    # Les nœuds d'abord, pour connaître les ID de chaque espace
+    for filename, header in node_files + rel_files:
+        columns = [(i, c, id_space(c)) for i, c in enumerate(header)]
+        with open(os.path.join(out_dir, filename), encoding="utf-8", newline="") as f:
+            reader = csv.reader(f)
+            next(reader)
+            for values in reader:
+                if len(values) != len(header):
+                    errors[f"{filename}: nombre de colonnes"] += 1
+                    continue
+                for i, column, (kind, space) in columns:
+                    value = values[i]
+                    if kind == "ID":
+                        if not ids[space].add(value):
+                            errors[f"{filename}: ID {space} en double"] += 1
+                    elif kind in ("START_ID", "END_ID"):
+                        if value not in ids[space]:
+                            errors[f"{filename}: {kind} inconnu dans {space}"] += 1
+                    elif not check_value(column, value):
+                        errors[f"{filename}: valeur invalide pour {column}"] += 1
+
+    for space, values in sorted(ids.items()):
+        print(f"  {space}: {len(values)} nœuds")
+    if errors:
+        for message, count in sorted(errors.items()):
+            print(f"❌ {message} ({count})")
+    else:
+        print("✅ Export valide")
+    return dict(errors)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export des NDJSON au format CSV de neo4j-admin import")
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    parser.add_argument("--out", default=OUT_DIR)
+    parser.add_argument("--validate", action="store_true", help="valider les CSV produits après l'export")
+    parser.add_argument("--no-integrity", action="store_true",
+                        help="ne pas écarter les lignes orphelines (références inconnues) ; les doublons restent écartés")
+    parser.add_argument("--validate-only", action="store_true", help="valider les CSV existants sans exporter")
+    args = parser.parse_args()
+
+    if not args.validate_only:
+        print("📦 Export CSV pour neo4j-admin...")
+        outputs = export(args.data_dir, args.out, check_integrity=not args.no_integrity)
+        print("\n" + admin_command(outputs, args.out))
+    if args.validate or args.validate_only:
+        print("\n🔍 Validation...")
+        if validate(args.out):
+            raise SystemExit(1)
@@ -0,0 +1,122 @@
+import numpy as np
+
+# Follows par utilisateur : cœur de communauté, liens intercommunautés,
+# attachement préférentiel (meilleur in-degree parmi ATTACH_CANDIDATES tirages)
+CORE_DEGREE = 15
+INTER_PER_USER = 2
+ATTACH_PER_USER = 3
+ATTACH_CANDIDATES = 20
+
+# Tours d'attachement par bloc : les in-degrees sont remis à jour entre deux tours
+ATTACH_ROUNDS = 8
+
+# Utilisateurs sources traités par bloc (borne la mémoire de travail)
+CHUNK_USERS = 1 << 20
+
+class FollowGraph:
+    """Graphe orienté des follows, généré par blocs d'utilisateurs sources.
+
+    Communauté de l'utilisateur i : i % n_comm. Chaque bloc est produit en
+    CSR (indptr, indices) à partir de tableaux NumPy ; seul le vecteur des
+    in-degrees est gardé pour tout le graphe. Le premier passage compte les
+    in-degrees des liens de communauté et intercommunautés, le second les
+    régénère (même graine par bloc) et ajoute l'attachement préférentiel.
+
+    Les deux passages acceptent une plage de sources [lo, hi) : des shards
+    peuvent compter puis générer chacun leur plage, les in-degrees du
+    premier passage étant additionnés entre shards.
+    """
+
+    def __init__(self, n_users, n_comm, seed, chunk_size=CHUNK_USERS):
+        self.n_users = n_users
+        self.n_comm = n_comm
+        self.seed = seed
+        self.chunk_size = chunk_size
+        self.in_degree = np.zeros(n_users, dtype=np.int64)
+        self.edges = 0
+
+    def community_sizes(self):
+        c = np.arange(self.n_comm)
+        return (self.n_users - c + self.n_comm - 1) // self.n_comm
+
+    def base_edges(self, lo, hi):
+        """Liens de communauté et intercommunautés des sources [lo, hi)"""
+        rng = np.random.default_rng([self.seed, 0, lo])
+        sizes = self.community_sizes()
+        sources = np.arange(lo, hi, dtype=np.int64)
+        community = sources % self.n_comm
+
+        # Cœur dense : jusqu'à CORE_DEGREE membres de la communauté de la source
+        positions = (rng.random((hi - lo, CORE_DEGREE)) * sizes[community][:, None]).astype(np.int64)
+        core_dst = community[:, None] + self.n_comm * positions
+        keep = np.arange(CORE_DEGREE)[None, :] < np.minimum(sizes[community], CORE_DEGREE)[:, None]
+        core_src = np.broadcast_to(sources[:, None], core_dst.shape)[keep]
+        core_dst = core_dst[keep]
+
+        # Liens vers d'autres communautés
+        inter_src = rng.integers(lo, hi, (hi - lo) * INTER_PER_USER)
+        inter_dst = rng.integers(0, self.n_users, inter_src.size)
+        other = inter_src % self.n_comm != inter_dst % self.n_comm
+
+        return np.concatenate([core_src, inter_src[other]]), np.concatenate([core_dst, inter_dst[other]])
+
+    def attach_edges(self, lo, hi):
+        """Attachement préférentiel : chaque tirage suit le candidat de plus fort in-degree"""
+        rng = np.random.default_rng([self.seed, 1, lo])
+        total = (hi - lo) * ATTACH_PER_USER
+        src, dst = [], []
+        for r in range(ATTACH_ROUNDS):
+            n = total * (r + 1) // ATTACH_ROUNDS - total * r // ATTACH_ROUNDS
+            sources = rng.integers(lo, hi, n)
+            candidates = rng.integers(0, self.n_users, (n, ATTACH_CANDIDATES))
+            best = candidates[np.arange(n), np.argmax(self.in_degree[candidates], axis=1)]
+            self.in_degree += np.bincount(best, minlength=self.n_users)
+            src.append(sources)
+            dst.append(best)
+        return np.concatenate(src), np.concatenate(dst)
+
+    def dedup(self, lo, hi, src, dst):
+        """CSR du bloc sans boucles ni doublons, cibles triées par source"""
+        keys = (src - lo) * self.n_users + dst
+        keys.sort()
+        first = np.empty(keys.size, dtype=bool)
+        first[:1] = True
+        np.not_equal(keys[1:], keys[:-1], out=first[1:])
+        keys = keys[first & (keys // self.n_users + lo != keys % self.n_users)]
+        indptr = np.zeros(hi - lo + 1, dtype=np.int64)
+        np.cumsum(np.bincount(keys // self.n_users, minlength=hi - lo), out=indptr[1:])
+        return indptr, (keys % self.n_users).astype(np.int32)
+
+    def chunks(self, lo, hi):
+        for start in range(lo, hi, self.chunk_size):
+            yield start, min(start + self.chunk_size, hi)
+
+    def base_degree(self, lo=0, hi=None):
+        """In-degrees des liens de communauté et intercommunautés des sources [lo, hi)"""
+        degree = np.zeros(self.n_users, dtype=np.int64)
+        for start, stop in self.chunks(lo, self.n_users if hi is None else hi):
+            indptr, indices = self.dedup(start, stop, *self.base_edges(start, stop))
+            degree += np.bincount(indices, minlength=self.n_users)
+        return degree
+
+    def blocks(self, lo=0, hi=None, base=None):
+        """Blocs (lo, indptr, indices) des sources [lo, hi).
+
+        `base` : in-degrees du premier passage sur tout le graphe (calculés
+        ici si absents). À la fin, in_degree contient les in-degrees exacts
+        des arêtes produites par ces blocs.
+        """
+        hi = self.n_users if hi is None else hi
+        self.in_degree = self.base_degree() if base is None else base.copy()
+
+        # Les tirages éliminés comme doublons ou boucles ne comptent pas
+        exact = np.zeros(self.n_users, dtype=np.int64)
+        self.edges = 0
+        for start, stop in self.chunks(lo, hi):
+            src, dst = self.base_edges(start, stop)
+            attach_src, attach_dst = self.attach_edges(start, stop)
+            indptr, indices = self.dedup(start, stop, np.concatenate([src, attach_src]), np.concatenate([dst, attach_dst]))
+            exact += np.bincount(indices, minlength=self.n_users)
+            self.edges += len(indices)
+            yield start, indptr, indices
+        self.in_degree = exact
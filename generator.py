@@ -1,13 +1,19 @@
+import os
+import glob
 import random
-import json
-import math
+import argparse
 from collections import defaultdict
-from faker import Faker
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
 from datetime import datetime, timedelta
 
-fake = Faker("fr_FR")
-Faker.seed(42)
-random.seed(42)
+from dataset_io import PART_GLOB, dataset_variants, part_path, write_dataset
+from engagement import EngagementGenerator
+from follow_graph import FollowGraph
+from textgen import TextSynth
+
+# Textes et identités en français, assemblés par lots (interface de Faker)
+fake = TextSynth()
 
 # ============================================
 # PARAMÈTRES
@@ -19,6 +25,20 @@ TARGET_COMMENTS = 8000
 N_GROUPS = 50
 N_REPORTS = 200
 DAYS = 365
+SEED = 42
+DATA_DIR = "data"
+
+# Date de référence des dates générées (ISO) ; None = date et heure du lancement
+REFERENCE_DATE = None
+
+# Jeux de données produits, dans l'ordre de génération
+DATASETS = ["users", "follows", "posts", "post_tags", "likes", "comments",
+            "groups", "group_members", "reports", "report_relations"]
+
+# Format des fichiers produits : "ndjson", "parquet" ou "arrow"
+OUTPUT_FORMAT = "ndjson"
+# Compression des fichiers NDJSON : None, "gz" ou "zst"
+COMPRESSION = None
 
 # Communautés avec leurs topics et tags
 COMMUNITIES = [
@@ -30,6 +50,18 @@ COMMUNITIES = [
 ]
 N_COMM = len(COMMUNITIES)
 
+# Liste de tags par communauté (plus cohérent)
+COMMUNITY_TAGS = {
+    "tech": ["ia", "python", "dev", "cloud", "api", "javascript", "docker", "kubernetes", "react", "nodejs"],
+    "sport": ["running", "fitness", "yoga", "football", "natation", "cyclisme", "musculation", "marathon", "crossfit", "nutrition"],
+    "gaming": ["fps", "rpg", "esport", "console", "pc", "streaming", "mmo", "indie", "multiplayer", "vr"],
+    "cuisine": ["recette", "veggie", "dessert", "chef", "restaurant", "patisserie", "bio", "vegan", "gastronomie", "streetfood"],
+    "voyage": ["montagne", "plage", "roadtrip", "backpack", "citytrip", "aventure", "camping", "randonnee", "photographie", "culture"]
+}
+
+# Tags génériques populaires
+GENERIC_TAGS = ["inspiration", "lifestyle", "weekend", "motivation", "friends", "family", "nature", "art", "music", "fun"]
+
 # Privacy pour users : 55% private, 45% public
 PRIVACY_OPTIONS = ["private", "public"]
 PRIVACY_WEIGHTS = [0.55, 0.45]
@@ -45,381 +77,466 @@ REPORT_STATUS = ["open", "in_review", "resolved", "dismissed"]
 # ============================================
 # HELPERS
 # ============================================
-def ndt(days_back):
-    """Génère une date aléatoire dans les X derniers jours"""
-    delta = timedelta(days=random.randint(0, days_back))
-    dt = datetime.now() - delta
-    return dt.isoformat(timespec='seconds')
+def reference_now():
+    """Date de référence des dates générées : REFERENCE_DATE ou maintenant"""
+    if REFERENCE_DATE:
+        return datetime.fromisoformat(REFERENCE_DATE)
+    return datetime.now().replace(microsecond=0)
+
+def recent_dates(days_back, now):
+    """Dates des X jours précédant `now`, indexées par ancienneté en jours"""
+    return [(now - timedelta(days=d)).isoformat(timespec='seconds') for d in range(days_back + 1)]
 
 def random_media_url():
     """Génère une URL fictive d'image"""
     if random.random() < 0.3:  # 30% de posts sans média
         return None
-    hash_id = ''.join(random.choices('abcdefghijklmnopqrstuvwxyz0123456789', k=12))
+    hash_id = fake.token(12)
     extensions = ['jpg', 'png', 'mp4', 'gif']
     ext = random.choice(extensions)
     return f"https://cdn.socialnet.com/media/{hash_id}.{ext}"
 
-def dump_ndjson(path, rows):
-    """Sauvegarde en format NDJSON"""
-    with open(path, "w", encoding="utf-8") as f:
-        for r in rows:
-            f.write(json.dumps(r, ensure_ascii=False) + "\n")
-
-# ============================================
-# GÉNÉRATION USERS
-# ============================================
-print("🔨 Génération des utilisateurs...")
-users = []
-cid_by_user = {}
-
-for i in range(N_USERS):
-    c = COMMUNITIES[i % N_COMM]
-    user_id = f"u_{i:05d}"
-    users.append({
-        "id": user_id,
-        "username": fake.user_name(),
-        "name": fake.name(),
-        "privacy": random.choices(PRIVACY_OPTIONS, PRIVACY_WEIGHTS)[0],
-        "createdAt": ndt(DAYS),
-        "community": c["id"]
-    })
-    cid_by_user[user_id] = c["id"]
-
-# ============================================
-# GÉNÉRATION FOLLOWS (graphe)
-# ============================================
-print("🔗 Génération des relations FOLLOWS...")
-edges_dir = []
-neighbors_out = defaultdict(set)
-neighbors_in = defaultdict(set)
-
-def try_add(a, b):
-    if a != b and b not in neighbors_out[a]:
-        edges_dir.append((a, b))
-        neighbors_out[a].add(b)
-        neighbors_in[b].add(a)
-
-# Communautés denses
-for c in COMMUNITIES:
-    members = [i for i in range(N_USERS) if users[i]["community"] == c["id"]]
-    k = min(len(members), 15)
-    for a in members:
-        for b in random.sample(members, k):
-            try_add(a, b)
-
-# Follows intercommunautés
-for _ in range(N_USERS * 2):
-    a, b = random.sample(range(N_USERS), 2)
-    if cid_by_user[users[a]["id"]] == cid_by_user[users[b]["id"]]:
-        continue
-    try_add(a, b)
-
-# Attachement préférentiel
-for _ in range(N_USERS * 3):
-    a = random.randrange(N_USERS)
-    if len(neighbors_in) == 0:
-        break
-    best, best_score = None, -1
-    for _ in range(20):
-        b = random.randrange(N_USERS)
-        score = len(neighbors_in[b])
-        if score > best_score and b not in neighbors_out[a]:
-            best, best_score = (a, b), score
-    if best:
-        try_add(*best)
-
-follows = [
-    {
-        "followerId": f"u_{a:05d}", 
-        "followedId": f"u_{b:05d}", 
-        "since": ndt(DAYS)
-    } 
-    for (a, b) in edges_dir
-]
-
-# ============================================
-# GÉNÉRATION POSTS
-# ============================================
-print("📝 Génération des posts...")
-in_deg = defaultdict(int)
-for _, b in edges_dir:
-    in_deg[b] += 1
-
-weights = [1 + math.sqrt(in_deg[i]) for i in range(N_USERS)]
-total_w = sum(weights)
-quota = [0] * N_USERS
-remaining = TARGET_POSTS
-
-for i in range(N_USERS - 1):
-    qi = int(round(remaining * (weights[i] / total_w)))
-    quota[i] = qi
-    remaining -= qi
-quota[-1] += remaining
-
-posts, post_tags = [], []
-pid = 0
-
-for i, q in enumerate(quota):
-    if q <= 0:
-        continue
-    author = users[i]
-    topic = f"topic_{author['community']}"
+def user_id(i):
+    return f"u_{i:05d}"
+
+def community_of(i):
+    """Communauté de l'utilisateur d'index i"""
+    return COMMUNITIES[i % N_COMM]["id"]
+
+def post_quotas(in_degree):
+    """Nombre de posts par utilisateur, proportionnel à 1 + sqrt(in-degree)
+    (arrondi au plus fort reste, le total fait exactement TARGET_POSTS)"""
+    weights = 1 + np.sqrt(in_degree)
+    expected = TARGET_POSTS * weights / weights.sum()
+    quota = np.floor(expected).astype(np.int64)
+    quota[np.argsort(quota - expected, kind="stable")[:TARGET_POSTS - quota.sum()]] += 1
+    return quota
+
+def fill_counts(posts, likes, comments):
+    """Renseigne likeCount et commentCount des posts générés"""
+    like_count_by_post = defaultdict(int)
+    comment_count_by_post = defaultdict(int)
+    for like in likes:
+        like_count_by_post[like["postId"]] += 1
+    for comment in comments:
+        comment_count_by_post[comment["postId"]] += 1
+    for post in posts:
+        post["likeCount"] = like_count_by_post[post["id"]]
+        post["commentCount"] = comment_count_by_post[post["id"]]
+
+def clear_dataset(base):
+    """Supprime toutes les versions d'un jeu de données (formats, parts) :
+    une ancienne version masquerait la nouvelle à l'import"""
+    for pattern in dataset_variants(base) + dataset_variants(base + PART_GLOB):
+        for path in glob.glob(pattern):
+            os.remove(path)
+
+def dump_ndjson(path, rows, part=None, fmt=OUTPUT_FORMAT, compression=COMPRESSION):
+    """Sauvegarde au format `fmt` (NDJSON compressé selon `compression`),
+    dans la part `part` si elle est donnée ; renvoie le nombre de lignes"""
+    base = path.removesuffix(".ndjson")
+    if fmt != "ndjson":
+        suffix = f".{fmt}"
+    else:
+        suffix = f".ndjson.{compression}" if compression else ".ndjson"
+    if part is None:
+        clear_dataset(base)
+        target = base + suffix
+    else:
+        target = part_path(base, part, suffix)
     
-    for _ in range(q):
-        pid += 1
-        p_id = f"p_{pid:06d}"
-        created = ndt(DAYS)
-        
-        posts.append({
-            "id": p_id,
-            "authorId": author["id"],
-            "content": fake.sentence(nb_words=20),
-            "visibility": random.choices(POST_VISIBILITY_OPTIONS, POST_VISIBILITY_WEIGHTS)[0],
-            "mediaUrl": random_media_url(),
-            "createdAt": created,
-            "topic": topic,
-            "likeCount": 0,  # Sera calculé après
-            "commentCount": 0  # Sera calculé après
-        })
-        
-        # Tags (1 à 3)
-        k = random.randint(1, 3)
-        chosen = random.sample(
-            next(c["tags"] for c in COMMUNITIES if c["id"] == author["community"]), 
-            k
-        )
-        for t in chosen:
-            post_tags.append({"postId": p_id, "tag": t})
+    count = 0
+    def counted():
+        nonlocal count
+        for row in rows:
+            count += 1
+            yield row
+    write_dataset(target, counted())
+    return count
 
 # ============================================
-# GÉNÉRATION POST_TAGS
+# GÉNÉRATION
 # ============================================
-print("🏷️  Génération des tags...")
-
-# Liste de tags par communauté (plus cohérent)
-COMMUNITY_TAGS = {
-    "tech": ["ia", "python", "dev", "cloud", "api", "javascript", "docker", "kubernetes", "react", "nodejs"],
-    "sport": ["running", "fitness", "yoga", "football", "natation", "cyclisme", "musculation", "marathon", "crossfit", "nutrition"],
-    "gaming": ["fps", "rpg", "esport", "console", "pc", "streaming", "mmo", "indie", "multiplayer", "vr"],
-    "cuisine": ["recette", "veggie", "dessert", "chef", "restaurant", "patisserie", "bio", "vegan", "gastronomie", "streetfood"],
-    "voyage": ["montagne", "plage", "roadtrip", "backpack", "citytrip", "aventure", "camping", "randonnee", "photographie", "culture"]
-}
-
-# Tags génériques populaires
-GENERIC_TAGS = ["inspiration", "lifestyle", "weekend", "motivation", "friends", "family", "nature", "art", "music", "fun"]
-
-post_tags = []
-
-for post in posts:
-    author_id = post["authorId"]
-    author_community = cid_by_user[author_id]
+class SocialNetworkGenerator:
+    """Génère le réseau social jeu de données par jeu de données.
     
-    # 70% des posts ont entre 1 et 5 tags
-    if random.random() < 0.7:
-        num_tags = random.randint(1, 5)
-        
-        # 80% des tags viennent de la communauté de l'auteur
-        community_tags = COMMUNITY_TAGS.get(author_community, [])
-        
-        selected_tags = []
+    Chaque jeu de données est un générateur de lignes : seul l'état nécessaire
+    aux jeux suivants (graphe des follows, auteurs des posts) est gardé en
+    mémoire, les lignes elles-mêmes sont produites à la demande.
+    
+    Une instance peut ne couvrir qu'un shard : les utilisateurs [lo, hi),
+    leurs follows sortants, leurs posts et les likes / commentaires de ces posts.
+    `network_seed` (par défaut `seed`) fixe ce qui doit être identique dans
+    tous les shards : le graphe des follows et leurs dates.
+    """
+    
+    def __init__(self, seed=SEED, users=None, verbose=True, now=None, network_seed=None):
+        fake.seed(seed)
+        random.seed(seed)
+        self.seed = seed
+        self.network_seed = seed if network_seed is None else network_seed
+        self.lo, self.hi = users or (0, N_USERS)
+        self.log = print if verbose else lambda *args: None
+        self.dates = recent_dates(DAYS, now or reference_now())
+        self.base_degree = None     # in-degrees du premier passage des follows, tous shards confondus
+        self.in_degree = None       # in-degree de chaque utilisateur dans le graphe des follows
+        self.post_offset = 0        # index du premier post du shard
+        self.post_authors = []      # index de l'auteur de chaque post du shard
+        self.post_days = []         # ancienneté en jours de chaque post du shard
+        self.comment_offset = 0
+        self.n_comments = 0
+        self.comment_ranges = []    # (premier index, nombre) des commentaires générés
+        self.group_members = []
+        self.report_relations = []
+    
+    def generate(self):
+        """Jeux de données dans l'ordre de génération (et d'import) : (nom, lignes)"""
+        yield "users", self.users()
+        yield "follows", self.follows()
+        yield "posts", self.posts()
+        yield "post_tags", self.post_tags()
+        yield "likes", self.likes()
+        yield "comments", self.comments()
+        yield "groups", self.groups()
+        yield "group_members", self.members()
+        yield "reports", self.reports()
+        yield "report_relations", self.relations()
+    
+    def dictionaries(self):
+        """Tags et topics que les posts peuvent référencer"""
+        tags = {t for community_tags in COMMUNITY_TAGS.values() for t in community_tags}
+        topics = [f"topic_{c['id']}" for c in COMMUNITIES]
+        return sorted(tags | set(GENERIC_TAGS)), topics
+    
+    def random_date(self):
+        """Date aléatoire dans les DAYS derniers jours"""
+        return self.dates[random.randint(0, DAYS)]
+    
+    def post_id(self, index):
+        """Identifiant du post d'index `index` dans le shard"""
+        return f"p_{self.post_offset + index + 1:06d}"
+    
+    def users(self):
+        self.log("🔨 Génération des utilisateurs...")
+        for i in range(self.lo, self.hi):
+            yield {
+                "id": user_id(i),
+                "username": fake.user_name(),
+                "name": fake.name(),
+                "privacy": random.choices(PRIVACY_OPTIONS, PRIVACY_WEIGHTS)[0],
+                "createdAt": self.random_date(),
+                "community": community_of(i)
+            }
+    
+    def follows(self):
+        self.log("🔗 Génération des relations FOLLOWS...")
+        graph = FollowGraph(N_USERS, N_COMM, self.network_seed)
+        for lo, indptr, indices in graph.blocks(self.lo, self.hi, self.base_degree):
+            since = np.random.default_rng([self.network_seed, lo]).integers(0, DAYS + 1, len(indices)).tolist()
+            indptr, indices = indptr.tolist(), indices.tolist()
+            for i in range(len(indptr) - 1):
+                follower = user_id(lo + i)
+                for j in range(indptr[i], indptr[i + 1]):
+                    yield {
+                        "followerId": follower,
+                        "followedId": user_id(indices[j]),
+                        "since": self.dates[since[j]]
+                    }
+        self.in_degree = graph.in_degree
+    
+    def posts(self):
+        self.log("📝 Génération des posts...")
+        quota = post_quotas(self.in_degree)
+        self.post_offset = int(quota[:self.lo].sum())
         
-        for _ in range(num_tags):
-            if random.random() < 0.8 and community_tags:
-                # Tag de la communauté
-                tag = random.choice(community_tags)
-            else:
-                # Tag générique
-                tag = random.choice(GENERIC_TAGS)
+        for i in range(self.lo, self.hi):
+            for _ in range(quota[i]):
+                days = random.randint(0, DAYS)
+                post_id = self.post_id(len(self.post_authors))
+                self.post_authors.append(i)
+                self.post_days.append(days)
+                yield {
+                    "id": post_id,
+                    "authorId": user_id(i),
+                    "content": fake.sentence(nb_words=20),
+                    "visibility": random.choices(POST_VISIBILITY_OPTIONS, POST_VISIBILITY_WEIGHTS)[0],
+                    "mediaUrl": random_media_url(),
+                    "createdAt": self.dates[days],
+                    "topic": f"topic_{community_of(i)}",
+                    "likeCount": 0,  # Sera calculé après
+                    "commentCount": 0  # Sera calculé après
+                }
+    
+    def post_tags(self):
+        self.log("🏷️  Génération des tags...")
+        for index, author in enumerate(self.post_authors):
+            # 70% des posts ont entre 1 et 5 tags
+            if random.random() >= 0.7:
+                continue
+            num_tags = random.randint(1, 5)
+            
+            # 80% des tags viennent de la communauté de l'auteur
+            community_tags = COMMUNITY_TAGS.get(community_of(author), [])
+            selected_tags = []
+            for _ in range(num_tags):
+                if random.random() < 0.8 and community_tags:
+                    tag = random.choice(community_tags)
+                else:
+                    tag = random.choice(GENERIC_TAGS)
+                if tag not in selected_tags:
+                    selected_tags.append(tag)
+            
+            for tag in selected_tags:
+                yield {"postId": self.post_id(index), "tagName": tag}
+    
+    def engagement(self):
+        return EngagementGenerator(self.post_authors, self.post_days, N_USERS, N_COMM, self.seed)
+    
+    def likes(self, total=TARGET_LIKES):
+        self.log("❤️ Génération des likes...")
+        for posts, users, days in self.engagement().likes(total):
+            for p, u, d in zip(posts.tolist(), users.tolist(), days.tolist()):
+                yield {
+                    "userId": user_id(u),
+                    "postId": self.post_id(p),
+                    "likedAt": self.dates[d]
+                }
+    
+    def comments(self, total=TARGET_COMMENTS):
+        self.log("💬 Génération des commentaires...")
+        for posts, users, days in self.engagement().comments(total):
+            for p, u, d in zip(posts.tolist(), users.tolist(), days.tolist()):
+                self.n_comments += 1
+                yield {
+                    "id": f"c_{self.comment_offset + self.n_comments:07d}",
+                    "authorId": user_id(u),
+                    "postId": self.post_id(p),
+                    "createdAt": self.dates[d],
+                    "content": fake.sentence(nb_words=12)
+                }
+        self.comment_ranges = [(self.comment_offset, self.n_comments)]
+    
+    def groups(self):
+        """Groupes ; leurs membres sont tirés en même temps et gardés pour members()"""
+        self.log("👥 Génération des groupes...")
+        for i in range(N_GROUPS):
+            g_id = f"g_{i+1:03d}"
+            community = COMMUNITIES[i % N_COMM]
+            community_users = range(i % N_COMM, N_USERS, N_COMM)
+            creator = user_id(random.choice(community_users) if community_users else 0)
+            group = {
+                "id": g_id,
+                "name": f"{community['id'].capitalize()} - {fake.catch_phrase()}",
+                "visibility": random.choice(["public", "private"]),
+                "createdBy": creator,
+                "description": fake.text(max_nb_chars=200),
+                "createdAt": self.random_date()
+            }
+            
+            # Membres du groupe (5 à 30 membres), le créateur est admin
+            n_members = random.randint(5, 30)
+            selected_members = [user_id(u) for u in random.sample(community_users, min(n_members, len(community_users)))]
+            if creator not in selected_members:
+                selected_members.insert(0, creator)
             
-            if tag not in selected_tags:
-                selected_tags.append(tag)
+            for member in selected_members:
+                role = "admin" if member == creator else (
+                    "moderator" if random.random() < 0.1 else "member"
+                )
+                self.group_members.append({
+                    "userId": member,
+                    "groupId": g_id,
+                    "role": role,
+                    "joinedAt": group["createdAt"]
+                })
+            yield group
+    
+    def members(self):
+        yield from self.group_members
+    
+    def reportable(self, index, sampled_users):
+        """Entité reportable d'index `index` : posts, puis commentaires, puis
+        l'échantillon d'utilisateurs"""
+        if index < TARGET_POSTS:
+            return "Post", f"p_{index + 1:06d}"
+        index -= TARGET_POSTS
+        for start, count in self.comment_ranges:
+            if index < count:
+                return "Comment", f"c_{start + index + 1:07d}"
+            index -= count
+        return "User", user_id(sampled_users[index])
+    
+    def reports(self):
+        """Reports ; leurs relations REPORTED / TARGET sont gardées pour relations()"""
+        self.log("🚨 Génération des reports...")
+        sampled_users = random.sample(range(N_USERS), k=min(500, N_USERS))
+        n_entities = TARGET_POSTS + sum(count for _, count in self.comment_ranges) + len(sampled_users)
         
-        # Ajouter les tags pour ce post
-        for tag in selected_tags:
-            post_tags.append({
-                "postId": post["id"],
-                "tagName": tag
-            })
-
-print(f"  → {len(post_tags)} associations post-tag créées")
-
-# ============================================
-# GÉNÉRATION LIKES
-# ============================================
-print("❤️ Génération des likes...")
-likes = []
-liked_pairs = set()
-all_users = [u["id"] for u in users]
-
-for _ in range(TARGET_LIKES):
-    p = random.choice(posts)
-    author_c = cid_by_user[p["authorId"]]
-
-    for _ in range(30):
-        v = random.choice(all_users)
-        if v == p["authorId"]:
-            continue
-        if (v, p["id"]) in liked_pairs:
-            continue
-
-        same = (cid_by_user[v] == author_c)
-        if random.random() < (0.7 if same else 0.3):
-            liked_pairs.add((v, p["id"]))
-            # ✅ FIX : Utiliser likedAt au lieu de createdAt
-            likes.append({
-                "userId": v,
-                "postId": p["id"],
-                "likedAt": ndt(DAYS)  # ✅ Timestamp aléatoire
+        for i in range(N_REPORTS):
+            target_type, target_id = self.reportable(random.randrange(n_entities), sampled_users)
+            reporter = user_id(random.randrange(N_USERS))
+            
+            # S'assurer qu'un user ne se reporte pas lui-même
+            if target_type == "User" and target_id == reporter:
+                continue
+            
+            report_id = f"r_{i+1:05d}"
+            self.report_relations.append({
+                "reportId": report_id,
+                "reportedBy": reporter,
+                "targetType": target_type,
+                "targetId": target_id
             })
-            break
-
-# ============================================
-# GÉNÉRATION COMMENTS
-# ============================================
-print("💬 Génération des commentaires...")
-comments = []
-
-for i in range(TARGET_COMMENTS):
-    p = random.choice(posts)
-
-    for _ in range(30):
-        v = random.choice(all_users)
-        if v == p["authorId"] and random.random() < 0.6:
-            continue
-
-        # ✅ FIX : Utiliser "content" au lieu de "text"
-        comments.append({
-            "id": f"c_{i+1:07d}",
-            "authorId": v,
-            "postId": p["id"],
-            "createdAt": ndt(DAYS),
-            "content": fake.sentence(nb_words=12)  # ✅ "content"
-        })
-        break
-
-# ============================================
-# CALCUL likeCount et commentCount
-# ============================================
-print("🔢 Calcul des compteurs...")
-like_count_by_post = defaultdict(int)
-comment_count_by_post = defaultdict(int)
-
-for like in likes:
-    like_count_by_post[like["postId"]] += 1
-
-for comment in comments:
-    comment_count_by_post[comment["postId"]] += 1
-
-for post in posts:
-    post["likeCount"] = like_count_by_post[post["id"]]
-    post["commentCount"] = comment_count_by_post[post["id"]]
+            yield {
+                "id": report_id,
+                "reason": random.choice(REPORT_REASONS),
+                "status": random.choice(REPORT_STATUS),
+                "createdAt": self.random_date()
+            }
+    
+    def relations(self):
+        yield from self.report_relations
 
 # ============================================
-# GÉNÉRATION GROUPS
+# GÉNÉRATION PAR SHARDS
 # ============================================
-print("👥 Génération des groupes...")
-groups = []
-group_members = []
-
-for i in range(N_GROUPS):
-    g_id = f"g_{i+1:03d}"
-    community = COMMUNITIES[i % N_COMM]
+def shard_seed(shard, step, seed=SEED):
+    """Graine d'une étape d'un shard, dérivée de la graine du réseau"""
+    return int(np.random.SeedSequence([seed, shard, step]).generate_state(1)[0])
+
+def shard_bounds(shards):
+    """Plages d'utilisateurs [lo, hi) de chaque shard"""
+    edges = [N_USERS * k // shards for k in range(shards + 1)]
+    return list(zip(edges[:-1], edges[1:]))
+
+# Étapes exécutées dans les processus du pool : tout leur paramétrage passe par
+# leurs arguments, un processus lancé par spawn ne voit que les valeurs par
+# défaut des constantes du module
+def users_shard(data_dir, shard, lo, hi, now, seed, output):
+    """Utilisateurs du shard et in-degrees du premier passage de ses follows"""
+    generator = SocialNetworkGenerator(shard_seed(shard, 0, seed), (lo, hi), verbose=False, now=now,
+                                       network_seed=seed)
+    count = dump_ndjson(os.path.join(data_dir, "users.ndjson"), generator.users(), shard, *output)
+    return {"users": count}, FollowGraph(N_USERS, N_COMM, seed).base_degree(lo, hi)
+
+def follows_shard(data_dir, shard, lo, hi, now, seed, output, base_degree):
+    """Follows sortants des utilisateurs du shard ; renvoie leurs in-degrees"""
+    generator = SocialNetworkGenerator(shard_seed(shard, 1, seed), (lo, hi), verbose=False, now=now,
+                                       network_seed=seed)
+    generator.base_degree = base_degree
+    count = dump_ndjson(os.path.join(data_dir, "follows.ndjson"), generator.follows(), shard, *output)
+    return {"follows": count}, generator.in_degree
+
+def posts_shard(data_dir, shard, lo, hi, now, seed, output, in_degree, likes, comments, comment_offset):
+    """Posts des utilisateurs du shard, leurs tags, likes et commentaires"""
+    generator = SocialNetworkGenerator(shard_seed(shard, 2, seed), (lo, hi), verbose=False, now=now,
+                                       network_seed=seed)
+    generator.in_degree = in_degree
+    generator.comment_offset = comment_offset
+    data = {
+        "posts": list(generator.posts()),
+        "post_tags": list(generator.post_tags()),
+        "likes": list(generator.likes(likes)),
+        "comments": list(generator.comments(comments)),
+    }
+    fill_counts(data["posts"], data["likes"], data["comments"])
+    counts = {name: dump_ndjson(os.path.join(data_dir, f"{name}.ndjson"), rows, shard, *output)
+              for name, rows in data.items()}
+    return counts, generator.comment_ranges
+
+def generate_sharded(shards, processes=None, data_dir=DATA_DIR, fmt=OUTPUT_FORMAT, compression=COMPRESSION,
+                     seed=SEED):
+    """Génère le réseau en `shards` plages d'utilisateurs sur un pool de processus.
     
-    # ✅ FIX : Sélectionner un créateur du groupe
-    community_users = [u["id"] for u in users if u["community"] == community["id"]]
-    creator = random.choice(community_users) if community_users else all_users[0]
-
-    groups.append({
-        "id": g_id,
-        "name": f"{community['id'].capitalize()} - {fake.catch_phrase()}",
-        "visibility": random.choice(["public", "private"]),
-        "createdBy": creator,  # ✅ Ajout de createdBy
-        "description": fake.text(max_nb_chars=200),  # ✅ Ajout description
-        "createdAt": ndt(DAYS)
-    })
-
-    # Membres du groupe (5 à 30 membres)
-    n_members = random.randint(5, 30)
-    selected_members = random.sample(community_users, min(n_members, len(community_users)))
-
-    # Premier membre = admin (le créateur)
-    if creator not in selected_members:
-        selected_members.insert(0, creator)
+    Chaque shard écrit ses propres parts (users.part-0003.ndjson, ...) avec
+    des graines dérivées de `seed` et de son numéro : le résultat ne dépend que
+    de `seed` et du nombre de shards, pas de l'ordre d'exécution. Entre deux
+    étapes, seuls les in-degrees des follows passent par le processus principal.
+    """
+    bounds = shard_bounds(shards)
+    now = reference_now()
+    output = (fmt, compression)
+    counts = defaultdict(int)
+    for name in DATASETS:
+        clear_dataset(os.path.join(data_dir, name))
     
-    for idx, user_id in enumerate(selected_members):
-        role = "admin" if user_id == creator else (
-            "moderator" if random.random() < 0.1 else "member"
-        )
-        group_members.append({
-            "userId": user_id,
-            "groupId": g_id,
-            "role": role,
-            "joinedAt": groups[-1]["createdAt"]
-        })
-
-# ============================================
-# GÉNÉRATION REPORTS
-# ============================================
-print("🚨 Génération des reports...")
-reports = []
-report_relations = []
-
-# Constitution des entités reportables avec leur type
-reportable_entities = (
-    [{"type": "Post", "id": p["id"]} for p in posts] +
-    [{"type": "Comment", "id": c["id"]} for c in comments] +
-    [{"type": "User", "id": u["id"]} for u in random.sample(users, k=min(500, len(users)))]  # Sample d'users
-)
-
-for i in range(N_REPORTS):
-    entity = random.choice(reportable_entities)
-    reporter = random.choice(all_users)
+    def run(step, *args):
+        futures = [pool.submit(step, data_dir, shard, lo, hi, now, seed, output,
+                               *(a[shard] if isinstance(a, list) else a for a in args))
+                   for shard, (lo, hi) in enumerate(bounds)]
+        results = []
+        for future in futures:
+            shard_counts, result = future.result()
+            for name, count in shard_counts.items():
+                counts[name] += count
+            results.append(result)
+        return results
     
-    # S'assurer qu'un user ne se reporte pas lui-même
-    if entity["type"] == "User" and entity["id"] == reporter:
-        continue
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        print(f"🔨 Génération des utilisateurs ({shards} shards)...")
+        base_degree = sum(run(users_shard))
+        
+        print("🔗 Génération des relations FOLLOWS...")
+        in_degree = sum(run(follows_shard, base_degree))
+        
+        print("📝 Génération des posts, tags, likes et commentaires...")
+        quota = post_quotas(in_degree)
+        shard_posts = np.array([quota[lo:hi].sum() for lo, hi in bounds])
+        rng = np.random.default_rng([seed, shards])
+        likes = rng.multinomial(TARGET_LIKES, shard_posts / shard_posts.sum())
+        comments = rng.multinomial(TARGET_COMMENTS, shard_posts / shard_posts.sum())
+        offsets = np.cumsum(comments) - comments
+        comment_ranges = run(posts_shard, in_degree, likes.tolist(), comments.tolist(), offsets.tolist())
     
-    report_id = f"r_{i+1:05d}"
+    # Groupes et reports : peu nombreux, générés sur tout le réseau dans ce processus
+    generator = SocialNetworkGenerator(shard_seed(shards, 3, seed), now=now, network_seed=seed)
+    generator.comment_ranges = [r for ranges in comment_ranges for r in ranges]
+    for name, rows in [("groups", generator.groups()), ("group_members", generator.members()),
+                       ("reports", generator.reports()), ("report_relations", generator.relations())]:
+        counts[name] = dump_ndjson(os.path.join(data_dir, f"{name}.ndjson"), rows, None, *output)
+    return counts
+
+def generate(data_dir=DATA_DIR, fmt=OUTPUT_FORMAT, compression=COMPRESSION, seed=SEED):
+    """Génère les jeux de données dans un seul processus"""
+    generator = SocialNetworkGenerator(seed)
+    data = {name: list(rows) for name, rows in generator.generate()}
     
-    # Création du report
-    reports.append({
-        "id": report_id,
-        "reason": random.choice(REPORT_REASONS),
-        "status": random.choice(REPORT_STATUS),
-        "createdAt": ndt(DAYS)
-    })
+    print("🔢 Calcul des compteurs...")
+    fill_counts(data["posts"], data["likes"], data["comments"])
     
-    # Relation REPORTED et TARGET
-    report_relations.append({
-        "reportId": report_id,
-        "reportedBy": reporter,
-        "targetType": entity["type"],
-        "targetId": entity["id"]
-    })
-
-# ============================================
-# EXPORT
-# ============================================
-print("💾 Export des fichiers...")
-dump_ndjson("data/users.ndjson", users)
-dump_ndjson("data/follows.ndjson", follows)
-dump_ndjson("data/posts.ndjson", posts)
-dump_ndjson("data/post_tags.ndjson", post_tags)
-dump_ndjson("data/likes.ndjson", likes)
-dump_ndjson("data/comments.ndjson", comments)
-dump_ndjson("data/groups.ndjson", groups)
-dump_ndjson("data/group_members.ndjson", group_members)
-dump_ndjson("data/reports.ndjson", reports)
-dump_ndjson("data/report_relations.ndjson", report_relations) 
-
-print("\n✅ Génération terminée !")
-print(f"  Users: {len(users)}")
-print(f"  Follows: {len(follows)}")
-print(f"  Posts: {len(posts)}")
-print(f"  Likes: {len(likes)}")
-print(f"  Comments: {len(comments)}")
-print(f"  Groups: {len(groups)}")
-print(f"  Group members: {len(group_members)}")
-print(f"  Reports: {len(reports)}")
-print(f"  Report relations: {len(report_relations)}")
+    print("💾 Export des fichiers...")
+    return {name: dump_ndjson(os.path.join(data_dir, f"{name}.ndjson"), rows, None, fmt, compression)
+            for name, rows in data.items()}
+
+def main(shards=1, processes=None, data_dir=DATA_DIR, fmt=OUTPUT_FORMAT, compression=COMPRESSION, seed=SEED):
+    """Génère les jeux de données et les écrit dans `data_dir`"""
+    os.makedirs(data_dir, exist_ok=True)
+    if shards > 1:
+        counts = generate_sharded(shards, processes, data_dir, fmt, compression, seed)
+    else:
+        counts = generate(data_dir, fmt, compression, seed)
+    
+    print("\n✅ Génération terminée !")
+    for name in DATASETS:
+        print(f"  {name.replace('_', ' ').capitalize()}: {counts[name]}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Génération du jeu de données du réseau social")
+    parser.add_argument("--shards", type=int, default=1,
+                        help="plages d'utilisateurs générées en parallèle, chacune dans ses propres fichiers")
+    parser.add_argument("--processes", type=int, default=None,
+                        help="processus du pool en mode shardé (par défaut : un par cœur)")
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    parser.add_argument("--seed", type=int, default=SEED,
+                        help="graine du réseau : même graine et même nombre de shards, mêmes données")
+    parser.add_argument("--reference-date", default=REFERENCE_DATE,
+                        help="date ISO dont les dates générées remontent (reproductibilité)")
+    parser.add_argument("--format", choices=["ndjson", "parquet", "arrow"], default=OUTPUT_FORMAT,
+                        help="format des fichiers produits")
+    parser.add_argument("--compression", choices=["gz", "zst"], default=COMPRESSION,
+                        help="compression des fichiers NDJSON (les formats colonnaires sont compressés en zstd)")
+    args = parser.parse_args()
+    if args.compression and args.format != "ndjson":
+        parser.error("--compression ne s'applique qu'au format ndjson")
+    REFERENCE_DATE = args.reference_date
+    main(args.shards, args.processes, args.data_dir, args.format, args.compression, args.seed)
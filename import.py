@@ -1,7 +1,21 @@
-import os,json
+import os
+import argparse
+import zlib
+import time
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from neo4j import GraphDatabase
+from neo4j.exceptions import Neo4jError, TransientError
 from dotenv import load_dotenv
 
+from checkpoint import CheckpointManifest
+from counters import RECOUNT_WORKERS, recount_posts
+from dataset_io import batched, dataset_path, read_rows
+from instrumentation import ImportReport
+from schema import SchemaManager
+from integrity import TARGET_TYPES, IntegrityChecker, is_present
+
 load_dotenv()
 NEO4J_URI = os.getenv("NEO4J_URI")
 NEO4J_USER = os.getenv("NEO4J_USER", "neo4j")
@@ -9,290 +23,836 @@ NEO4J_PASSWORD = os.getenv("NEO4J_PASSWORD")
 NEO4J_DATABASE = os.getenv("NEO4J_DATABASE", "neo4j")
 
 DATA_DIR = "data"
+CHECKPOINT_FILE = os.path.join(DATA_DIR, ".checkpoint.json")
+REPORT_FILE = "import_report.json"
+REJECTS_FILE = "rejects.ndjson"
+
+# Nombre de lignes envoyées par transaction, par entité
+BATCH_SIZES = {
+    "users": 10000,
+    "follows": 20000,
+    "posts": 5000,
+    "dictionaries": 10000,
+    "post_tags": 20000,
+    "post_topics": 20000,
+    "likes": 20000,
+    "comments": 5000,
+    "groups": 5000,
+    "group_members": 20000,
+    "reports": 10000,
+    "report_relations": 10000,
+}
+
+# Étapes de l'import et étapes dont elles dépendent (ordre topologique)
+STAGES = {
+    "users": [],
+    "reports": [],
+    "follows": ["users"],
+    "posts": ["users"],
+    "groups": ["users"],
+    "dictionaries": [],
+    "post_tags": ["posts", "dictionaries"],
+    "post_topics": ["posts", "dictionaries"],
+    "likes": ["posts"],
+    "comments": ["posts"],
+    "group_members": ["groups"],
+    "report_relations": ["comments", "reports"],
+}
+
+# Nœuds et relations créés par ligne importée, pour repérer les lignes
+# ignorées par le serveur (MATCH sur un identifiant inconnu)
+EXPECTED_WRITES = {
+    "users": (1, 0),
+    "reports": (1, 0),
+    "follows": (0, 1),
+    "posts": (1, 1),
+    "groups": (1, 1),
+    "dictionaries": (1, 0),
+    "post_tags": (0, 1),
+    "post_topics": (0, 1),
+    "likes": (0, 1),
+    "comments": (1, 2),
+    "group_members": (0, 1),
+    "report_relations": (0, 2),
+}
+
+# Réglage automatique des lots : latence visée par transaction et bornes de taille
+TARGET_LATENCY = 2.0
+MIN_BATCH_SIZE = 100
+MAX_BATCH_SIZE = 200000
+
+# Erreurs qui signalent un lot trop gros (mémoire, délai dépassé)
+OVERLOAD_ERRORS = ("MemoryPoolOutOfMemoryError", "OutOfMemoryError", "TransactionTimedOut")
+
+# Nombre maximal de transactions d'écriture simultanées, toutes étapes confondues
+MAX_TRANSACTIONS = 8
+
+# Lignes réparties en même temps sur la grille d'un import partitionné
+PARTITION_WINDOW_ROWS = 200000
+
+# Nombre de relations ou de nœuds supprimés par transaction lors du nettoyage
+WIPE_BATCH_SIZE = 10000
+
+# Lots en attente entre le générateur et les workers en mode pipeline
+PIPELINE_QUEUE_SIZE = 8
+
+# Étapes écrites dans la foulée d'une autre, sur les mêmes lignes (mode pipeline)
+PIPELINE_FOLLOWUPS = {"posts": ["post_topics"]}
+
+# Requêtes d'écriture par étape ; {write} devient CREATE ou MERGE selon le mode
+QUERIES = {
+    "users": """
+    UNWIND $rows AS user
+    {write} (u:User {id: user.id})
+    SET u.username = user.username,
+        u.name = user.name,
+        u.privacy = user.privacy,
+        u.createdAt = datetime(user.createdAt)
+    """,
+    "follows": """
+    UNWIND $rows AS follow
+    MATCH (follower:User {id: follow.followerId})
+    MATCH (followed:User {id: follow.followedId})
+    {write} (follower)-[r:FOLLOWS]->(followed)
+    SET r.since = datetime(follow.since)
+    """,
+    "posts": """
+    UNWIND $rows AS post
+    MATCH (author:User {id: post.authorId})
+    {write} (p:Post {id: post.id})
+    SET p.content = post.content,
+        p.mediaUrl = post.mediaUrl,
+        p.visibility = post.visibility,
+        p.likeCount = post.likeCount,
+        p.commentCount = post.commentCount,
+        p.createdAt = datetime(post.createdAt)
+    {write} (author)-[:POSTED]->(p)
+    """,
+    "post_tags": """
+    UNWIND $rows AS pt
+    MATCH (p:Post {id: pt.postId})
+    MATCH (t:Tag {name: pt.tagName})
+    {write} (p)-[:TAGGED_WITH]->(t)
+    """,
+    "post_topics": """
+    UNWIND $rows AS post
+    MATCH (p:Post {id: post.id})
+    MATCH (tp:Topic {id: post.topic})
+    {write} (p)-[:IN_TOPIC]->(tp)
+    """,
+    "likes": """
+    UNWIND $rows AS like
+    MATCH (u:User {id: like.userId})
+    MATCH (p:Post {id: like.postId})
+    {write} (u)-[r:LIKED]->(p)
+    SET r.likedAt = datetime(like.likedAt)
+    """,
+    "comments": """
+    UNWIND $rows AS comment
+    MATCH (author:User {id: comment.authorId})
+    MATCH (p:Post {id: comment.postId})
+    {write} (c:Comment {id: comment.id})
+    SET c.content = comment.content,
+        c.createdAt = datetime(comment.createdAt)
+    {write} (author)-[:COMMENTED]->(c)
+    {write} (c)-[:ON]->(p)
+    """,
+    "groups": """
+    UNWIND $rows AS group
+    MATCH (creator:User {id: group.createdBy})
+    {write} (g:Group {id: group.id})
+    SET g.name = group.name,
+        g.description = group.description,
+        g.visibility = group.visibility,
+        g.createdAt = datetime(group.createdAt)
+    {write} (creator)-[:CREATED]->(g)
+    """,
+    "group_members": """
+    UNWIND $rows AS member
+    MATCH (u:User {id: member.userId})
+    MATCH (g:Group {id: member.groupId})
+    {write} (u)-[r:MEMBER_OF]->(g)
+    SET r.role = member.role,
+        r.joinedAt = datetime(member.joinedAt)
+    """,
+    "reports": """
+    UNWIND $rows AS report
+    {write} (r:Report {id: report.id})
+    SET r.reason = report.reason,
+        r.status = report.status,
+        r.createdAt = datetime(report.createdAt)
+    """,
+}
+
+TAG_QUERY = """
+UNWIND $rows AS tag
+{write} (:Tag {name: tag.name})
+"""
+
+TOPIC_QUERY = """
+UNWIND $rows AS topic
+{write} (tp:Topic {id: topic.id})
+SET tp.name = topic.name
+"""
+
+def report_relation_query(target_type):
+    """Relations REPORTED et TARGET vers un type de cible donné"""
+    return f"""
+    UNWIND $rows AS rel
+    MATCH (u:User {{id: rel.reportedBy}})
+    MATCH (r:Report {{id: rel.reportId}})
+    MATCH (target:{target_type} {{id: rel.targetId}})
+    {{write}} (u)-[:REPORTED]->(r)
+    {{write}} (r)-[:TARGET]->(target)
+    """
+
+def partition(key, n):
+    """Numéro de partition stable d'un identifiant"""
+    return zlib.crc32(key.encode("utf-8")) % n
+
+def grid_rounds(grid, symmetric=False):
+    """Ordonnance les cellules d'une grille (partition départ x partition arrivée)
+    en tours dont les cellules ne partagent aucun nœud"""
+    n = len(grid)
+    if not symmetric:
+        # Diagonales décalées : chaque ligne et chaque colonne apparaît une fois par tour
+        for shift in range(n):
+            yield [grid[i][(i + shift) % n] for i in range(n)]
+        return
+    
+    # Même label aux deux extrémités (User -> User) : tournoi toutes rondes,
+    # les cellules (a, b) et (b, a) sont confiées au même worker
+    yield [grid[i][i] for i in range(n)]
+    slots = list(range(n)) + ([None] if n % 2 else [])
+    half = len(slots) // 2
+    for _ in range(len(slots) - 1):
+        yield [
+            grid[a][b] + grid[b][a]
+            for a, b in zip(slots[:half], reversed(slots[half:]))
+            if a is not None and b is not None
+        ]
+        slots = [slots[0], slots[-1]] + slots[1:-1]
+
+def is_overload(error):
+    return isinstance(error, TransientError) or any(name in (error.code or "") for name in OVERLOAD_ERRORS)
+
+class BatchSizer:
+    """Taille de lot d'une étape, ajustée à l'exécution : elle grandit tant que
+    les transactions restent sous la latence visée et diminue après une
+    latence trop forte, un retry ou une erreur de mémoire / de délai.
+    Une taille refusée par le serveur devient un plafond pour la suite."""
+    
+    def __init__(self, size, target=TARGET_LATENCY, adaptive=True):
+        self.initial = size
+        self.size = size
+        self.ceiling = MAX_BATCH_SIZE
+        self.target = target
+        self.adaptive = adaptive
+        self.lock = threading.Lock()
+    
+    def observe(self, rows, seconds, retried=False):
+        """Ajuste la taille d'après une transaction de `rows` lignes. Sa durée est
+        ramenée à la taille courante au prorata des lignes : les lots partiels et
+        les cellules de la grille parallèle comptent aussi."""
+        if not self.adaptive or rows < min(MIN_BATCH_SIZE, self.size):
+            return  # quelques lignes : durée dominée par le coût fixe d'une transaction
+        with self.lock:
+            projected = seconds * self.size / rows
+            if retried:
+                self.size = max(MIN_BATCH_SIZE, self.size // 2)
+            elif projected > self.target:
+                self.size = max(MIN_BATCH_SIZE, self.size // 4, int(self.size * self.target / projected))
+            elif projected < self.target / 2:
+                self.size = max(self.size, min(self.ceiling, int(self.size * 1.5)))
+    
+    def shrink(self, failed_rows):
+        with self.lock:
+            self.ceiling = max(MIN_BATCH_SIZE, min(self.ceiling, failed_rows * 3 // 4))
+            self.size = max(MIN_BATCH_SIZE, min(self.size, failed_rows // 2))
+
+def topic_name(topic_id):
+    """'topic_voyage' -> 'Voyage'"""
+    return topic_id.removeprefix("topic_").replace("_", " ").capitalize()
+
+def critical_path(durations):
+    """Plus longue chaîne de dépendances, pondérée par la durée des étapes"""
+    finish, previous = {}, {}
+    for stage, deps in STAGES.items():
+        before = max(deps, key=finish.get, default=None)
+        finish[stage] = durations[stage] + (finish[before] if before else 0)
+        previous[stage] = before
+    
+    stage = max(finish, key=finish.get)
+    path = []
+    while stage:
+        path.append(stage)
+        stage = previous[stage]
+    return path[::-1], max(finish.values())
+
+def run_batch(tx, query, batch):
+    """Exécute un lot UNWIND dans une transaction"""
+    return tx.run(query, rows=batch).consume()
+
+def run_write(tx, query, **params):
+    return tx.run(query, **params).consume()
 
 class Neo4jImporter:
-    def __init__(self, uri, user, password):
+    def __init__(self, uri, user, password, database=NEO4J_DATABASE, batch_sizes=None, workers=1, fresh=False,
+                 max_transactions=MAX_TRANSACTIONS, validate=True, adaptive=True, target_latency=TARGET_LATENCY):
         self.driver = GraphDatabase.driver(uri, auth=(user, password))
+        self.database = database
+        self.batch_sizes = {**BATCH_SIZES, **(batch_sizes or {})}
+        self.sizers = {
+            stage: BatchSizer(size, target_latency, adaptive)
+            for stage, size in self.batch_sizes.items()
+        }
+        self.workers = workers
+        self.fresh = fresh
+        self.transactions = threading.BoundedSemaphore(max_transactions)
+        self.report = ImportReport()
+        self.validate = validate
+        # Les couples (relations) ne sont dédoublonnés que pour CREATE, MERGE les absorbe
+        self.integrity = IntegrityChecker(REJECTS_FILE, dedup_pairs=fresh)
+        self.checkpoints = CheckpointManifest(CHECKPOINT_FILE)
+        self.readers = {}
+        self.schema = SchemaManager(self.session)
+        # Posts touchés par un import incrémental (None : tous les posts sont recalculés)
+        self.touched_posts = None
+        self.write_listeners = []
     
     def close(self):
+        self.integrity.close()
         self.driver.close()
     
-    def clear_database(self):
-        """Nettoie la base de données"""
-        with self.driver.session() as session:
-            session.run("MATCH (n) DETACH DELETE n")
-            print("✅ Base de données nettoyée")
+    def session(self):
+        return self.driver.session(database=self.database)
     
-    def create_constraints(self):
-        """Crée les contraintes et index"""
-        constraints = [
-            "CREATE CONSTRAINT user_id IF NOT EXISTS FOR (u:User) REQUIRE u.id IS UNIQUE",
-            "CREATE CONSTRAINT post_id IF NOT EXISTS FOR (p:Post) REQUIRE p.id IS UNIQUE",
-            "CREATE CONSTRAINT comment_id IF NOT EXISTS FOR (c:Comment) REQUIRE c.id IS UNIQUE",
-            "CREATE CONSTRAINT tag_name IF NOT EXISTS FOR (t:Tag) REQUIRE t.name IS UNIQUE",
-            "CREATE CONSTRAINT report_id IF NOT EXISTS FOR (r:Report) REQUIRE r.id IS UNIQUE",
-            "CREATE CONSTRAINT group_id IF NOT EXISTS FOR (g:Group) REQUIRE g.id IS UNIQUE",
-        ]
+    def add_write_listener(self, listener):
+        """`listener(stage, rows)` est appelé après chaque lot validé (invalidation de caches)"""
+        self.write_listeners.append(listener)
+    
+    def clear_database(self, batch_size=WIPE_BATCH_SIZE, recreate=True):
+        """Nettoie la base de données.
         
-        with self.driver.session() as session:
-            for constraint in constraints:
-                try:
-                    session.run(constraint)
-                except Exception as e:
-                    pass  # Contrainte existe déjà
-        print("✅ Contraintes créées")
+        Recrée la base quand l'édition le permet, sinon supprime les relations
+        puis les nœuds par lots bornés en affichant la progression.
+        """
+        if recreate and self.recreate_database():
+            print("✅ Base de données recréée")
+            return
+        
+        with self.session() as session:
+            for label, count_query, delete_query, counter in [
+                ("relations",
+                 "MATCH ()-[r]->() RETURN count(r) AS count",
+                 "MATCH ()-[r]->() WITH r LIMIT $size DELETE r",
+                 "relationships_deleted"),
+                ("nœuds",
+                 "MATCH (n) RETURN count(n) AS count",
+                 "MATCH (n) WITH n LIMIT $size DETACH DELETE n",
+                 "nodes_deleted"),
+            ]:
+                total = session.run(count_query).single()["count"]
+                deleted = 0
+                while deleted < total:
+                    summary = session.execute_write(run_write, delete_query, size=batch_size)
+                    removed = getattr(summary.counters, counter)
+                    if not removed:
+                        break
+                    deleted += removed
+                    print(f"  🧹 {deleted}/{total} {label} supprimés", end="\r", flush=True)
+                if total:
+                    print()
+        print("✅ Base de données nettoyée")
     
-    def load_ndjson(self, filename):
-        """Charge un fichier NDJSON"""
-        filepath = os.path.join(DATA_DIR, filename)
-        with open(filepath, 'r', encoding='utf-8') as f:
-            return [json.loads(line) for line in f]
+    def recreate_database(self):
+        """Supprime et recrée la base (Enterprise) ; False si l'édition ne le permet pas"""
+        try:
+            with self.driver.session(database="system") as session:
+                edition = session.run("CALL dbms.components() YIELD edition RETURN edition").single()["edition"]
+                if edition != "enterprise":
+                    return False
+                session.run("CREATE OR REPLACE DATABASE $name WAIT", name=self.database).consume()
+        except Neo4jError as e:
+            print(f"⚠️  Recréation impossible ({e.code}), nettoyage par lots")
+            return False
+        return True
     
-    def import_users(self):
-        """Import des utilisateurs"""
-        users = self.load_ndjson("users.ndjson")
-        users = [u for u in users if u.get('id')]  # Filtrer les IDs null
+    def build_indexes(self):
+        """Index secondaires construits une fois les données chargées"""
+        start = time.perf_counter()
+        details = self.schema.after_load()
+        self.report.record_stage("indexes", time.perf_counter() - start, **details)
+    
+    def iter_ndjson(self, stage, filename):
+        """Lit le fichier d'une étape en flux, à partir du dernier lot validé"""
+        reader = self.checkpoints.reader(stage, dataset_path(DATA_DIR, filename))
+        self.readers[stage] = reader
+        return iter(reader)
+    
+    def rows(self, stage, filename):
+        """Lignes valides d'une étape : les rejets (champ manquant, orphelin,
+        doublon) sont écartés avant d'être envoyés à Neo4j"""
+        return self.integrity.filter(stage, self.iter_ndjson(stage, filename))
+    
+    def checkpoint(self, stage, done=False):
+        """Enregistre la progression de l'étape après un lot validé"""
+        reader = self.readers.get(stage)
+        if reader is None:
+            return
+        self.checkpoints.commit(stage, reader, done)
+        if done and reader.resumed:
+            print(f"↪️  {stage} : reprise à la position {reader.start}")
+    
+    def cypher(self, query):
+        """Adapte une requête au mode d'import : {write} devient CREATE pour un
+        chargement dans une base vide, MERGE sinon"""
+        return query.replace("{write}", "CREATE" if self.fresh else "MERGE")
+    
+    def write(self, session, stage, query, batch):
+        """Exécute un lot dans sa transaction, dans la limite globale de transactions,
+        et enregistre sa durée, ses retries et les compteurs du serveur.
         
-        query = """
-        UNWIND $users AS user
-        MERGE (u:User {id: user.id})
-        SET u.username = user.username,
-            u.name = user.name,
-            u.privacy = user.privacy,
-            u.createdAt = datetime(user.createdAt)
+        Les erreurs transitoires sont rejouées par execute_write ; si le lot
+        échoue malgré tout par manque de mémoire ou délai dépassé, il est coupé
+        en deux et la taille de lot de l'étape est réduite.
         """
+        sizer = self.sizers[stage]
+        attempts = 0
         
-        with self.driver.session() as session:
-            session.run(query, users=users)
-        print(f"✅ {len(users)} utilisateurs importés")
-
-    def import_follows(self):
-        """Import des relations FOLLOWS"""
-        follows = self.load_ndjson("follows.ndjson")
-        follows = [f for f in follows if f.get('followerId') and f.get('followedId')]
+        def work(tx):
+            nonlocal attempts
+            attempts += 1
+            return run_batch(tx, query, batch)
+        
+        try:
+            with self.transactions:
+                start = time.perf_counter()
+                summary = session.execute_write(work)
+                seconds = time.perf_counter() - start
+        except Neo4jError as e:
+            if not is_overload(e) or len(batch) <= 1:
+                raise
+            sizer.shrink(len(batch))
+            print(f"⚠️  {stage} : lot de {len(batch)} lignes refusé ({e.code}), taille ramenée à {sizer.size}")
+            half = len(batch) // 2
+            self.write(session, stage, query, batch[:half])
+            self.write(session, stage, query, batch[half:])
+            return
+        
+        sizer.observe(len(batch), seconds, retried=attempts > 1)
+        self.report.record_batch(stage, len(batch), seconds, attempts, summary)
+        for listener in self.write_listeners:
+            listener(stage, batch)
+    
+    def write_batches(self, stage, query, rows):
+        """Envoie les lignes par lots, chaque lot dans sa propre transaction"""
+        query = self.cypher(query)
+        total = 0
+        with self.session() as session:
+            for batch in batched(rows, lambda: self.sizers[stage].size):
+                self.write(session, stage, query, batch)
+                total += len(batch)
+                self.checkpoint(stage)
+        self.checkpoint(stage, done=True)
+        return total
+    
+    def write_cell(self, stage, query, rows):
+        """Écrit une cellule de la grille sur sa propre session"""
+        with self.session() as session:
+            for batch in batched(rows, lambda: self.sizers[stage].size):
+                self.write(session, stage, query, batch)
+        return len(rows)
+    
+    def write_partitioned(self, stage, query, rows, start_key, end_key, symmetric=False):
+        """Import parallèle d'une relation sur un pool de sessions.
         
-        query = """
-        UNWIND $follows AS follow
-        MATCH (follower:User {id: follow.followerId})
-        MATCH (followed:User {id: follow.followedId})
-        MERGE (follower)-[r:FOLLOWS]->(followed)
-        SET r.since = datetime(follow.since)
+        Les lignes sont lues par fenêtres puis réparties sur une grille selon
+        les identifiants des deux extrémités ; les cellules d'un même tour
+        ne verrouillent jamais les mêmes nœuds. Une fenêtre compte une taille
+        de lot par cellule, pour que chaque transaction garde la taille de
+        lot de l'étape, dans la limite de PARTITION_WINDOW_ROWS lignes en
+        mémoire : au-delà, les transactions rapetissent avec les cellules.
         """
+        if self.workers <= 1:
+            return self.write_batches(stage, query, rows)
         
-        with self.driver.session() as session:
-            session.run(query, follows=follows)
-        print(f"✅ {len(follows)} follows importés")
+        query = self.cypher(query)
+        sizer = self.sizers[stage]
+        n = self.workers * 2 if symmetric else self.workers
+        total = 0
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            for window in batched(rows, lambda: min(sizer.size * n * n, PARTITION_WINDOW_ROWS)):
+                grid = [[[] for _ in range(n)] for _ in range(n)]
+                for row in window:
+                    grid[partition(row[start_key], n)][partition(row[end_key], n)].append(row)
+                
+                for cells in grid_rounds(grid, symmetric):
+                    futures = [pool.submit(self.write_cell, stage, query, cell) for cell in cells if cell]
+                    total += sum(f.result() for f in futures)
+                self.checkpoint(stage)
+        self.checkpoint(stage, done=True)
+        return total
+    
+    def import_users(self):
+        """Import des utilisateurs"""
+        users = self.rows("users", "users.ndjson")
+        count = self.write_batches("users", QUERIES["users"], users)
+        print(f"✅ {count} utilisateurs importés")
+
+    def import_follows(self):
+        """Import des relations FOLLOWS"""
+        follows = self.rows("follows", "follows.ndjson")
+        count = self.write_partitioned(
+            "follows", QUERIES["follows"], follows,
+            "followerId", "followedId", symmetric=True
+        )
+        print(f"✅ {count} follows importés")
 
     def import_posts(self):
         """Import des posts"""
-        posts = self.load_ndjson("posts.ndjson")
-        posts = [p for p in posts if p.get('id') and p.get('authorId')]
-        
-        query = """
-        UNWIND $posts AS post
-        MATCH (author:User {id: post.authorId})
-        MERGE (p:Post {id: post.id})
-        SET p.content = post.content,
-            p.mediaUrl = post.mediaUrl,
-            p.visibility = post.visibility,
-            p.likeCount = post.likeCount,
-            p.commentCount = post.commentCount,
-            p.createdAt = datetime(post.createdAt)
-        MERGE (author)-[:POSTED]->(p)
-        """
-        
-        with self.driver.session() as session:
-            session.run(query, posts=posts)
-        print(f"✅ {len(posts)} posts importés")
+        posts = self.rows("posts", "posts.ndjson")
+        count = self.write_batches("posts", QUERIES["posts"], posts)
+        print(f"✅ {count} posts importés")
+
+    def write_dictionaries(self, tags, topics):
+        """Crée les nœuds Tag et Topic"""
+        self.write_batches("dictionaries", TAG_QUERY, ({"name": t} for t in sorted(tags)))
+        self.write_batches("dictionaries", TOPIC_QUERY,
+                           ({"id": t, "name": topic_name(t)} for t in sorted(topics)))
+        print(f"✅ {len(tags)} tags et {len(topics)} topics créés")
 
+    def import_dictionaries(self):
+        """Import des nœuds Tag et Topic, créés une seule fois chacun"""
+        tags, topics = set(), set()
+        for pt in read_rows(dataset_path(DATA_DIR, "post_tags.ndjson")):
+            if is_present(pt.get('tagName')):
+                tags.add(pt['tagName'])
+        for post in read_rows(dataset_path(DATA_DIR, "posts.ndjson")):
+            if is_present(post.get('topic')):
+                topics.add(post['topic'])
+        self.write_dictionaries(tags, topics)
+    
     def import_post_tags(self):
-        """Import des tags"""
-        post_tags = self.load_ndjson("post_tags.ndjson")
-        
-        # Filtrer les entrées invalides
-        post_tags = [
-            pt for pt in post_tags 
-            if pt.get('postId') and pt.get('tagName') and pt['tagName'].strip()
-        ]
-        
-        if not post_tags:
+        """Import des relations TAGGED_WITH (les tags existent déjà)"""
+        post_tags = self.rows("post_tags", "post_tags.ndjson")
+        count = self.write_partitioned(
+            "post_tags", QUERIES["post_tags"], post_tags,
+            "tagName", "postId"
+        )
+        if not count:
             print("⚠️  Aucun tag valide à importer")
             return
-        
-        query = """
-        UNWIND $post_tags AS pt
-        MATCH (p:Post {id: pt.postId})
-        MERGE (t:Tag {name: pt.tagName})
-        MERGE (p)-[:TAGGED_WITH]->(t)
-        """
-        
-        with self.driver.session() as session:
-            session.run(query, post_tags=post_tags)
-        print(f"✅ {len(post_tags)} tags importés")
+        print(f"✅ {count} tags importés")
+    
+    def import_post_topics(self):
+        """Import des relations IN_TOPIC (les topics existent déjà)"""
+        post_topics = self.rows("post_topics", "posts.ndjson")
+        count = self.write_partitioned(
+            "post_topics", QUERIES["post_topics"], post_topics,
+            "topic", "id"
+        )
+        print(f"✅ {count} posts rattachés à un topic")
+
+    def track_posts(self, rows):
+        """Note les posts dont les compteurs changent lors d'un import incrémental"""
+        for row in rows:
+            if self.touched_posts is not None:
+                self.touched_posts.add(row["postId"])
+            yield row
+
+    def recount_counters(self, post_ids=None):
+        """Remet likeCount et commentCount en accord avec les relations LIKED / ON"""
+        print("🔢 Recalcul de likeCount et commentCount...")
+        start = time.perf_counter()
+        checked, updated = recount_posts(self.session, post_ids, workers=max(self.workers, RECOUNT_WORKERS))
+        self.report.record_stage("counters", time.perf_counter() - start, postsChecked=checked, postsUpdated=updated)
+        print(f"✅ {checked} posts vérifiés, {updated} compteurs corrigés")
 
     def import_likes(self):
         """Import des likes"""
-        likes = self.load_ndjson("likes.ndjson")
-        likes = [l for l in likes if l.get('userId') and l.get('postId')]
-        
-        query = """
-        UNWIND $likes AS like
-        MATCH (u:User {id: like.userId})
-        MATCH (p:Post {id: like.postId})
-        MERGE (u)-[r:LIKED]->(p)
-        SET r.likedAt = datetime(like.likedAt)
-        """
-        
-        with self.driver.session() as session:
-            session.run(query, likes=likes)
-        print(f"✅ {len(likes)} likes importés")
+        likes = self.track_posts(self.rows("likes", "likes.ndjson"))
+        count = self.write_partitioned(
+            "likes", QUERIES["likes"], likes,
+            "postId", "userId"
+        )
+        print(f"✅ {count} likes importés")
 
     def import_comments(self):
         """Import des commentaires"""
-        comments = self.load_ndjson("comments.ndjson")
-        comments = [c for c in comments if c.get('id') and c.get('authorId') and c.get('postId')]
-        
-        query = """
-        UNWIND $comments AS comment
-        MATCH (author:User {id: comment.authorId})
-        MATCH (p:Post {id: comment.postId})
-        MERGE (c:Comment {id: comment.id})
-        SET c.content = comment.content,
-            c.createdAt = datetime(comment.createdAt)
-        MERGE (author)-[:COMMENTED]->(c)
-        MERGE (c)-[:ON]->(p)
-        """
-        
-        with self.driver.session() as session:
-            session.run(query, comments=comments)
-        print(f"✅ {len(comments)} commentaires importés")
+        comments = self.track_posts(self.rows("comments", "comments.ndjson"))
+        count = self.write_partitioned(
+            "comments", QUERIES["comments"], comments,
+            "postId", "authorId"
+        )
+        print(f"✅ {count} commentaires importés")
 
     def import_groups(self):
         """Import des groupes"""
-        groups = self.load_ndjson("groups.ndjson")
-        groups = [g for g in groups if g.get('id') and g.get('createdBy')]
-        
-        query = """
-        UNWIND $groups AS group
-        MATCH (creator:User {id: group.createdBy})
-        MERGE (g:Group {id: group.id})
-        SET g.name = group.name,
-            g.description = group.description,
-            g.visibility = group.visibility,
-            g.createdAt = datetime(group.createdAt)
-        MERGE (creator)-[:CREATED]->(g)
-        """
-        
-        with self.driver.session() as session:
-            session.run(query, groups=groups)
-        print(f"✅ {len(groups)} groupes importés")
+        groups = self.rows("groups", "groups.ndjson")
+        count = self.write_batches("groups", QUERIES["groups"], groups)
+        print(f"✅ {count} groupes importés")
 
     def import_group_members(self):
         """Import des membres de groupes"""
-        members = self.load_ndjson("group_members.ndjson")
-        members = [m for m in members if m.get('userId') and m.get('groupId')]
-        
-        query = """
-        UNWIND $members AS member
-        MATCH (u:User {id: member.userId})
-        MATCH (g:Group {id: member.groupId})
-        MERGE (u)-[r:MEMBER_OF]->(g)
-        SET r.role = member.role,
-            r.joinedAt = datetime(member.joinedAt)
-        """
-        
-        with self.driver.session() as session:
-            session.run(query, members=members)
-        print(f"✅ {len(members)} membres de groupes importés")
+        members = self.rows("group_members", "group_members.ndjson")
+        count = self.write_partitioned(
+            "group_members", QUERIES["group_members"], members,
+            "groupId", "userId"
+        )
+        print(f"✅ {count} membres de groupes importés")
 
     def import_reports(self):
         """Import des reports"""
-        reports = self.load_ndjson("reports.ndjson")
-        reports = [r for r in reports if r.get('id')]
-        
-        query = """
-        UNWIND $reports AS report
-        MERGE (r:Report {id: report.id})
-        SET r.reason = report.reason,
-            r.status = report.status,
-            r.createdAt = datetime(report.createdAt)
-        """
-        
-        with self.driver.session() as session:
-            session.run(query, reports=reports)
-        print(f"✅ {len(reports)} reports importés")
+        reports = self.rows("reports", "reports.ndjson")
+        count = self.write_batches("reports", QUERIES["reports"], reports)
+        print(f"✅ {count} reports importés")
+
+    def write_report_relations(self, session, batch):
+        """Écrit un lot de relations de reports, une requête par type de cible"""
+        count = 0
+        for target_type in TARGET_TYPES:
+            filtered = [r for r in batch if r['targetType'] == target_type]
+            if filtered:
+                self.write(session, "report_relations", self.cypher(report_relation_query(target_type)), filtered)
+                count += len(filtered)
+        return count
 
     def import_report_relations(self):
         """Import des relations de reports"""
-        relations = self.load_ndjson("report_relations.ndjson")
-        relations = [
-            r for r in relations 
-            if r.get('reportedBy') and r.get('reportId') and r.get('targetType') and r.get('targetId')
-        ]
+        relations = self.rows("report_relations", "report_relations.ndjson")
         
-        # Import en 3 passes selon le type de cible
-        for target_type in ['Post', 'Comment', 'User']:
-            filtered = [r for r in relations if r['targetType'] == target_type]
-            
-            if not filtered:
-                continue
-            
-            if target_type == 'Post':
-                query = """
-                UNWIND $relations AS rel
-                MATCH (u:User {id: rel.reportedBy})
-                MATCH (r:Report {id: rel.reportId})
-                MATCH (target:Post {id: rel.targetId})
-                MERGE (u)-[:REPORTED]->(r)
-                MERGE (r)-[:TARGET]->(target)
-                """
-            elif target_type == 'Comment':
-                query = """
-                UNWIND $relations AS rel
-                MATCH (u:User {id: rel.reportedBy})
-                MATCH (r:Report {id: rel.reportId})
-                MATCH (target:Comment {id: rel.targetId})
-                MERGE (u)-[:REPORTED]->(r)
-                MERGE (r)-[:TARGET]->(target)
-                """
-            else:  # User
-                query = """
-                UNWIND $relations AS rel
-                MATCH (u:User {id: rel.reportedBy})
-                MATCH (r:Report {id: rel.reportId})
-                MATCH (target:User {id: rel.targetId})
-                MERGE (u)-[:REPORTED]->(r)
-                MERGE (r)-[:TARGET]->(target)
-                """
-            
-            with self.driver.session() as session:
-                session.run(query, relations=filtered)
+        count = 0
+        with self.session() as session:
+            for batch in batched(relations, lambda: self.sizers["report_relations"].size):
+                count += self.write_report_relations(session, batch)
+                self.checkpoint("report_relations")
+        self.checkpoint("report_relations", done=True)
         
-        print(f"✅ {len(relations)} relations de reports importées")
+        print(f"✅ {count} relations de reports importées")
     
-    def run_full_import(self):
-        """Lance l'import complet"""
+    def run_full_import(self, resume=False, recreate=True, concurrency=1, report_path=REPORT_FILE):
+        """Lance l'import complet.
+        
+        Avec `resume`, la base n'est pas vidée : chaque étape reprend après son
+        dernier lot validé, ou n'importe que les lignes ajoutées depuis ; seuls
+        les posts touchés par ces likes et commentaires voient leurs compteurs
+        recalculés, au lieu de tous les posts après un chargement complet.
+        """
+        if resume and self.fresh:
+            raise ValueError("Le mode fresh (CREATE) exige une base vide, incompatible avec resume")
         print("🚀 Début de l'import...")
         
-        self.clear_database()
-        self.create_constraints()
+        if resume:
+            print("↪️  Reprise depuis le manifeste, base conservée")
+        else:
+            self.clear_database(recreate=recreate)
+            self.checkpoints.reset()
+        self.touched_posts = set() if resume else None
+        self.schema.before_load()
+        
+        if self.validate:
+            print("🔍 Index des identifiants pour la validation...")
+            self.integrity.build(lambda filename: read_rows(dataset_path(DATA_DIR, filename)))
         
-        self.import_users()
-        self.import_follows()
-        self.import_posts()
-        self.import_post_tags()
-        self.import_likes()
-        self.import_comments()
-        self.import_groups()
-        self.import_group_members()
-        self.import_reports()
-        self.import_report_relations()
+        start = time.perf_counter()
+        try:
+            durations = self.run_stages(concurrency)
+            if self.touched_posts is None:
+                self.recount_counters()
+            elif self.touched_posts:
+                self.recount_counters(sorted(self.touched_posts))
+            self.build_indexes()
+        finally:
+            self.report.write(report_path)
+            print(f"📊 Rapport écrit dans {report_path}")
+        elapsed = time.perf_counter() - start
         
+        path, length = critical_path(durations)
+        print(f"\n⏱️  Chemin critique : {' → '.join(path)} ({length:.1f}s)")
+        print(f"   Durée totale {elapsed:.1f}s, somme des étapes {sum(durations.values()):.1f}s")
         print("\n✅ Import terminé avec succès!")
+    
+    def timed_stage(self, stage):
+        start = time.perf_counter()
+        getattr(self, f"import_{stage}")()
+        seconds = time.perf_counter() - start
+        
+        stats = self.report.stage(stage)
+        nodes, rels = EXPECTED_WRITES[stage]
+        expected = {"nodes_created": nodes * stats.rows, "relationships_created": rels * stats.rows}
+        missing = {k: v - stats.counters[k] for k, v in expected.items() if v > stats.counters[k]}
+        rejected = self.integrity.counts(stage)
+        sizer = self.sizers[stage]
+        self.report.record_stage(stage, seconds, expected=expected, missing=missing, rejected=rejected,
+                                 initialBatchSize=sizer.initial, batchSize=sizer.size)
+        
+        print(self.report.summary_line(stage))
+        if rejected:
+            print(f"⚠️  {stage} : lignes rejetées {rejected} (voir {REJECTS_FILE})")
+        if missing and self.fresh:
+            # En mode MERGE l'écart peut venir d'éléments déjà présents
+            print(f"⚠️  {stage} : écritures manquantes côté serveur {missing}")
+        return seconds
+    
+    def run_stages(self, concurrency=1):
+        """Lance chaque étape dès que ses dépendances sont terminées,
+        avec au plus `concurrency` étapes en parallèle"""
+        pending = dict(STAGES)
+        running, durations = {}, {}
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            while pending or running:
+                ready = [stage for stage, deps in pending.items() if all(d in durations for d in deps)]
+                for stage in ready:
+                    del pending[stage]
+                    running[pool.submit(self.timed_stage, stage)] = stage
+                
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    durations[running.pop(future)] = future.result()
+        return durations
+
+    def write_stage_batch(self, session, stage, batch):
+        """Écrit un lot d'une étape avec sa requête"""
+        if stage == "report_relations":
+            self.write_report_relations(session, batch)
+        else:
+            self.write(session, stage, self.cypher(QUERIES[stage]), batch)
+    
+    def run_pipeline(self, source, queue_size=PIPELINE_QUEUE_SIZE, recreate=True, report_path=REPORT_FILE):
+        """Import direct depuis le générateur, sans fichiers intermédiaires.
+        
+        Le générateur remplit une file bornée de lots que les workers écrivent
+        au fil de l'eau : une file pleine suspend la génération, la mémoire
+        reste constante. Avant le premier lot d'une étape, la file est vidée si
+        une étape dont elle dépend a encore des lots en cours.
+        """
+        print("🚀 Import en flux depuis le générateur...")
+        self.clear_database(recreate=recreate)
+        self.checkpoints.reset()
+        self.schema.before_load()
+        self.write_dictionaries(*source.dictionaries())
+        
+        batches = queue.Queue(maxsize=queue_size)
+        errors = []
+        spans = {}
+        lock = threading.Lock()
+        
+        def consume():
+            with self.session() as session:
+                while True:
+                    item = batches.get()
+                    try:
+                        if item is None:
+                            return
+                        if errors:
+                            continue  # une écriture a échoué : la file est seulement vidée
+                        stage, batch = item
+                        for name in [stage] + PIPELINE_FOLLOWUPS.get(stage, []):
+                            start = time.perf_counter()
+                            self.write_stage_batch(session, name, batch)
+                            with lock:
+                                span = spans.setdefault(name, [start, start])
+                                span[1] = time.perf_counter()
+                    except Exception as e:
+                        errors.append(e)
+                    finally:
+                        batches.task_done()
+        
+        start = time.perf_counter()
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                for _ in range(self.workers):
+                    pool.submit(consume)
+                try:
+                    in_flight = set()
+                    for stage, rows in source.generate():
+                        for i, batch in enumerate(batched(rows, lambda: self.sizers[stage].size)):
+                            if i == 0 and in_flight & set(STAGES[stage]):
+                                batches.join()
+                                in_flight.clear()
+                            if errors:
+                                break
+                            batches.put((stage, batch))
+                            in_flight.add(stage)
+                        if errors:
+                            break
+                finally:
+                    for _ in range(self.workers):
+                        batches.put(None)
+            if errors:
+                raise errors[0]
+            
+            self.recount_counters()
+            self.build_indexes()
+        finally:
+            for stage, (first, last) in spans.items():
+                self.report.record_stage(stage, last - first, batchSize=self.sizers[stage].size)
+            self.report.write(report_path)
+            print(f"📊 Rapport écrit dans {report_path}")
+        
+        for stage in spans:
+            print(f"✅ {stage}")
+            print(self.report.summary_line(stage))
+        print(f"\n✅ Import en flux terminé en {time.perf_counter() - start:.1f}s")
+
+def parse_batch_sizes(values):
+    """Convertit les options --batch-size entite=N en dictionnaire"""
+    sizes = {}
+    for value in values:
+        stage, _, size = value.partition("=")
+        if stage not in BATCH_SIZES or not size.isdigit() or int(size) <= 0:
+            raise argparse.ArgumentTypeError(f"--batch-size invalide : {value}")
+        sizes[stage] = int(size)
+    return sizes
 
 if __name__ == "__main__":
-    importer = Neo4jImporter(NEO4J_URI, NEO4J_USER, NEO4J_PASSWORD)
+    parser = argparse.ArgumentParser(description="Import des fichiers NDJSON dans Neo4j")
+    parser.add_argument("--batch-size", action="append", default=[], metavar="ENTITE=N",
+                        help=f"taille des lots pour une entité ({', '.join(BATCH_SIZES)})")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="sessions parallèles pour les relations (1 = import séquentiel)")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--resume", action="store_true",
+                      help="reprendre l'import sans vider la base (lignes non encore importées)")
+    mode.add_argument("--fresh", action="store_true",
+                      help="chargement initial dans une base vidée : CREATE au lieu de MERGE")
+    parser.add_argument("--batched-wipe", action="store_true",
+                        help="nettoyer la base par lots même si elle peut être recréée")
+    parser.add_argument("--concurrency", type=int, default=1,
+                        help="étapes indépendantes exécutées en parallèle")
+    parser.add_argument("--max-transactions", type=int, default=MAX_TRANSACTIONS,
+                        help="transactions d'écriture simultanées au maximum")
+    parser.add_argument("--report", default=REPORT_FILE, help="fichier du rapport JSON")
+    parser.add_argument("--no-integrity", action="store_true",
+                        help="ne pas écarter les lignes orphelines (références inconnues) ; les doublons restent écartés")
+    parser.add_argument("--fixed-batches", action="store_true",
+                        help="garder la taille de lot fixe au lieu de l'ajuster à la latence")
+    parser.add_argument("--target-latency", type=float, default=TARGET_LATENCY,
+                        help="latence visée par transaction, en secondes")
+    parser.add_argument("--pipeline", action="store_true",
+                        help="générer les données et les importer en flux, sans passer par les fichiers")
+    parser.add_argument("--queue-size", type=int, default=PIPELINE_QUEUE_SIZE,
+                        help="lots en attente entre le générateur et les workers (mode pipeline)")
+    args = parser.parse_args()
+    if args.pipeline and args.resume:
+        parser.error("--pipeline ne peut pas reprendre un import (--resume)")
+    
+    importer = Neo4jImporter(NEO4J_URI, NEO4J_USER, NEO4J_PASSWORD,
+                             batch_sizes=parse_batch_sizes(args.batch_size),
+                             workers=args.workers,
+                             fresh=args.fresh,
+                             max_transactions=args.max_transactions,
+                             validate=not args.no_integrity,
+                             adaptive=not args.fixed_batches,
+                             target_latency=args.target_latency)
     try:
-        importer.run_full_import()
+        if args.pipeline:
+            from generator import SocialNetworkGenerator
+            importer.run_pipeline(SocialNetworkGenerator(), queue_size=args.queue_size,
+                                  recreate=not args.batched_wipe, report_path=args.report)
+        else:
+            importer.run_full_import(resume=args.resume, recreate=not args.batched_wipe,
+                                     concurrency=args.concurrency, report_path=args.report)
     finally:
         importer.close()
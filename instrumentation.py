@@ -0,0 +1,102 @@
+import json
+import threading
+import time
+from datetime import datetime
+
+# Compteurs serveur (ResultSummary.counters) conservés dans le rapport
+COUNTERS = [
+    "nodes_created",
+    "nodes_deleted",
+    "relationships_created",
+    "relationships_deleted",
+    "properties_set",
+    "labels_added",
+]
+
+class StageStats:
+    def __init__(self):
+        self.rows = 0
+        self.batches = 0
+        self.retries = 0
+        self.batch_seconds = 0.0
+        self.wall_seconds = None
+        self.counters = dict.fromkeys(COUNTERS, 0)
+        self.result_available_after = 0
+        self.result_consumed_after = 0
+        self.slowest_batch = 0.0
+        self.extra = {}
+
+    def to_dict(self):
+        seconds = self.wall_seconds or self.batch_seconds
+        return {
+            "rows": self.rows,
+            "batches": self.batches,
+            "retries": self.retries,
+            "wallSeconds": round(seconds, 3),
+            "batchSeconds": round(self.batch_seconds, 3),
+            "slowestBatchSeconds": round(self.slowest_batch, 3),
+            "rowsPerSecond": round(self.rows / seconds, 1) if seconds else None,
+            "counters": self.counters,
+            "serverMs": {
+                "resultAvailableAfter": self.result_available_after,
+                "resultConsumedAfter": self.result_consumed_after,
+            },
+            **self.extra,
+        }
+
+class ImportReport:
+    """Mesures de l'import par étape et par lot (durées, débit, retries,
+    compteurs serveur), écrites dans un rapport JSON"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.stages = {}
+        self.started = datetime.now().isoformat(timespec='seconds')
+        self.start = time.perf_counter()
+
+    def stage(self, stage):
+        with self.lock:
+            return self.stages.setdefault(stage, StageStats())
+
+    def record_batch(self, stage, rows, seconds, attempts, summary):
+        """Enregistre un lot validé et le résumé renvoyé par le serveur"""
+        stats = self.stage(stage)
+        with self.lock:
+            stats.rows += rows
+            stats.batches += 1
+            stats.retries += attempts - 1
+            stats.batch_seconds += seconds
+            stats.slowest_batch = max(stats.slowest_batch, seconds)
+            for name in COUNTERS:
+                stats.counters[name] += getattr(summary.counters, name, 0)
+            stats.result_available_after += summary.result_available_after or 0
+            stats.result_consumed_after += summary.result_consumed_after or 0
+
+    def record_stage(self, stage, seconds, **extra):
+        stats = self.stage(stage)
+        with self.lock:
+            stats.wall_seconds = seconds
+            stats.extra.update(extra)
+
+    def summary_line(self, stage):
+        """Résumé lisible de ce que le serveur a réellement écrit"""
+        data = self.stage(stage).to_dict()
+        counters = data["counters"]
+        return (
+            f"   ↳ {counters['nodes_created']} nœuds, {counters['relationships_created']} relations créés, "
+            f"{counters['properties_set']} propriétés, {data['rowsPerSecond'] or 0:.0f} lignes/s, "
+            f"{data['retries']} retries"
+        )
+
+    def to_dict(self):
+        with self.lock:
+            stages = {name: stats.to_dict() for name, stats in self.stages.items()}
+        return {
+            "startedAt": self.started,
+            "wallSeconds": round(time.perf_counter() - self.start, 3),
+            "stages": stages,
+        }
+
+    def write(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=2, ensure_ascii=False)
@@ -0,0 +1,192 @@
+import re
+import json
+import threading
+from collections import defaultdict
+
+ID_PATTERN = re.compile(r"([A-Za-z]+)_(\d+)$")
+
+# Numéros au-delà desquels un identifiant va dans le set (le bitmap d'un
+# format ne dépasse pas 16 Mo) et largeur du second numéro d'un couple codé
+MAX_BITMAP_NUMBER = 1 << 27
+PAIR_SHIFT = 32
+
+# Cibles possibles d'un report
+TARGET_TYPES = ("Post", "Comment", "User")
+
+# Étape -> (champs obligatoires, références {champ: label}, clé d'unicité)
+# Le label "targetType" est lu dans la ligne (cibles polymorphes des reports)
+RULES = {
+    "users": (("id",), {}, ("id",)),
+    "reports": (("id",), {}, ("id",)),
+    "follows": (("followerId", "followedId"), {"followerId": "User", "followedId": "User"},
+                ("followerId", "followedId")),
+    "posts": (("id", "authorId"), {"authorId": "User"}, ("id",)),
+    "groups": (("id", "createdBy"), {"createdBy": "User"}, ("id",)),
+    "post_tags": (("postId", "tagName"), {"postId": "Post"}, ("postId", "tagName")),
+    "post_topics": (("id", "topic"), {"id": "Post"}, ("id",)),
+    "likes": (("userId", "postId"), {"userId": "User", "postId": "Post"}, ("userId", "postId")),
+    "comments": (("id", "authorId", "postId"), {"authorId": "User", "postId": "Post"}, ("id",)),
+    "group_members": (("userId", "groupId"), {"userId": "User", "groupId": "Group"}, ("userId", "groupId")),
+    "report_relations": (("reportedBy", "reportId", "targetType", "targetId"),
+                         {"reportedBy": "User", "reportId": "Report", "targetId": "targetType"},
+                         ("reportId", "targetId")),
+}
+
+# Fichiers de nœuds lus avant l'import, dans l'ordre des dépendances
+NODE_SOURCES = [
+    ("User", "users", "users.ndjson"),
+    ("Post", "posts", "posts.ndjson"),
+    ("Comment", "comments", "comments.ndjson"),
+    ("Group", "groups", "groups.ndjson"),
+    ("Report", "reports", "reports.ndjson"),
+]
+
+def encode_id(value):
+    """'u_00042' -> (('u', 5), 42) ; None si l'identifiant n'a pas ce format"""
+    match = ID_PATTERN.match(value)
+    if not match:
+        return None
+    prefix, digits = match.groups()
+    return (prefix, len(digits)), int(digits)
+
+class IdIndex:
+    """Ensemble compact d'identifiants : un bit par numéro pour chaque format
+    (préfixe, nombre de chiffres) et un set Python pour les identifiants hors
+    format ou de numéro trop grand (MAX_BITMAP_NUMBER)"""
+
+    def __init__(self):
+        self.bitmaps = {}
+        self.others = set()
+        self.size = 0
+
+    def add(self, value):
+        """Ajoute l'identifiant ; False s'il était déjà présent"""
+        encoded = encode_id(value)
+        if encoded is None or encoded[1] >= MAX_BITMAP_NUMBER:
+            if value in self.others:
+                return False
+            self.others.add(value)
+        else:
+            fmt, number = encoded
+            bitmap = self.bitmaps.setdefault(fmt, bytearray())
+            byte, bit = divmod(number, 8)
+            if byte >= len(bitmap):
+                bitmap.extend(bytes(max(byte + 1 - len(bitmap), len(bitmap))))
+            if bitmap[byte] & (1 << bit):
+                return False
+            bitmap[byte] |= 1 << bit
+        self.size += 1
+        return True
+
+    def __contains__(self, value):
+        encoded = encode_id(value)
+        if encoded is None or encoded[1] >= MAX_BITMAP_NUMBER:
+            return value in self.others
+        fmt, number = encoded
+        bitmap = self.bitmaps.get(fmt)
+        byte, bit = divmod(number, 8)
+        return bitmap is not None and byte < len(bitmap) and bool(bitmap[byte] & (1 << bit))
+
+    def __len__(self):
+        return self.size
+
+class PairIndex:
+    """Ensemble de couples d'identifiants, chaque couple codé en un seul entier
+    tant que le second numéro tient sur PAIR_SHIFT bits, en tuple sinon"""
+
+    def __init__(self):
+        self.keys = defaultdict(set)
+
+    def add(self, a, b):
+        ea, eb = encode_id(a), encode_id(b)
+        if ea is None or eb is None:
+            fmt, key = None, (a, b)
+        else:
+            fmt = (ea[0], eb[0])
+            key = (ea[1] << PAIR_SHIFT) | eb[1] if eb[1] < 1 << PAIR_SHIFT else (ea[1], eb[1])
+        keys = self.keys[fmt]
+        if key in keys:
+            return False
+        keys.add(key)
+        return True
+
+def is_present(value):
+    return isinstance(value, str) and bool(value.strip())
+
+class IntegrityChecker:
+    """Validation avant import : champs obligatoires, références vers des nœuds
+    connus (orphelins) et doublons. Les lignes rejetées sont écrites dans un
+    fichier de rejets avec leur motif."""
+
+    def __init__(self, rejects_path, dedup_pairs=False):
+        self.rejects_path = rejects_path
+        self.dedup_pairs = dedup_pairs
+        self.known = None
+        self.rejected = defaultdict(lambda: defaultdict(int))
+        self.lock = threading.Lock()
+        self.rejects = None
+
+    def close(self):
+        if self.rejects is not None:
+            self.rejects.close()
+
+    def build(self, read):
+        """Construit les index d'identifiants des nœuds qui seront réellement importés
+        (`read(nom_de_fichier)` renvoie les lignes d'un fichier de nœuds)"""
+        self.known = {}
+        for label, stage, filename in NODE_SOURCES:
+            index = IdIndex()
+            required, refs, _ = RULES[stage]
+            for row in read(filename):
+                if self.check(row, required, refs) is None:
+                    index.add(row["id"])
+            self.known[label] = index
+            print(f"  🔎 {label} : {len(index)} identifiants")
+
+    def check(self, row, required, refs):
+        """Motif de rejet d'une ligne, ou None si elle est valide"""
+        for field in required:
+            if not is_present(row.get(field)):
+                return f"missing_{field}"
+        if self.known is None:
+            return None
+        for field, label in refs.items():
+            if label == "targetType":
+                label = row["targetType"]
+                if label not in TARGET_TYPES:
+                    return "invalid_targetType"
+            if row[field] not in self.known[label]:
+                return f"orphan_{field}"
+        return None
+
+    def filter(self, stage, rows):
+        """Ne laisse passer vers Neo4j que les lignes valides de l'étape"""
+        required, refs, key = RULES[stage]
+        if len(key) == 1:
+            seen = IdIndex()
+            is_new = lambda row: seen.add(row[key[0]])
+        elif self.dedup_pairs:
+            seen = PairIndex()
+            is_new = lambda row: seen.add(row[key[0]], row[key[1]])
+        else:
+            is_new = None
+
+        for row in rows:
+            reason = self.check(row, required, refs)
+            if reason is None and is_new is not None and not is_new(row):
+                reason = "duplicate"
+            if reason is not None:
+                self.reject(stage, reason, row)
+                continue
+            yield row
+
+    def reject(self, stage, reason, row):
+        with self.lock:
+            self.rejected[stage][reason] += 1
+            if self.rejects is None:
+                self.rejects = open(self.rejects_path, "w", encoding="utf-8")
+            self.rejects.write(json.dumps({"stage": stage, "reason": reason, "row": row}, ensure_ascii=False) + "\n")
+
+    def counts(self, stage):
+        with self.lock:
+            return dict(self.rejected.get(stage, {}))
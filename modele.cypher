@@ -2,6 +2,9 @@
 /*  CONTRAINTES ET INDEX                        */
 /* ============================================ */
 
+// Schéma appliqué par l'import : voir schema.py (contraintes avant le
+// chargement, index secondaires et d'intervalle après)
+
 // Contraintes d'unicité
 CREATE CONSTRAINT user_id IF NOT EXISTS FOR (u:User) REQUIRE u.id IS UNIQUE;
 CREATE CONSTRAINT post_id IF NOT EXISTS FOR (p:Post) REQUIRE p.id IS UNIQUE;
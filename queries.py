@@ -0,0 +1,380 @@
+import os
+import json
+import time
+import argparse
+import threading
+from collections import Counter, OrderedDict
+from neo4j import GraphDatabase
+from dotenv import load_dotenv
+
+load_dotenv()
+NEO4J_URI = os.getenv("NEO4J_URI")
+NEO4J_USER = os.getenv("NEO4J_USER", "neo4j")
+NEO4J_PASSWORD = os.getenv("NEO4J_PASSWORD")
+NEO4J_DATABASE = os.getenv("NEO4J_DATABASE", "neo4j")
+
+# Cache des résultats : entrées au plus et durée de vie en secondes
+CACHE_SIZE = 10000
+CACHE_TTL = 30.0
+
+FEED_LIMIT = 20
+COMMENT_LIMIT = 20
+MODERATION_LIMIT = 50
+SUGGESTION_LIMIT = 10
+MODERATION_STATUSES = ("open", "in_review")
+
+# Un post est visible par son auteur ; sinon jamais s'il est privé, par tous
+# s'il est public et l'auteur public, par les abonnés de l'auteur sinon.
+# `viewer` peut être nul (lecteur anonyme).
+VISIBLE = """
+(author = viewer
+ OR (p.visibility = 'public' AND author.privacy = 'public')
+ OR (p.visibility <> 'private' AND viewer IS NOT NULL AND EXISTS { (viewer)-[:FOLLOWS]->(author) }))
+"""
+
+POST_FIELDS = """
+p {.id, .content, .mediaUrl, .visibility, .likeCount, .commentCount,
+   createdAt: toString(p.createdAt), authorId: author.id, authorName: author.name}
+"""
+
+# Lectures paramétrées ; chaque point d'entrée est un identifiant couvert par
+# une contrainte d'unicité (ou l'index report_status), jamais un parcours complet
+READ_QUERIES = {
+    # Posts récents des comptes suivis ; les abonnements sont renvoyés pour
+    # invalider le fil quand l'un de ces comptes publie
+    "home_timeline": f"""
+    MATCH (viewer:User {{id: $userId}})
+    CALL {{
+        WITH viewer
+        MATCH (viewer)-[:FOLLOWS]->(followed:User)
+        RETURN collect(followed.id) AS following
+    }}
+    CALL {{
+        WITH viewer
+        MATCH (viewer)-[:FOLLOWS]->(author:User)-[:POSTED]->(p:Post)
+        WHERE p.visibility <> 'private' AND ($before IS NULL OR p.createdAt < datetime($before))
+        WITH p, author ORDER BY p.createdAt DESC LIMIT $limit
+        RETURN collect({POST_FIELDS}) AS posts
+    }}
+    RETURN following, posts
+    """,
+    "post_detail": f"""
+    MATCH (author:User)-[:POSTED]->(p:Post {{id: $postId}})
+    OPTIONAL MATCH (viewer:User {{id: $viewerId}})
+    WITH p, author, viewer
+    WHERE {VISIBLE}
+    CALL {{
+        WITH p
+        MATCH (p)<-[:ON]-(c:Comment)<-[:COMMENTED]-(commenter:User)
+        WITH c, commenter ORDER BY c.createdAt DESC LIMIT $commentLimit
+        RETURN collect(c {{.id, .content, createdAt: toString(c.createdAt),
+                          authorId: commenter.id, authorName: commenter.name}}) AS comments
+    }}
+    RETURN {POST_FIELDS} AS post,
+           [(p)-[:TAGGED_WITH]->(t:Tag) | t.name] AS tags,
+           head([(p)-[:IN_TOPIC]->(tp:Topic) | tp.id]) AS topic,
+           comments
+    """,
+    "tag_feed": f"""
+    MATCH (t:Tag {{name: $tag}})
+    OPTIONAL MATCH (viewer:User {{id: $viewerId}})
+    CALL {{
+        WITH t, viewer
+        MATCH (t)<-[:TAGGED_WITH]-(p:Post)<-[:POSTED]-(author:User)
+        WHERE ($before IS NULL OR p.createdAt < datetime($before)) AND {VISIBLE}
+        WITH p, author ORDER BY p.createdAt DESC LIMIT $limit
+        RETURN collect({POST_FIELDS}) AS posts
+    }}
+    RETURN posts
+    """,
+    # Posts des membres d'un groupe public, ou d'un groupe privé dont le lecteur est membre
+    "group_feed": f"""
+    MATCH (g:Group {{id: $groupId}})
+    OPTIONAL MATCH (viewer:User {{id: $viewerId}})
+    WITH g, viewer
+    WHERE g.visibility = 'public' OR EXISTS {{ (viewer)-[:MEMBER_OF]->(g) }}
+    CALL {{
+        WITH g
+        MATCH (g)<-[:MEMBER_OF]-(member:User)
+        RETURN collect(member.id) AS members
+    }}
+    CALL {{
+        WITH g, viewer
+        MATCH (g)<-[:MEMBER_OF]-(author:User)-[:POSTED]->(p:Post)
+        WHERE ($before IS NULL OR p.createdAt < datetime($before)) AND {VISIBLE}
+        WITH p, author ORDER BY p.createdAt DESC LIMIT $limit
+        RETURN collect({POST_FIELDS}) AS posts
+    }}
+    RETURN members, posts
+    """,
+    # File de modération : reports non traités, les plus anciens d'abord
+    "moderation_queue": """
+    MATCH (r:Report)
+    WHERE r.status IN $statuses
+    WITH r ORDER BY r.createdAt LIMIT $limit
+    MATCH (reporter:User)-[:REPORTED]->(r)-[:TARGET]->(target)
+    RETURN r {.id, .reason, .status, createdAt: toString(r.createdAt)} AS report,
+           reporter.id AS reportedBy, labels(target)[0] AS targetType, target.id AS targetId
+    """,
+    # Suggestions précalculées par recommendations.py, sans les comptes suivis depuis
+    "who_to_follow": """
+    MATCH (viewer:User {id: $userId})-[r:RECOMMENDED]->(candidate:User)
+    WHERE NOT EXISTS { (viewer)-[:FOLLOWS]->(candidate) }
+    RETURN candidate {.id, .username, .name} AS user, r.score AS score
+    ORDER BY score DESC LIMIT $limit
+    """,
+}
+
+# Étiquettes de dépendance touchées par une ligne écrite, par étape d'import.
+# ("user", id) : profil et publications d'un utilisateur ; ("follows", id) :
+# abonnements d'un utilisateur ; ("post", id), ("tag", nom), ("group", id) ;
+# ("reports",) : toute la file de modération
+WRITE_TAGS = {
+    "users": lambda row: [("user", row["id"])],
+    "follows": lambda row: [("follows", row["followerId"])],
+    "posts": lambda row: [("post", row["id"]), ("user", row["authorId"])],
+    "post_tags": lambda row: [("post", row["postId"]), ("tag", row["tagName"])],
+    "post_topics": lambda row: [("post", row["id"])],
+    "likes": lambda row: [("post", row["postId"])],
+    "comments": lambda row: [("post", row["postId"])],
+    "groups": lambda row: [("group", row["id"])],
+    "group_members": lambda row: [("group", row["groupId"])],
+    "reports": lambda row: [("reports",)],
+    "report_relations": lambda row: [("reports",)],
+}
+
+def post_tags(posts):
+    return [("post", p["id"]) for p in posts]
+
+def author_tags(posts):
+    # Profil de l'auteur (confidentialité) : décide de la visibilité de ses posts
+    return [("user", p["authorId"]) for p in posts]
+
+class ResultCache:
+    """Cache LRU à durée de vie des résultats de lecture.
+
+    Chaque entrée porte les étiquettes des éléments dont elle dépend ; une
+    écriture sur l'un d'eux (`invalidate`) retire toutes les entrées
+    concernées. Un résultat dont une étiquette a été invalidée pendant sa
+    lecture n'est pas mis en cache : il peut précéder l'écriture. Chaque
+    invalidation avance une horloge et date ses étiquettes ; ces dates ne
+    sont gardées que tant qu'une lecture commencée avant est en cours.
+    """
+
+    def __init__(self, size=CACHE_SIZE, ttl=CACHE_TTL):
+        self.size = size
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.by_tag = {}
+        self.lock = threading.Lock()
+        self.clock = 0
+        self.versions = {}
+        self.reading = Counter()
+        self.hits = 0
+        self.misses = 0
+        self.invalidated = 0
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    self.remove(key)
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def begin(self):
+        """Début d'une lecture : renvoie l'horloge à passer à `put` puis à `end`"""
+        with self.lock:
+            self.reading[self.clock] += 1
+            return self.clock
+
+    def end(self, started):
+        """Fin d'une lecture commencée à `started`, mise en cache ou non"""
+        with self.lock:
+            self.reading[started] -= 1
+            if self.reading[started]:
+                return
+            del self.reading[started]
+            oldest = min(self.reading, default=None)
+            if oldest is None:
+                self.versions.clear()
+            elif oldest > started:
+                self.versions = {tag: version for tag, version in self.versions.items() if version > oldest}
+
+    def put(self, key, value, tags, started):
+        """Ajoute un résultat dont la lecture a commencé à l'horloge `started`"""
+        with self.lock:
+            if any(self.versions.get(tag, 0) > started for tag in tags):
+                return
+            if key in self.entries:
+                self.remove(key)
+            self.entries[key] = (time.monotonic() + self.ttl, value, tags)
+            for tag in tags:
+                self.by_tag.setdefault(tag, set()).add(key)
+            while len(self.entries) > self.size:
+                self.remove(next(iter(self.entries)))
+
+    def remove(self, key):
+        _, _, tags = self.entries.pop(key)
+        for tag in tags:
+            keys = self.by_tag.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.by_tag[tag]
+
+    def invalidate(self, tags):
+        """Retire les entrées dépendant d'une des étiquettes ; renvoie leur nombre"""
+        with self.lock:
+            self.clock += 1
+            if self.reading:
+                for tag in tags:
+                    self.versions[tag] = self.clock
+            keys = set()
+            for tag in tags:
+                keys |= self.by_tag.get(tag, set())
+            for key in keys:
+                self.remove(key)
+            self.invalidated += len(keys)
+            return len(keys)
+
+    def on_write(self, stage, rows):
+        """Écouteur d'écriture de l'importeur : un lot validé d'une étape"""
+        tags_of = WRITE_TAGS.get(stage)
+        if tags_of is not None:
+            self.invalidate({tag for row in rows for tag in tags_of(row)})
+
+    def stats(self):
+        with self.lock:
+            return {"entries": len(self.entries), "hits": self.hits, "misses": self.misses,
+                    "invalidated": self.invalidated}
+
+def run_read(tx, query, params):
+    return [record.data() for record in tx.run(query, params)]
+
+class SocialQueries:
+    """Lectures courantes du réseau social, paramétrées et mises en cache.
+
+    Avec un importeur, `watch` branche l'invalidation du cache sur ses
+    écritures validées.
+    """
+
+    def __init__(self, uri, user, password, database=NEO4J_DATABASE, cache=None):
+        self.driver = GraphDatabase.driver(uri, auth=(user, password))
+        self.database = database
+        self.cache = ResultCache() if cache is None else cache
+
+    def close(self):
+        self.driver.close()
+
+    def session(self):
+        return self.driver.session(database=self.database)
+
+    def watch(self, importer):
+        importer.add_write_listener(self.cache.on_write)
+
+    def read(self, name, params, tags):
+        """Exécute une lecture nommée, ou la sert depuis le cache.
+        `tags(records)` donne les étiquettes de dépendance du résultat."""
+        key = (name, json.dumps(params, sort_keys=True))
+        cached = self.cache.get(key) if self.cache else None
+        if cached is not None:
+            return cached
+        if not self.cache:
+            with self.session() as session:
+                return session.execute_read(run_read, READ_QUERIES[name], params)
+        started = self.cache.begin()
+        try:
+            with self.session() as session:
+                records = session.execute_read(run_read, READ_QUERIES[name], params)
+            self.cache.put(key, records, set(tags(records)), started)
+        finally:
+            self.cache.end(started)
+        return records
+
+    def home_timeline(self, user_id, limit=FEED_LIMIT, before=None):
+        """Fil d'accueil : posts récents (non privés) des comptes suivis"""
+        def tags(records):
+            yield ("follows", user_id)
+            for record in records:
+                yield from (("user", followed) for followed in record["following"])
+                yield from post_tags(record["posts"])
+        records = self.read("home_timeline", {"userId": user_id, "limit": limit, "before": before}, tags)
+        return records[0]["posts"] if records else []
+
+    def post_detail(self, post_id, viewer_id=None, comment_limit=COMMENT_LIMIT):
+        """Post, tags, topic et derniers commentaires ; None si invisible pour le lecteur"""
+        def tags(records):
+            yield ("post", post_id)
+            yield ("follows", viewer_id)
+            for record in records:
+                yield ("user", record["post"]["authorId"])
+        records = self.read("post_detail", {"postId": post_id, "viewerId": viewer_id,
+                                            "commentLimit": comment_limit}, tags)
+        return records[0] if records else None
+
+    def tag_feed(self, tag, viewer_id=None, limit=FEED_LIMIT, before=None):
+        """Posts récents d'un tag visibles par le lecteur"""
+        def tags(records):
+            yield ("tag", tag)
+            yield ("follows", viewer_id)
+            for record in records:
+                yield from post_tags(record["posts"])
+                yield from author_tags(record["posts"])
+        records = self.read("tag_feed", {"tag": tag, "viewerId": viewer_id, "limit": limit, "before": before}, tags)
+        return records[0]["posts"] if records else []
+
+    def group_feed(self, group_id, viewer_id=None, limit=FEED_LIMIT, before=None):
+        """Posts récents des membres d'un groupe ; vide si le groupe est privé
+        et que le lecteur n'en est pas membre"""
+        def tags(records):
+            yield ("group", group_id)
+            yield ("follows", viewer_id)
+            for record in records:
+                yield from (("user", member) for member in record["members"])
+                yield from post_tags(record["posts"])
+                yield from author_tags(record["posts"])
+        records = self.read("group_feed", {"groupId": group_id, "viewerId": viewer_id,
+                                           "limit": limit, "before": before}, tags)
+        return records[0]["posts"] if records else []
+
+    def moderation_queue(self, statuses=MODERATION_STATUSES, limit=MODERATION_LIMIT):
+        """Reports à traiter, du plus ancien au plus récent, avec leur cible"""
+        return self.read("moderation_queue", {"statuses": list(statuses), "limit": limit},
+                         lambda records: [("reports",)])
+
+    def who_to_follow(self, user_id, limit=SUGGESTION_LIMIT):
+        """Comptes suggérés, du meilleur score au moins bon ; l'écriture des
+        suggestions se fait hors de l'importeur, la durée de vie du cache
+        borne leur retard"""
+        return self.read("who_to_follow", {"userId": user_id, "limit": limit},
+                         lambda records: [("follows", user_id)])
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Lectures paramétrées du réseau social")
+    parser.add_argument("query", choices=["timeline", "post", "tag", "group", "moderation", "suggestions"])
+    parser.add_argument("key", nargs="?", help="utilisateur, post, tag ou groupe selon la lecture")
+    parser.add_argument("--viewer", help="identifiant du lecteur (visibilité des posts)")
+    parser.add_argument("--limit", type=int, default=FEED_LIMIT)
+    parser.add_argument("--before", help="date ISO : posts antérieurs seulement (pagination)")
+    args = parser.parse_args()
+    if args.query != "moderation" and not args.key:
+        parser.error(f"{args.query} : identifiant requis")
+
+    queries = SocialQueries(NEO4J_URI, NEO4J_USER, NEO4J_PASSWORD, cache=False)
+    try:
+        result = {
+            "timeline": lambda: queries.home_timeline(args.key, args.limit, args.before),
+            "post": lambda: queries.post_detail(args.key, args.viewer),
+            "tag": lambda: queries.tag_feed(args.key, args.viewer, args.limit, args.before),
+            "group": lambda: queries.group_feed(args.key, args.viewer, args.limit, args.before),
+            "moderation": lambda: queries.moderation_queue(limit=args.limit),
+            "suggestions": lambda: queries.who_to_follow(args.key, args.limit),
+        }[args.query]()
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+    finally:
+        queries.close()
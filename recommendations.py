@@ -0,0 +1,349 @@
+import os
+import time
+import hashlib
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import scipy.sparse as sp
+from neo4j import GraphDatabase
+from dotenv import load_dotenv
+
+from analytics import EdgeLoader, NodeIndex, label_propagation
+from dataset_io import batched, dataset_path, is_columnar, iter_record_batches, read_rows
+
+load_dotenv()
+NEO4J_URI = os.getenv("NEO4J_URI")
+NEO4J_USER = os.getenv("NEO4J_USER", "neo4j")
+NEO4J_PASSWORD = os.getenv("NEO4J_PASSWORD")
+NEO4J_DATABASE = os.getenv("NEO4J_DATABASE", "neo4j")
+
+DATA_DIR = "data"
+# Empreintes de voisinage de la dernière exécution (rafraîchissement incrémental)
+STATE_FILENAME = ".recommendations.npz"
+
+# Suggestions gardées par utilisateur
+TOP_K = 10
+
+# Poids du score : par abonnement commun (comptes suivis qui suivent le
+# candidat), par groupe partagé et bonus de même communauté
+MUTUAL_WEIGHT = 1.0
+GROUP_WEIGHT = 0.5
+COMMUNITY_WEIGHT = 2.0
+
+# Au-delà de cette taille, un groupe n'est plus un signal : le partager ne
+# dit presque rien et ses membres feraient exploser les candidats
+GROUP_SIZE_LIMIT = 500
+
+# Utilisateurs scorés par produit creux (borne la mémoire des candidats)
+SCORE_BLOCK = 20000
+
+# Écriture : relations par transaction et transactions simultanées
+WRITE_BATCH = 20000
+WRITE_WORKERS = 4
+
+FETCH_SIZE = 100000
+
+MEMBERS_QUERY = "MATCH (u:User)-[:MEMBER_OF]->(g:Group) RETURN u.id AS userId, g.id AS groupId"
+COMMUNITIES_QUERY = """
+MATCH (u:User) WHERE u.communityId IS NOT NULL
+RETURN u.id AS id, u.communityId AS communityId
+"""
+
+# Remplace les suggestions de chaque utilisateur du lot
+WRITE_QUERY = """
+UNWIND $rows AS row
+MATCH (u:User {id: row.id})
+OPTIONAL MATCH (u)-[old:RECOMMENDED]->()
+DELETE old
+WITH DISTINCT u, row
+UNWIND row.recommendations AS rec
+MATCH (v:User {id: rec.id})
+CREATE (u)-[:RECOMMENDED {score: rec.score}]->(v)
+"""
+
+# Multiplicateurs impairs qui séparent les composantes de l'empreinte
+MIX = np.array([0x9E3779B97F4A7C15, 0xC2B2AE3D27D4EB4F, 0x165667B19E3779F9,
+                0xD6E8FEB86659FD93, 0xFF51AFD7ED558CCD], dtype=np.uint64)
+
+def id_hashes(ids):
+    """Hachage 64 bits stable des identifiants, indépendant de leur numérotation"""
+    return np.fromiter(
+        (int.from_bytes(hashlib.blake2b(str(value).encode(), digest_size=8).digest(), "little") for value in ids),
+        dtype=np.uint64, count=len(ids))
+
+def read_memberships(source, data_dir=DATA_DIR, driver=None, database=NEO4J_DATABASE):
+    """Blocs (utilisateurs, groupes) des adhésions, depuis les fichiers ou la base"""
+    if source == "files":
+        path = dataset_path(data_dir, "group_members.ndjson")
+        if is_columnar(path):
+            for batch in iter_record_batches(path):
+                yield batch.column("userId").to_pylist(), batch.column("groupId").to_pylist()
+        else:
+            for rows in batched(read_rows(path), lambda: FETCH_SIZE):
+                yield [row["userId"] for row in rows], [row["groupId"] for row in rows]
+        return
+    with driver.session(database=database, fetch_size=FETCH_SIZE) as session:
+        for rows in batched(session.run(MEMBERS_QUERY), lambda: FETCH_SIZE):
+            yield [record["userId"] for record in rows], [record["groupId"] for record in rows]
+
+def read_communities(driver, nodes, database=NEO4J_DATABASE):
+    """communityId écrits par analytics.py ; -1 pour les utilisateurs sans communauté"""
+    communities = np.full(len(nodes), -1, dtype=np.int64)
+    with driver.session(database=database, fetch_size=FETCH_SIZE) as session:
+        for rows in batched(session.run(COMMUNITIES_QUERY), lambda: FETCH_SIZE):
+            known = [(nodes.positions.get(record["id"]), record["communityId"]) for record in rows]
+            known = [(position, community) for position, community in known if position is not None]
+            if known:
+                positions, values = zip(*known)
+                communities[list(positions)] = values
+    return communities
+
+class SocialGraph:
+    """Follows, adhésions aux groupes et communautés sur les mêmes indices d'utilisateurs"""
+
+    def __init__(self, follows, members, communities, ids, group_ids):
+        # Seuls les groupes de taille raisonnable comptent (GROUP_SIZE_LIMIT)
+        sizes = np.diff(members.tocsc().indptr)
+        kept = np.flatnonzero(sizes <= GROUP_SIZE_LIMIT)
+        self.follows = follows
+        self.members = members[:, kept].tocsr()
+        self.communities = communities
+        self.ids = ids
+        self.group_ids = [group_ids[group] for group in kept]
+
+    @classmethod
+    def load(cls, source="files", data_dir=DATA_DIR, driver=None, seed=0, state=None):
+        """Graphe lu depuis data/ ou la base ; sans communityId en base, les
+        communautés sont recalculées par propagation de labels, en reprenant
+        celles de l'état `state` pour qu'elles ne changent pas d'une
+        exécution à l'autre sans raison"""
+        loader = EdgeLoader()
+        if source == "files":
+            loader.from_files(data_dir)
+        else:
+            loader.from_neo4j(driver)
+        groups = NodeIndex()
+        users, group_positions = [], []
+        for block_users, block_groups in read_memberships(source, data_dir, driver):
+            users.append(loader.nodes.encode(block_users))
+            group_positions.append(groups.encode(block_groups))
+        # Les adhésions peuvent ajouter des utilisateurs : matrice construite après
+        follows = loader.matrix()
+        n = follows.shape[0]
+        users = np.concatenate(users) if users else np.empty(0, dtype=np.int64)
+        group_positions = np.concatenate(group_positions) if group_positions else np.empty(0, dtype=np.int64)
+        members = sp.csr_matrix((np.ones(users.size), (users, group_positions)), shape=(n, len(groups)))
+        members.sum_duplicates()
+        members.data[:] = 1.0
+
+        communities = read_communities(driver, loader.nodes) if source == "neo4j" else None
+        if communities is None or (communities < 0).all():
+            labels = state.labels(loader.nodes.ids) if state is not None else None
+            communities, _ = label_propagation(follows, seed, labels=labels)
+        return cls(follows, members, communities, loader.nodes.ids, groups.ids)
+
+    def community_keys(self):
+        """Communauté de chaque utilisateur nommée par le plus petit hachage de
+        ses membres, et non par son numéro qui change d'un calcul à l'autre ;
+        0 sans communauté"""
+        hashes = id_hashes(self.ids)
+        named = self.communities >= 0
+        keys = np.full(self.communities.max() + 1 if named.any() else 0, np.iinfo(np.uint64).max, dtype=np.uint64)
+        np.minimum.at(keys, self.communities[named], hashes[named])
+        community_keys = np.zeros(len(self.ids), dtype=np.uint64)
+        community_keys[named] = keys[self.communities[named]]
+        return community_keys
+
+    def fingerprints(self):
+        """Empreinte 64 bits du voisinage de chaque utilisateur.
+
+        Elle couvre tout ce dont dépendent ses suggestions : ses abonnements,
+        ceux des comptes qu'il suit, les membres de ses groupes, et la
+        communauté et les groupes de chacun d'eux. Ce sont des sommes modulo
+        2^64 de hachages d'identifiants, calculées par produits creux, donc
+        indépendantes de la numérotation des nœuds.
+        """
+        follows = self.follows.astype(np.uint64)
+        members = self.members.astype(np.uint64)
+        tokens = id_hashes(self.ids) + self.community_keys() * MIX[0] + (members @ id_hashes(self.group_ids)) * MIX[1]
+        followed = follows @ tokens
+        return (tokens * MIX[2] + followed + (follows @ followed) * MIX[3]
+                + (members @ (members.T @ tokens)) * MIX[4])
+
+    def score_block(self, users, top_k=TOP_K):
+        """Top-K des candidats d'un bloc d'utilisateurs.
+
+        Candidats : comptes suivis par les comptes suivis (abonnements
+        communs) et membres des mêmes groupes, hors soi-même et comptes déjà
+        suivis ; le bonus de communauté ne s'applique qu'à eux. Renvoie
+        (ligne dans le bloc, candidat, score), trié par ligne puis score
+        décroissant.
+        """
+        follows = self.follows[users]
+        members = self.members[users]
+        scores = (MUTUAL_WEIGHT * (follows @ self.follows) + GROUP_WEIGHT * (members @ self.members.T)).tocsr()
+        scores = (scores - scores.multiply(follows)).tocsr()
+        rows = np.repeat(np.arange(len(users)), np.diff(scores.indptr))
+        scores.data[scores.indices == users[rows]] = 0
+        scores.eliminate_zeros()
+
+        rows = np.repeat(np.arange(len(users)), np.diff(scores.indptr))
+        candidates = scores.indices
+        community = self.communities[candidates]
+        values = scores.data + COMMUNITY_WEIGHT * ((community >= 0) & (community == self.communities[users][rows]))
+        # Tri unique par (ligne, score décroissant) : scores positifs et bornés
+        order = np.argsort(rows * (values.max(initial=0) + 1) - values, kind="stable")
+        rank = np.arange(order.size) - scores.indptr[rows[order]]
+        kept = order[rank < top_k]
+        return rows[kept], candidates[kept], values[kept]
+
+    def recommend(self, users, top_k=TOP_K, block=SCORE_BLOCK):
+        """Lignes à écrire pour `users` (indices), un bloc de SCORE_BLOCK à la fois"""
+        ids = self.ids
+        for start in range(0, len(users), block):
+            chunk = users[start:start + block]
+            rows, candidates, scores = self.score_block(chunk, top_k)
+            bounds = np.searchsorted(rows, np.arange(len(chunk) + 1))
+            candidates, scores = candidates.tolist(), scores.tolist()
+            yield [
+                {"id": ids[user], "recommendations": [
+                    {"id": ids[candidate], "score": score}
+                    for candidate, score in zip(candidates[bounds[i]:bounds[i + 1]], scores[bounds[i]:bounds[i + 1]])
+                ]}
+                for i, user in enumerate(chunk.tolist())
+            ]
+
+class FingerprintState:
+    """Empreintes de voisinage et communautés de la dernière exécution écrite en base"""
+
+    def __init__(self, path=os.path.join(DATA_DIR, STATE_FILENAME)):
+        self.path = path
+        self.entries = {}
+        self.communities = {}
+        if os.path.exists(path):
+            with np.load(path) as saved:
+                ids = saved["ids"].tolist()
+                self.entries = dict(zip(ids, saved["fingerprints"].tolist()))
+                self.communities = dict(zip(ids, saved["communities"].tolist()))
+
+    def labels(self, ids):
+        """Labels de départ de la propagation : communauté précédente des
+        utilisateurs connus, un label à part pour les nouveaux ; None sans état"""
+        if not self.communities:
+            return None
+        known = np.fromiter((user in self.communities for user in ids), dtype=bool, count=len(ids))
+        keys = np.fromiter((self.communities.get(user, 0) for user in ids), dtype=np.uint64, count=len(ids))
+        labels = np.empty(len(ids), dtype=np.int64)
+        _, labels[known] = np.unique(keys[known], return_inverse=True)
+        labels[~known] = labels[known].max(initial=-1) + 1 + np.arange((~known).sum())
+        return labels
+
+    def changed(self, ids, fingerprints):
+        """Indices des utilisateurs nouveaux ou dont le voisinage a changé"""
+        entries = self.entries
+        return np.fromiter((i for i, (user, fingerprint) in enumerate(zip(ids, fingerprints.tolist()))
+                            if entries.get(user) != fingerprint), dtype=np.int64)
+
+    def save(self, ids, fingerprints, communities):
+        tmp = self.path + ".tmp"
+        with open(tmp, "wb") as f:
+            np.savez(f, ids=np.array(ids, dtype=str), fingerprints=fingerprints, communities=communities)
+        os.replace(tmp, self.path)
+        self.entries = dict(zip(ids, fingerprints.tolist()))
+        self.communities = dict(zip(ids, communities.tolist()))
+
+    def reset(self):
+        """Oublie l'état : tout est recalculé, le fichier n'est remplacé qu'au save"""
+        self.entries = {}
+        self.communities = {}
+
+def run_write(tx, rows):
+    return tx.run(WRITE_QUERY, rows=rows).consume()
+
+def write_recommendations(driver, blocks, top_k=TOP_K, database=NEO4J_DATABASE, workers=WRITE_WORKERS):
+    """Remplace les relations RECOMMENDED des utilisateurs de chaque bloc, par
+    lots d'environ WRITE_BATCH relations en parallèle ; renvoie (utilisateurs,
+    relations) écrits"""
+    per_batch = max(1, WRITE_BATCH // top_k)
+
+    def write(rows):
+        with driver.session(database=database) as session:
+            session.execute_write(run_write, rows)
+        return len(rows), sum(len(row["recommendations"]) for row in rows)
+
+    users = relationships = 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        # Un bloc de scores à la fois : les lignes en attente restent bornées
+        for rows in blocks:
+            for written, created in pool.map(write, (rows[i:i + per_batch] for i in range(0, len(rows), per_batch))):
+                users += written
+                relationships += created
+    return users, relationships
+
+def refresh(graph, driver=None, state=None, top_k=TOP_K, workers=WRITE_WORKERS, dry_run=False):
+    """Recalcule et écrit les suggestions des utilisateurs dont le voisinage a
+    changé depuis l'état `state` (tous sans état) ; l'état n'est enregistré
+    qu'une fois toutes les écritures validées, jamais à blanc"""
+    timings = {}
+    start = time.perf_counter()
+    fingerprints = graph.fingerprints()
+    users = state.changed(graph.ids, fingerprints) if state is not None else np.arange(len(graph.ids))
+    timings["fingerprints"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    blocks = graph.recommend(users, top_k)
+    if dry_run:
+        written = relationships = 0
+        sample = None
+        for rows in blocks:
+            written += len(rows)
+            relationships += sum(len(row["recommendations"]) for row in rows)
+            sample = sample or next((row for row in rows if row["recommendations"]), None)
+    else:
+        written, relationships = write_recommendations(driver, blocks, top_k, workers=workers)
+        sample = None
+        if state is not None:
+            state.save(graph.ids, fingerprints, graph.community_keys())
+    timings["recommendations"] = time.perf_counter() - start
+    return {"users": len(graph.ids), "refreshed": written, "relationships": relationships,
+            "sample": sample, "timings": timings}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Suggestions d'abonnements précalculées (RECOMMENDED)")
+    parser.add_argument("--source", choices=["files", "neo4j"], default="files",
+                        help="lire le graphe dans data/ ou en flux depuis la base")
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    parser.add_argument("--top-k", type=int, default=TOP_K, help="suggestions par utilisateur")
+    parser.add_argument("--full", action="store_true",
+                        help="recalculer tous les utilisateurs, pas seulement ceux dont le voisinage a changé")
+    parser.add_argument("--seed", type=int, default=0, help="graine de la propagation de labels")
+    parser.add_argument("--workers", type=int, default=WRITE_WORKERS, help="transactions d'écriture simultanées")
+    parser.add_argument("--dry-run", action="store_true", help="calculer sans écrire dans la base")
+    args = parser.parse_args()
+
+    driver = None if args.dry_run and args.source == "files" else \
+        GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD))
+    try:
+        state = FingerprintState(os.path.join(args.data_dir, STATE_FILENAME))
+        if args.full:
+            state.reset()
+        elif not state.entries:
+            print("ℹ️  Aucun état précédent : tous les utilisateurs sont recalculés")
+
+        start = time.perf_counter()
+        graph = SocialGraph.load(args.source, args.data_dir, driver, args.seed, state)
+        print(f"📥 {len(graph.ids)} utilisateurs, {graph.follows.nnz} follows, "
+              f"{graph.members.nnz} adhésions chargés en {time.perf_counter() - start:.1f}s")
+        report = refresh(graph, driver, state, args.top_k, args.workers, args.dry_run)
+        timings = report["timings"]
+        print(f"🔎 {report['refreshed']}/{report['users']} utilisateurs à rafraîchir "
+              f"(empreintes en {timings['fingerprints']:.2f}s)")
+        print(f"{'🧪' if args.dry_run else '✅'} {report['relationships']} suggestions "
+              f"{'calculées' if args.dry_run else 'écrites'} en {timings['recommendations']:.1f}s")
+        if report["sample"]:
+            sample = report["sample"]
+            print(f"   {sample['id']} : " + ", ".join(f"{rec['id']} ({rec['score']:g})"
+                                                     for rec in sample["recommendations"]))
+    finally:
+        if driver is not None:
+            driver.close()
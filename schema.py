@@ -0,0 +1,101 @@
+import time
+from neo4j.exceptions import Neo4jError
+
+# Contraintes d'unicité : créées avant le chargement, elles servent aux
+# recherches par identifiant des MATCH / MERGE de chaque lot
+CONSTRAINTS = [
+    ("user_id", "User", "id"),
+    ("post_id", "Post", "id"),
+    ("comment_id", "Comment", "id"),
+    ("tag_name", "Tag", "name"),
+    ("topic_id", "Topic", "id"),
+    ("report_id", "Report", "id"),
+    ("group_id", "Group", "id"),
+]
+
+# Index secondaires (recherche et intervalles de dates) : construits après le
+# chargement, en une passe, au lieu d'être mis à jour à chaque écriture.
+# (nom, motif, propriété) ; un motif entre crochets désigne une relation.
+INDEXES = [
+    ("user_username", "(n:User)", "username"),
+    ("user_privacy", "(n:User)", "privacy"),
+    ("post_visibility", "(n:Post)", "visibility"),
+    ("group_visibility", "(n:Group)", "visibility"),
+    ("post_created_at", "(n:Post)", "createdAt"),
+    ("comment_created_at", "(n:Comment)", "createdAt"),
+    ("liked_at", "()-[n:LIKED]-()", "likedAt"),
+    ("report_status", "(n:Report)", "status"),
+]
+
+# Attente maximale de la population des index, en secondes
+INDEX_TIMEOUT = 3600
+
+# Une règle équivalente existe déjà sous un autre nom : rien à faire
+EXISTING_RULE_ERRORS = ("EquivalentSchemaRuleAlreadyExists", "ConstraintAlreadyExists", "IndexAlreadyExists")
+
+def constraint_statement(name, label, prop):
+    return f"CREATE CONSTRAINT {name} IF NOT EXISTS FOR (n:{label}) REQUIRE n.{prop} IS UNIQUE"
+
+def index_statement(name, pattern, prop):
+    return f"CREATE RANGE INDEX {name} IF NOT EXISTS FOR {pattern} ON (n.{prop})"
+
+class SchemaManager:
+    """Schéma de la base appliqué en deux temps autour d'un chargement massif.
+
+    `before_load` ne crée que les contraintes d'unicité utilisées par les
+    recherches par identifiant ; `after_load` crée les index secondaires, puis
+    attend leur population (db.awaitIndexes) et en mesure la durée. Toutes les
+    instructions sont en IF NOT EXISTS : les deux phases peuvent être rejouées
+    sur une base déjà indexée (reprise, import incrémental).
+    """
+
+    def __init__(self, session_factory, constraints=CONSTRAINTS, indexes=INDEXES, timeout=INDEX_TIMEOUT):
+        self.session = session_factory
+        self.constraints = constraints
+        self.indexes = indexes
+        self.timeout = timeout
+
+    def apply(self, session, statements):
+        """Exécute des instructions de schéma ; renvoie le nombre de règles ajoutées"""
+        added = 0
+        for statement in statements:
+            try:
+                summary = session.run(statement).consume()
+            except Neo4jError as e:
+                if not any(code in (e.code or "") for code in EXISTING_RULE_ERRORS):
+                    raise
+                continue
+            added += summary.counters.constraints_added + summary.counters.indexes_added
+        return added
+
+    def before_load(self):
+        """Contraintes d'unicité des identifiants, avant toute écriture"""
+        with self.session() as session:
+            added = self.apply(session, [constraint_statement(*c) for c in self.constraints])
+        print(f"✅ Contraintes d'unicité en place ({added} ajoutées, {len(self.constraints)} déclarées)")
+        return added
+
+    def after_load(self):
+        """Index secondaires construits sur les données chargées.
+
+        Renvoie un dictionnaire pour le rapport : durée de population et état
+        de chaque index déclaré.
+        """
+        print("🗂️  Construction des index secondaires...")
+        start = time.perf_counter()
+        with self.session() as session:
+            added = self.apply(session, [index_statement(*i) for i in self.indexes])
+            session.run("CALL db.awaitIndexes($timeout)", timeout=self.timeout).consume()
+            seconds = time.perf_counter() - start
+            names = [name for name, _, _ in self.indexes]
+            states = {
+                record["name"]: {"state": record["state"], "populationPercent": record["populationPercent"]}
+                for record in session.run(
+                    "SHOW INDEXES YIELD name, state, populationPercent WHERE name IN $names RETURN *",
+                    names=names)
+            }
+        failed = [name for name in names if states.get(name, {}).get("state") != "ONLINE"]
+        print(f"✅ {len(names) - len(failed)}/{len(names)} index en ligne ({added} ajoutés), population en {seconds:.1f}s")
+        if failed:
+            print(f"⚠️  Index non disponibles : {', '.join(failed)}")
+        return {"populationSeconds": round(seconds, 3), "indexesAdded": added, "indexes": states}
@@ -0,0 +1,416 @@
+import os
+import json
+import time
+import random
+import asyncio
+import argparse
+from collections import Counter
+from datetime import datetime
+import numpy as np
+from neo4j import AsyncGraphDatabase, GraphDatabase
+from neo4j.exceptions import TransientError
+from dotenv import load_dotenv
+
+from benchmark import parse_weights, percentiles
+from counters import CounterBuffer
+from dataset_io import dataset_path, read_rows
+from engagement import EngagementGenerator
+from follow_graph import ATTACH_CANDIDATES
+from generator import N_COMM, REPORT_REASONS, SEED, fake, user_id
+
+load_dotenv()
+NEO4J_URI = os.getenv("NEO4J_URI")
+NEO4J_USER = os.getenv("NEO4J_USER", "neo4j")
+NEO4J_PASSWORD = os.getenv("NEO4J_PASSWORD")
+NEO4J_DATABASE = os.getenv("NEO4J_DATABASE", "neo4j")
+
+DATA_DIR = "data"
+REPORT_FILE = "simulation_report.json"
+
+# Répartition des événements (poids relatifs)
+DEFAULT_MIX = "like=70,comment=15,follow=12,report=3"
+
+# Fenêtre de regroupement : un lot part après WINDOW secondes ou MAX_BATCH événements
+WINDOW = 0.05
+MAX_BATCH = 500
+
+# Transactions d'écriture simultanées (taille du pool de connexions)
+WRITERS = 8
+# Lots prêts en attente d'un writer, par writer ; au-delà le producteur attend
+QUEUE_PER_WRITER = 4
+
+# Pas du producteur, en secondes
+TICK = 0.01
+
+# Nouvelles tentatives après une erreur transitoire (verrou mortel, délai)
+MAX_RETRIES = 5
+RETRY_BACKOFF = 0.02
+
+# Requêtes par type d'événement ; les lignes sont triées par la clé de
+# verrouillage pour que deux lots prennent les verrous dans le même ordre
+EVENT_QUERIES = {
+    "like": """
+    UNWIND $rows AS like
+    MATCH (u:User {id: like.userId})
+    MATCH (p:Post {id: like.postId})
+    WHERE NOT EXISTS { (u)-[:LIKED]->(p) }
+    CREATE (u)-[:LIKED {likedAt: datetime(like.likedAt)}]->(p)
+    RETURN p.id AS postId
+    """,
+    "comment": """
+    UNWIND $rows AS comment
+    MATCH (author:User {id: comment.authorId})
+    MATCH (p:Post {id: comment.postId})
+    CREATE (c:Comment {id: comment.id, content: comment.content, createdAt: datetime(comment.createdAt)})
+    CREATE (author)-[:COMMENTED]->(c)
+    CREATE (c)-[:ON]->(p)
+    RETURN p.id AS postId
+    """,
+    "follow": """
+    UNWIND $rows AS follow
+    MATCH (follower:User {id: follow.followerId})
+    MATCH (followed:User {id: follow.followedId})
+    MERGE (follower)-[r:FOLLOWS]->(followed)
+    ON CREATE SET r.since = datetime(follow.since)
+    """,
+    "report": """
+    UNWIND $rows AS report
+    MATCH (u:User {id: report.reportedBy})
+    MATCH (target:Post {id: report.targetId})
+    CREATE (r:Report {id: report.id, reason: report.reason, status: 'open', createdAt: datetime(report.createdAt)})
+    CREATE (u)-[:REPORTED]->(r)
+    CREATE (r)-[:TARGET]->(target)
+    """,
+}
+
+# Clé de tri des lignes et étape d'import équivalente (écouteurs d'écriture)
+LOCK_KEYS = {"like": "postId", "comment": "postId", "follow": "followedId", "report": "targetId"}
+STAGES = {"like": "likes", "comment": "comments", "follow": "follows", "report": "reports"}
+
+def parse_mix(value):
+    return parse_weights(value, EVENT_QUERIES, "événement inconnu")
+
+def load_posts(data_dir=DATA_DIR):
+    """Identifiants et auteurs (index utilisateur) des posts générés"""
+    ids, authors = [], []
+    for post in read_rows(dataset_path(data_dir, "posts.ndjson")):
+        ids.append(post["id"])
+        authors.append(int(post["authorId"].rpartition("_")[2]))
+    return ids, np.asarray(authors, dtype=np.int64)
+
+class EventModel:
+    """Événements tirés avec le modèle du générateur.
+
+    Posts choisis selon leur popularité (Pareto) et utilisateurs selon
+    l'affinité de communauté d'EngagementGenerator ; les follows suivent
+    l'attachement préférentiel de FollowGraph (meilleur de ATTACH_CANDIDATES
+    tirages), le poids d'un utilisateur partant de la popularité de ses posts
+    puis grandissant avec ses nouveaux abonnés.
+    """
+
+    def __init__(self, post_ids, post_authors, n_users, seed=SEED):
+        self.post_ids = post_ids
+        self.n_users = n_users
+        self.rng = np.random.default_rng([seed, 5])
+        self.model = EngagementGenerator(post_authors, np.zeros(len(post_ids), dtype=np.int64),
+                                         n_users, N_COMM, seed)
+        self.cumulative = np.cumsum(self.model.popularity)
+        self.weight = np.bincount(post_authors, self.model.popularity, minlength=n_users)
+        self.run = datetime.now().strftime("%Y%m%d%H%M%S")
+        self.serial = Counter()
+
+    def popular_posts(self, n):
+        return np.searchsorted(self.cumulative, self.rng.random(n) * self.cumulative[-1])
+
+    def next_ids(self, prefix, n):
+        start = self.serial[prefix]
+        self.serial[prefix] += n
+        return [f"{prefix}_sim{self.run}_{start + i}" for i in range(n)]
+
+    def likes(self, n, now):
+        posts = self.popular_posts(n)
+        users = self.model.pick_users(posts, self.rng)
+        keep = users != self.model.authors[posts]
+        return [{"userId": user_id(u), "postId": self.post_ids[p], "likedAt": now}
+                for p, u in zip(posts[keep].tolist(), users[keep].tolist())]
+
+    def comments(self, n, now):
+        posts = self.popular_posts(n)
+        users = self.model.pick_users(posts, self.rng)
+        return [{"id": comment_id, "authorId": user_id(u), "postId": self.post_ids[p],
+                 "content": fake.sentence(nb_words=10), "createdAt": now}
+                for comment_id, p, u in zip(self.next_ids("c", n), posts.tolist(), users.tolist())]
+
+    def follows(self, n, now):
+        followers = self.rng.integers(0, self.n_users, n)
+        candidates = self.rng.integers(0, self.n_users, (n, ATTACH_CANDIDATES))
+        followed = candidates[np.arange(n), np.argmax(self.weight[candidates], axis=1)]
+        keep = followers != followed
+        self.weight += np.bincount(followed[keep], minlength=self.n_users)
+        return [{"followerId": user_id(a), "followedId": user_id(b), "since": now}
+                for a, b in zip(followers[keep].tolist(), followed[keep].tolist())]
+
+    def reports(self, n, now):
+        posts = self.popular_posts(n)
+        reporters = self.rng.integers(0, self.n_users, n)
+        reasons = self.rng.integers(0, len(REPORT_REASONS), n)
+        return [{"id": report_id, "reason": REPORT_REASONS[r], "reportedBy": user_id(u), "targetType": "Post",
+                 "targetId": self.post_ids[p], "createdAt": now}
+                for report_id, p, u, r in zip(self.next_ids("r", n), posts.tolist(), reporters.tolist(),
+                                              reasons.tolist())]
+
+    def events(self, kind, n, now):
+        return getattr(self, kind + "s")(n, now)
+
+class SimulationMetrics:
+    """Débit, latence de commit, retries et retard des événements par type"""
+
+    def __init__(self, kinds):
+        self.kinds = kinds
+        self.emitted = Counter()
+        self.committed = Counter()
+        self.failed = Counter()
+        self.batches = Counter()
+        self.retries = Counter()
+        self.deadlocks = Counter()
+        # Erreurs non transitoires par type (ServiceUnavailable, contrainte...)
+        self.errors = Counter()
+        self.commit_latency = {kind: [] for kind in kinds}
+        self.lag = []
+        self.commit_times = []
+        self.max_queue = 0
+
+    def record_error(self, kind, rows, error):
+        self.failed[kind] += rows
+        self.errors[getattr(error, "code", None) or type(error).__name__] += 1
+
+    def record_commit(self, kind, rows, seconds, scheduled, done):
+        self.committed[kind] += rows
+        self.batches[kind] += 1
+        self.commit_latency[kind].append(seconds)
+        self.lag.append(done - scheduled)
+        self.commit_times.append((done, rows))
+
+    def to_dict(self, started, seconds):
+        # Débit soutenu : médiane des secondes pleines (ni montée ni fin)
+        per_second = Counter()
+        for done, rows in self.commit_times:
+            per_second[int(done - started)] += rows
+        full = [per_second[s] for s in range(1, int(seconds) - 1)]
+        lag = np.concatenate(self.lag) if self.lag else []
+        batches = sum(self.batches.values())
+        return {
+            "seconds": round(seconds, 3),
+            "emitted": sum(self.emitted.values()),
+            "committed": sum(self.committed.values()),
+            "failed": sum(self.failed.values()),
+            "throughput": round(sum(self.committed.values()) / seconds, 1) if seconds else None,
+            "sustainedThroughput": float(np.median(full)) if full else None,
+            "retryRate": round(sum(self.retries.values()) / batches, 4) if batches else None,
+            "deadlockRate": round(sum(self.deadlocks.values()) / batches, 4) if batches else None,
+            "maxQueuedBatches": self.max_queue,
+            "errors": dict(self.errors),
+            "lag": percentiles(lag),
+            "events": {
+                kind: {"emitted": self.emitted[kind], "committed": self.committed[kind],
+                       "failed": self.failed[kind], "batches": self.batches[kind],
+                       "retries": self.retries[kind], "deadlocks": self.deadlocks[kind],
+                       "commitLatency": percentiles(self.commit_latency[kind])}
+                for kind in self.kinds
+            },
+        }
+
+class WriteSimulator:
+    """Trafic d'écriture continu à débit visé.
+
+    Un producteur émet les événements au rythme demandé et les regroupe par
+    type dans des fenêtres (WINDOW secondes ou MAX_BATCH événements) ; les
+    lots passent par une file bornée vers `writers` tâches asynchrones qui
+    partagent le pool de connexions du driver. Les compteurs des posts sont
+    mis à jour par deltas via CounterBuffer, pas à chaque like.
+    """
+
+    def __init__(self, uri, user, password, database=NEO4J_DATABASE, writers=WRITERS,
+                 window=WINDOW, max_batch=MAX_BATCH):
+        self.uri = uri
+        self.auth = (user, password)
+        self.database = database
+        self.writers = writers
+        self.window = window
+        self.max_batch = max_batch
+        self.sync_driver = GraphDatabase.driver(uri, auth=self.auth)
+        self.counters = CounterBuffer(lambda: self.sync_driver.session(database=database))
+        self.write_listeners = []
+
+    def close(self):
+        self.sync_driver.close()
+
+    def add_write_listener(self, listener):
+        """`listener(stage, rows)` après chaque lot validé, comme pour l'importeur"""
+        self.write_listeners.append(listener)
+
+    async def commit(self, driver, kind, rows, scheduled, metrics):
+        """Écrit un lot dans une transaction, avec nouvelles tentatives sur
+        les erreurs transitoires (verrou mortel compris)"""
+        rows.sort(key=lambda row: row[LOCK_KEYS[kind]])
+        for attempt in range(MAX_RETRIES + 1):
+            start = time.perf_counter()
+            try:
+                async with driver.session(database=self.database) as session:
+                    tx = await session.begin_transaction()
+                    try:
+                        result = await tx.run(EVENT_QUERIES[kind], rows=rows)
+                        touched = [record["postId"] async for record in result] if LOCK_KEYS[kind] == "postId" else []
+                        await tx.commit()
+                    finally:
+                        await tx.close()
+                break
+            except TransientError as e:
+                metrics.retries[kind] += 1
+                if "Deadlock" in (e.code or ""):
+                    metrics.deadlocks[kind] += 1
+                if attempt == MAX_RETRIES:
+                    metrics.failed[kind] += len(rows)
+                    return
+                await asyncio.sleep(RETRY_BACKOFF * 2 ** attempt * random.random())
+        done = time.perf_counter()
+        metrics.record_commit(kind, len(rows), done - start, scheduled, done)
+
+        for post_id in touched:
+            if kind == "like":
+                self.counters.add(post_id, likes=1)
+            else:
+                self.counters.add(post_id, comments=1)
+        for listener in self.write_listeners:
+            listener(STAGES[kind], rows)
+
+    async def simulate(self, model, rate, duration, mix):
+        """Émet `rate` événements par seconde pendant `duration` secondes"""
+        kinds, weights = list(mix), np.array(list(mix.values()))
+        weights = weights / weights.sum()
+        metrics = SimulationMetrics(kinds)
+        batches = asyncio.Queue(maxsize=self.writers * QUEUE_PER_WRITER)
+        # Par type : lignes en attente et date d'émission de chacune
+        pending = {kind: ([], []) for kind in kinds}
+        opened = {}
+
+        async with AsyncGraphDatabase.driver(self.uri, auth=self.auth,
+                                             max_connection_pool_size=self.writers) as driver:
+            async def writer():
+                while True:
+                    kind, rows, scheduled = await batches.get()
+                    try:
+                        await self.commit(driver, kind, rows, scheduled, metrics)
+                    except Exception as e:
+                        # Un writer qui meurt bloquerait le producteur sur la file pleine :
+                        # le lot est compté en échec et le writer continue
+                        metrics.record_error(kind, len(rows), e)
+                    finally:
+                        batches.task_done()
+
+            async def ship(kind):
+                rows, scheduled = pending[kind]
+                pending[kind] = ([], [])
+                opened.pop(kind, None)
+                if rows:
+                    await batches.put((kind, rows, np.asarray(scheduled)))
+                    metrics.max_queue = max(metrics.max_queue, batches.qsize())
+
+            tasks = [asyncio.create_task(writer()) for _ in range(self.writers)]
+            self.counters.start()
+            started = time.perf_counter()
+            emitted = 0
+            failed = False
+            try:
+                while True:
+                    now = time.perf_counter()
+                    elapsed = now - started
+                    if elapsed >= duration:
+                        break
+                    due = int(rate * elapsed) - emitted
+                    if due > 0:
+                        stamp = datetime.now().isoformat(timespec="seconds")
+                        for kind, n in zip(kinds, model.rng.multinomial(due, weights)):
+                            if not n:
+                                continue
+                            rows = model.events(kind, n, stamp)
+                            metrics.emitted[kind] += len(rows)
+                            pending[kind][0].extend(rows)
+                            pending[kind][1].extend([now] * len(rows))
+                            opened.setdefault(kind, now)
+                        emitted += due
+                    for kind in kinds:
+                        if len(pending[kind][0]) >= self.max_batch or (kind in opened and now - opened[kind] >= self.window):
+                            await ship(kind)
+                    await asyncio.sleep(TICK)
+                for kind in kinds:
+                    await ship(kind)
+                await batches.join()
+            except BaseException:
+                failed = True
+                raise
+            finally:
+                # Lots restants abandonnés en cas d'arrêt anticipé : la file peut être pleine
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+                seconds = time.perf_counter() - started
+                try:
+                    self.counters.close()
+                except Exception as e:
+                    if not failed:
+                        raise
+                    # L'erreur qui a interrompu la simulation reste celle remontée
+                    print(f"⚠️  Derniers compteurs non écrits : {type(e).__name__}: {e}")
+
+        report = metrics.to_dict(started, seconds)
+        report["counterFlushes"] = self.counters.flushes
+        report["counterPostsFlushed"] = self.counters.flushed_posts
+        return report
+
+def print_report(report):
+    print(f"\n📈 {report['committed']}/{report['emitted']} événements écrits en {report['seconds']}s "
+          f"({report['throughput']} év./s, soutenu {report['sustainedThroughput']} év./s)")
+    print(f"   retries {report['retryRate']} / lot · verrous mortels {report['deadlockRate']} / lot · "
+          f"retard p50 {report['lag'].get('p50Ms')} ms · p99 {report['lag'].get('p99Ms')} ms")
+    if report["errors"]:
+        print("   ⚠️  erreurs : " + ", ".join(f"{code} ×{count}" for code, count in report["errors"].items()))
+    for kind, stats in report["events"].items():
+        latency = stats["commitLatency"]
+        print(f"   {kind:<8} {stats['committed']:>8} écrits · {stats['batches']} lots · "
+              f"commit p50 {latency.get('p50Ms')} ms · p99 {latency.get('p99Ms')} ms · "
+              f"{stats['retries']} retries · {stats['failed']} échecs")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simulation d'un trafic d'écriture continu")
+    parser.add_argument("--rate", type=float, default=1000, help="événements par seconde visés")
+    parser.add_argument("--duration", type=float, default=60, help="durée de la simulation, en secondes")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix(DEFAULT_MIX),
+                        help=f"répartition des événements (défaut {DEFAULT_MIX})")
+    parser.add_argument("--writers", type=int, default=WRITERS, help="transactions d'écriture simultanées")
+    parser.add_argument("--window", type=float, default=WINDOW, help="fenêtre de regroupement, en secondes")
+    parser.add_argument("--max-batch", type=int, default=MAX_BATCH, help="événements au plus par lot")
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--data-dir", default=DATA_DIR, help="fichiers générés (posts, utilisateurs)")
+    parser.add_argument("--report", default=REPORT_FILE, help="fichier JSON des mesures")
+    args = parser.parse_args()
+
+    print("📂 Chargement des posts générés...")
+    post_ids, post_authors = load_posts(args.data_dir)
+    n_users = sum(1 for _ in read_rows(dataset_path(args.data_dir, "users.ndjson")))
+    model = EventModel(post_ids, post_authors, n_users, args.seed)
+
+    simulator = WriteSimulator(NEO4J_URI, NEO4J_USER, NEO4J_PASSWORD, writers=args.writers,
+                               window=args.window, max_batch=args.max_batch)
+    try:
+        print(f"🌊 {args.rate:g} événements/s pendant {args.duration:g}s, {args.writers} writers...")
+        report = asyncio.run(simulator.simulate(model, args.rate, args.duration, args.mix))
+    finally:
+        simulator.close()
+
+    report["config"] = {"rate": args.rate, "duration": args.duration, "mix": args.mix, "writers": args.writers,
+                        "window": args.window, "maxBatch": args.max_batch, "seed": args.seed}
+    with open(args.report, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print_report(report)
+    print(f"📊 Mesures écrites dans {args.report}")
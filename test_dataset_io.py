@@ -0,0 +1,53 @@
+import pytest
+
+from dataset_io import RECORD_BATCH_ROWS, open_reader, read_rows, write_dataset
+
+pytest.importorskip("pyarrow")
+
+VISIBILITIES = ["public", "friends", "private"]
+
+def posts(count):
+    # Une valeur de dictionnaire n'apparaît qu'après le premier record batch
+    return [{"id": f"p_{i}", "visibility": "unlisted" if i > RECORD_BATCH_ROWS else VISIBILITIES[i % 3],
+             "likeCount": i % 7, "mediaUrl": None if i % 2 else f"https://cdn/{i}.jpg"}
+            for i in range(count)]
+
+@pytest.mark.parametrize("suffix", [".arrow", ".parquet", ".ndjson", ".ndjson.gz"])
+def test_round_trip_over_several_record_batches(tmp_path, suffix):
+    rows = posts(RECORD_BATCH_ROWS + 4464)
+    path = str(tmp_path / f"posts{suffix}")
+    write_dataset(path, rows)
+    assert list(read_rows(path)) == rows
+
+@pytest.mark.parametrize("suffix", [".arrow", ".parquet", ".ndjson"])
+def test_resume_skips_rows_already_read(tmp_path, suffix):
+    rows = posts(RECORD_BATCH_ROWS + 100)
+    path = str(tmp_path / f"posts{suffix}")
+    write_dataset(path, rows)
+
+    reader = open_reader(path)
+    iterator = iter(reader)
+    for _ in range(RECORD_BATCH_ROWS + 10):
+        next(iterator)
+    offset, digest = reader.offset, reader.digest
+
+    resumed = open_reader(path, offset, digest)
+    assert list(resumed) == rows[RECORD_BATCH_ROWS + 10:]
+    assert resumed.resumed
+
+@pytest.mark.parametrize("suffix", [".arrow", ".ndjson"])
+def test_changed_file_is_read_from_the_start(tmp_path, suffix):
+    path = str(tmp_path / f"posts{suffix}")
+    write_dataset(path, posts(50))
+    reader = open_reader(path)
+    rows = iter(reader)
+    for _ in range(20):
+        next(rows)
+    offset, digest = reader.offset, reader.digest
+
+    changed = posts(50)
+    changed[3]["likeCount"] = 99
+    write_dataset(path, changed)
+    resumed = open_reader(path, offset, digest)
+    assert list(resumed) == changed
+    assert not resumed.resumed
@@ -0,0 +1,143 @@
+import time
+import importlib
+
+import pytest
+
+pytest.importorskip("neo4j")
+pytest.importorskip("dotenv")
+importer_module = importlib.import_module("import")  # "import" est un mot-clé
+BatchSizer = importer_module.BatchSizer
+MIN_BATCH_SIZE = importer_module.MIN_BATCH_SIZE
+
+class FakeTransaction:
+    def __init__(self, driver):
+        self.driver = driver
+
+    def run(self, query, rows):
+        time.sleep(self.driver.delay)
+        self.driver.pending.append(self.driver.read - sum(self.driver.batches))
+        self.driver.batches.append(len(rows))
+        return self
+
+    def consume(self):
+        return None
+
+class FakeSession:
+    def __init__(self, driver):
+        self.driver = driver
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute_write(self, work):
+        return work(FakeTransaction(self.driver))
+
+class FakeDriver:
+    """Driver qui enregistre la taille de chaque transaction et, si l'appelant
+    tient `read` à jour, les lignes lues mais pas encore écrites"""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.batches = []
+        self.pending = []
+        self.read = 0
+
+    def session(self, **kwargs):
+        return FakeSession(self)
+
+    def close(self):
+        pass
+
+@pytest.fixture
+def make_importer(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+    def make(workers, size, delay=0.0, adaptive=True, target_latency=importer_module.TARGET_LATENCY):
+        importer = importer_module.Neo4jImporter(
+            "bolt://localhost:7687", "neo4j", "secret", workers=workers,
+            batch_sizes={"likes": size, "follows": size}, adaptive=adaptive, target_latency=target_latency)
+        importer.driver = FakeDriver(delay)
+        importer.report.record_batch = lambda *args: None
+        return importer
+    return make
+
+def likes(count, users=5000):
+    return [{"userId": f"u_{i % users:05d}", "postId": f"p_{i:07d}"} for i in range(count)]
+
+def follows(count, users=5000):
+    return [{"followerId": f"u_{i % users:05d}", "followedId": f"u_{i * 7 % (users - 1):05d}"} for i in range(count)]
+
+def test_sizer_shrinks_after_slow_transaction():
+    sizer = BatchSizer(10000, target=1.0)
+    sizer.observe(10000, 2.0)
+    assert sizer.size == 5000
+
+def test_sizer_grows_after_fast_transactions_up_to_ceiling():
+    sizer = BatchSizer(1000, target=1.0)
+    sizer.ceiling = 2000
+    for _ in range(5):
+        sizer.observe(sizer.size, 0.1)
+    assert sizer.size == 2000
+
+def test_sizer_judges_partial_transactions_by_their_own_rows():
+    # 1000 lignes en 1 s : 4 s projetées pour 4000, deux fois la cible
+    sizer = BatchSizer(4000, target=2.0)
+    sizer.observe(1000, 1.0)
+    assert sizer.size == 2000
+
+def test_sizer_ignores_tiny_transactions():
+    sizer = BatchSizer(4000, target=1.0)
+    sizer.observe(MIN_BATCH_SIZE - 1, 5.0)
+    assert sizer.size == 4000
+
+def test_sizer_halves_on_retry_and_respects_refused_size():
+    sizer = BatchSizer(8000, target=1.0)
+    sizer.observe(8000, 0.1, retried=True)
+    assert sizer.size == 4000
+    sizer.shrink(4000)
+    assert sizer.ceiling == 3000 and sizer.size == 2000
+    for _ in range(10):
+        sizer.observe(sizer.size, 0.01)
+    assert sizer.size == 3000
+
+def test_non_adaptive_sizer_keeps_its_size():
+    sizer = BatchSizer(5000, target=1.0, adaptive=False)
+    sizer.observe(5000, 10.0, retried=True)
+    assert sizer.size == 5000
+
+@pytest.mark.parametrize("workers", [1, 4])
+def test_partitioned_transactions_keep_the_batch_size(make_importer, workers):
+    importer = make_importer(workers, 5000, adaptive=False)
+    rows = likes(400000, users=50000)
+    total = importer.write_partitioned("likes", importer_module.QUERIES["likes"], rows, "userId", "postId")
+    assert total == len(rows)
+    assert sum(importer.driver.batches) == len(rows)
+    assert max(importer.driver.batches) == 5000
+    assert len(importer.driver.batches) <= len(rows) // 5000 * 1.1
+
+def test_partitioned_window_stays_within_budget(make_importer, monkeypatch):
+    monkeypatch.setattr(importer_module, "PARTITION_WINDOW_ROWS", 20000)
+    importer = make_importer(8, 20000, adaptive=False)
+    rows = follows(100000)
+    
+    def counted():
+        for row in rows:
+            importer.driver.read += 1
+            yield row
+    
+    total = importer.write_partitioned("follows", importer_module.QUERIES["follows"], counted(),
+                                       "followerId", "followedId", symmetric=True)
+    assert total == len(rows)
+    assert max(importer.driver.pending) <= 20000
+
+@pytest.mark.parametrize("stage, rows, keys, symmetric", [
+    ("likes", likes(40000), ("userId", "postId"), False),
+    ("follows", follows(40000), ("followerId", "followedId"), True),
+])
+def test_partitioned_stages_adapt_batch_size(make_importer, stage, rows, keys, symmetric):
+    importer = make_importer(4, 2000, delay=0.01, target_latency=0.001)
+    importer.write_partitioned(stage, importer_module.QUERIES[stage], rows, *keys, symmetric=symmetric)
+    assert importer.sizers[stage].size == MIN_BATCH_SIZE
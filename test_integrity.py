@@ -0,0 +1,60 @@
+import json
+
+from integrity import MAX_BITMAP_NUMBER, IdIndex, IntegrityChecker, PairIndex
+
+def test_id_index_add_and_contains():
+    index = IdIndex()
+    assert index.add("u_00042")
+    assert not index.add("u_00042")
+    assert "u_00042" in index
+    assert "u_00043" not in index
+    # Même numéro, autre format : autre identifiant
+    assert "u_0042" not in index and "p_00042" not in index
+    assert index.add("handle-libre") and "handle-libre" in index
+    assert len(index) == 2
+
+def test_id_index_keeps_large_numbers_out_of_the_bitmap():
+    index = IdIndex()
+    assert index.add("user_9999999999")
+    assert not index.add("user_9999999999")
+    assert "user_9999999999" in index and "user_9999999998" not in index
+    assert sum(len(bitmap) for bitmap in index.bitmaps.values()) == 0
+    assert index.add(f"u_{MAX_BITMAP_NUMBER - 1}") and index.add(f"u_{MAX_BITMAP_NUMBER}")
+    assert len(index) == 3
+
+def test_pair_index_detects_duplicates():
+    pairs = PairIndex()
+    assert pairs.add("u_001", "p_002")
+    assert not pairs.add("u_001", "p_002")
+    assert pairs.add("u_002", "p_001")
+    assert pairs.add("x", "y") and not pairs.add("x", "y")
+
+def test_pair_index_does_not_collide_on_wide_numbers():
+    pairs = PairIndex()
+    # (0, 2^32) et (1, 0) donnaient la même clé entière
+    assert pairs.add("u_0", f"u_{1 << 32}")
+    assert pairs.add("u_1", "u_0")
+    assert not pairs.add("u_0", f"u_{1 << 32}")
+
+def test_filter_rejects_orphans_and_duplicates(tmp_path):
+    rejects = tmp_path / "rejects.ndjson"
+    checker = IntegrityChecker(str(rejects), dedup_pairs=True)
+    nodes = {
+        "users.ndjson": [{"id": "u_001"}, {"id": "u_002"}, {"id": ""}],
+        "posts.ndjson": [{"id": "p_001", "authorId": "u_001"}, {"id": "p_002", "authorId": "u_404"}],
+    }
+    checker.build(lambda filename: nodes.get(filename, []))
+    likes = [
+        {"userId": "u_001", "postId": "p_001"},
+        {"userId": "u_001", "postId": "p_001"},
+        {"userId": "u_002", "postId": "p_002"},
+        {"userId": "u_003", "postId": "p_001"},
+        {"userId": "u_002", "postId": "p_001"},
+    ]
+    kept = list(checker.filter("likes", likes))
+    checker.close()
+
+    assert kept == [likes[0], likes[4]]
+    assert checker.counts("likes") == {"duplicate": 1, "orphan_postId": 1, "orphan_userId": 1}
+    reasons = [json.loads(line)["reason"] for line in rejects.read_text().splitlines()]
+    assert reasons == ["duplicate", "orphan_postId", "orphan_userId"]
@@ -0,0 +1,159 @@
+import re
+import unicodedata
+import numpy as np
+from faker.providers.company.fr_FR import Provider as CompanyProvider
+from faker.providers.lorem.fr_FR import Provider as LoremProvider
+from faker.providers.person.fr_FR import Provider as PersonProvider
+
+# Textes préparés à chaque tirage groupé, puis servis un par un
+TEXT_BLOCK = 4096
+
+MEDIA_ALPHABET = np.frombuffer(b"abcdefghijklmnopqrstuvwxyz0123456789", dtype=np.uint8)
+
+# Formats de noms fr_FR (mêmes proportions que Faker) : p = prénom, n = nom, x = particule
+NAME_FORMATS = ["{p} {n}"] * 6 + ["{p} {x} {n}", "{p} {n}-{m}", "{p}-{q} {n}", "{p} {n} {x} {m}"]
+
+def ascii_slug(value):
+    """Identifiant en minuscules ASCII, comme les noms d'utilisateur de Faker"""
+    value = unicodedata.normalize("NFKD", value).encode("ascii", "ignore").decode("ascii")
+    return re.sub(r"[^a-z0-9]", "", value.lower())
+
+class TextSynth:
+    """Textes et identités en français sans appel Faker par ligne.
+
+    Les listes fr_FR de Faker (mots, prénoms, noms, slogans) sont chargées
+    une fois ; chaque sorte de texte est assemblée par lots à partir de
+    tirages d'indices NumPy, puis servie un par un avec les mêmes méthodes
+    que Faker (sentence, name, user_name, catch_phrase, text).
+    """
+
+    def __init__(self, seed=0, block=TEXT_BLOCK):
+        self.block = block
+        self.words = np.array(LoremProvider.word_list, dtype=object)
+        self.titled = np.array([w.title() for w in LoremProvider.word_list], dtype=object)
+        self.first_names = [np.array(PersonProvider.first_names_male, dtype=object),
+                            np.array(PersonProvider.first_names_female, dtype=object)]
+        self.last_names = np.array(PersonProvider.last_names, dtype=object)
+        self.prefixes = np.array(PersonProvider.prefixes, dtype=object)
+        self.slug_first = np.array([ascii_slug(p) for p in PersonProvider.first_names], dtype=object)
+        self.slug_last = np.array([ascii_slug(n) for n in PersonProvider.last_names], dtype=object)
+        self.catch_phrases = np.array([
+            f"{noun[0].upper()}{noun[1:]} {verb} {attribute}"
+            for noun in CompanyProvider.nouns
+            for verb in CompanyProvider.verbs
+            for attribute in CompanyProvider.attributes
+            if all(f"{noun} {verb} {attribute}".count(w) < 2 for w in CompanyProvider.words_which_should_not_appear_twice)
+        ], dtype=object)
+        self.seed(seed)
+
+    def seed(self, seed):
+        self.rng = np.random.default_rng(seed)
+        self.buffers = {}
+
+    def take(self, key, make):
+        """Texte suivant d'une sorte donnée, le lot étant refait quand il est épuisé"""
+        buffer = self.buffers.get(key)
+        if not buffer:
+            buffer = make(self.block)
+            buffer.reverse()
+            self.buffers[key] = buffer
+        return buffer.pop()
+
+    # Lots
+
+    def joined(self, tokens, ends, end=""):
+        """Concatène des mots en une chaîne par groupe (groupes consécutifs
+        terminant aux index `ends`), avec `end` à la fin de chaque groupe"""
+        tokens[ends - 1] = tokens[ends - 1] + (end + "\n")
+        return " ".join(tokens.tolist())[:-1].split("\n ")
+
+    def sentences(self, n, nb_words):
+        """Phrases de nb_words mots à ±40 % près, comme Faker.sentence"""
+        lengths = np.maximum(1, nb_words * self.rng.integers(60, 141, n) // 100)
+        ends = np.cumsum(lengths)
+        picks = self.rng.integers(0, len(self.words), ends[-1])
+        tokens = self.words[picks]
+        starts = ends - lengths
+        tokens[starts] = self.titled[picks[starts]]
+        return self.joined(tokens, ends, ".")
+
+    def paragraphs(self, n):
+        """Paragraphes de trois phrases de six mots à ±40 % près"""
+        sizes = np.maximum(1, 3 * self.rng.integers(60, 141, n) // 100)
+        tokens = np.array(self.sentences(int(sizes.sum()), 6), dtype=object)
+        return self.joined(tokens, np.cumsum(sizes))
+
+    def names(self, n):
+        """Prénom et nom, avec particule ou nom / prénom composé selon NAME_FORMATS"""
+        male, female = self.first_names
+        first = np.concatenate([male, female])
+        def firsts(k):
+            # Prénom masculin ou féminin à parts égales, comme Faker
+            women = self.rng.random(k) < 0.5
+            picks = np.where(women, len(male) + self.rng.integers(0, len(female), k), self.rng.integers(0, len(male), k))
+            return first[picks]
+        def lasts(k):
+            return self.last_names[self.rng.integers(0, len(self.last_names), k)]
+        def prefixes(k):
+            return self.prefixes[self.rng.integers(0, len(self.prefixes), k)]
+
+        names = firsts(n) + " " + lasts(n)
+        formats = self.rng.integers(0, len(NAME_FORMATS), n)
+        for f, variant in [(6, lambda k: firsts(k) + " " + prefixes(k) + " " + lasts(k)),
+                           (7, lambda k: firsts(k) + " " + lasts(k) + "-" + lasts(k)),
+                           (8, lambda k: firsts(k) + "-" + firsts(k) + " " + lasts(k)),
+                           (9, lambda k: firsts(k) + " " + lasts(k) + " " + prefixes(k) + " " + lasts(k))]:
+            rows = np.flatnonzero(formats == f)
+            names[rows] = variant(rows.size)
+        return names.tolist()
+
+    def user_names(self, n):
+        """Noms d'utilisateur ASCII : nomprénom, prénomnom, prénom42 ou initiale + nom"""
+        first = self.slug_first[self.rng.integers(0, len(self.slug_first), n)]
+        last = self.slug_last[self.rng.integers(0, len(self.slug_last), n)]
+        digits = self.rng.integers(0, 100, n)
+        letters = np.array([chr(97 + i) for i in range(26)] + [f"{i:02d}" for i in range(100)], dtype=object)
+        variants = np.stack([last + first, first + last, first + letters[26 + digits], letters[digits % 26] + last])
+        return variants[self.rng.integers(0, 4, n), np.arange(n)].tolist()
+
+    def texts(self, n, max_nb_chars):
+        """Textes de paragraphes (phrases sous 100 caractères) ne dépassant pas max_nb_chars"""
+        unit = (lambda: self.take("paragraph", self.paragraphs)) if max_nb_chars >= 100 else (lambda: self.sentence(6))
+        separator = "\n" if max_nb_chars >= 100 else " "
+        texts = []
+        for _ in range(n):
+            parts, size = [], 0
+            while not parts:
+                while size < max_nb_chars:
+                    part = unit()
+                    parts.append(part)
+                    size += len(part) + (len(separator) if len(parts) > 1 else 0)
+                parts.pop()
+                size = 0
+            texts.append(separator.join(parts))
+        return texts
+
+    def tokens(self, n, length):
+        """Chaînes aléatoires [a-z0-9] de `length` caractères"""
+        data = MEDIA_ALPHABET[self.rng.integers(0, len(MEDIA_ALPHABET), n * length)].tobytes().decode("ascii")
+        return [data[i:i + length] for i in range(0, n * length, length)]
+
+    # Interface de Faker, un texte à la fois
+
+    def sentence(self, nb_words=6):
+        return self.take(("sentence", nb_words), lambda n: self.sentences(n, nb_words))
+
+    def name(self):
+        return self.take("name", self.names)
+
+    def user_name(self):
+        return self.take("user_name", self.user_names)
+
+    def catch_phrase(self):
+        return self.take("catch_phrase", lambda n: self.catch_phrases[self.rng.integers(0, len(self.catch_phrases), n)].tolist())
+
+    def text(self, max_nb_chars=200):
+        return self.take(("text", max_nb_chars), lambda n: self.texts(n, max_nb_chars))
+
+    def token(self, length=12):
+        return self.take(("token", length), lambda n: self.tokens(n, length))